@@ -8,12 +8,28 @@ Fecha: 2025-12-05
 """
 import numpy as np
 import funciones as func
+import exportacion
+import jerarquia
+import comunidades
+
+SALIDA_HTML = "./resultados/variacionProvincias.html"
+
+# Datos de la tabla sin formato (.npz, .csv, .jsonl y .schema.json, ver exportacion.py)
+SALIDA_DATOS = "./resultados/variacionProvincias"
+
+# Ficheros que lee y escribe el informe (los usa el planificador de main.py)
+# (la relación CCAA-provincia da los nombres de las provincias y sirve para comprobar los totales)
+ENTRADAS = [func.RUTA_POBLACION, func.RUTA_COMUNIDADES]
+SALIDAS = [SALIDA_HTML] + exportacion.RutasDatos(SALIDA_DATOS)
 
 
 def CalcularVariacionAbsoluta(poblacion_total):
     """
     Calcula la variación absoluta de la población por provincias
 
+    Los años son el último eje, del más reciente al más antiguo, así que sirve igual
+    para una matriz región x año que para el cubo región x sexo x año.
+
     Parámetros:
         poblacion_total (numpy.ndarray): Array con la población total por provincias
 
@@ -21,9 +37,9 @@ def CalcularVariacionAbsoluta(poblacion_total):
         numpy.ndarray: Array con la variación absoluta de la población por provincias
     """    
     # variacion_absoluta 2017 = poblacion 2017 - poblacion 2016
-    # [:, :-1] = Para todas las provincias y todos los años menos 2010 (2017-2011)
-    # [:, 1:] = Para todas las provincias y todos los años menos 2017 (2016-2010)
-    return poblacion_total[:, :-1] - poblacion_total[:, 1:]
+    # [..., :-1] = Todos los años menos el más antiguo (2017-2011)
+    # [..., 1:] = Todos los años menos el más reciente (2016-2010)
+    return poblacion_total[..., :-1] - poblacion_total[..., 1:]
 
 
 def CalcularVariacionRelativa(poblacion_total, variacion_absoluta):
@@ -38,65 +54,92 @@ def CalcularVariacionRelativa(poblacion_total, variacion_absoluta):
         numpy.ndarray: Array con la variación relativa de la población por provincias
     """
     # variacion_relativa 2017 = (variacion_absoluta 2017 / poblacion 2016) * 100
-    # [:, 1:] = Para todas las provincias y todos los años menos 2017 (2016-2010)
-    return variacion_absoluta / poblacion_total[:, 1:] * 100
+    # [..., 1:] = Todos los años menos el más reciente (2016-2010)
+    return variacion_absoluta / poblacion_total[..., 1:] * 100
 
 
-def CrearCabecera(variacion_absoluta, variacion_relativa):
+def CrearCabecera(anos):
     """
     Genera la cabecera HTML para la tabla de variaciones de población.
     
     Parámetros:
-        variacion_absoluta (numpy.ndarray): Array con la variación absoluta
-        variacion_relativa (numpy.ndarray): Array con la variación relativa
+        anos (numpy.ndarray): Años de las variaciones (todos menos el más antiguo)
     
     Retorna:
         str: Código HTML de la cabecera de la tabla
     """
-    cabecera = "<tr>"
-    cabecera += '<th rowspan="2">Provincia</th>'
-    cabecera += f'<th colspan="{variacion_absoluta.shape[1]}" class="group-header">Variación absoluta</th>'
-    cabecera += f'<th colspan="{variacion_relativa.shape[1]}" class="group-header">Variación relativa</th>'
-    cabecera += "</tr>"
+    return func.CompilarCabecera(
+        etiqueta="Provincia",
+        niveles=(("Variación absoluta", "Variación relativa"),),
+        anos=tuple(anos.tolist())
+    )
 
-    cabecera += "<tr>"
 
-    celdas_ano = "".join(f"<th>{ano}</th>" for ano in range(2017, 2010, -1))
-    cabecera += celdas_ano
-    cabecera += celdas_ano
+def CrearEsquema(anos):
+    """
+    Describe las columnas de la tabla de variaciones (las de CrearCabecera) para exportarlas.
 
-    cabecera += "</tr>"
+    Parámetros:
+        anos (numpy.ndarray): Años de las variaciones (todos menos el más antiguo)
 
-    return cabecera 
+    Retorna:
+        dict: Esquema de la tabla (ver funciones.CrearEsquema)
+    """
+    return func.CrearEsquema("Provincia", (("Variación absoluta", "Variación relativa"),), tuple(anos.tolist()))
 
 
-def R1():
+def CrearInforme(cubo, sexo="Total", variaciones=None):
+    """
+    Compone en memoria la página de variaciones de población de un cubo por provincias.
+
+    Cada variación se calcula respecto a la columna de años siguiente del cubo, así que
+    con una selección de años (p. ej. 2010 y 2017) es la variación entre esos años.
+
+    Parámetros:
+        cubo (dict): Cubo de población con al menos dos años (ver jerarquia.CuboConTotal)
+        sexo (str): Sexo cuya variación se calcula ("Total", "Hombres" o "Mujeres")
+        variaciones (tuple, opcional): Variaciones (absoluta, relativa) del sexo ya calculadas,
+                                       matrices (regiones x años - 1); por defecto se calculan
+                                       del cubo (ver actualizacion.py)
+
+    Retorna:
+        dict: Documento (ver funciones.CrearDocumento)
+    """
+    if variaciones is None:
+        poblacion = func.SexoCubo(cubo, sexo)
+        variacion_absoluta = CalcularVariacionAbsoluta(poblacion)
+        variacion_relativa = CalcularVariacionRelativa(poblacion, variacion_absoluta)
+    else:
+        variacion_absoluta, variacion_relativa = variaciones
+
+    anos = cubo["anos"][:-1]
+    cabecera =  CrearCabecera(anos)
+
+    poblacion_titulo = "Población" if sexo == "Total" else f"Población ({sexo})"
+    documento = func.CrearDocumento(f"Variación de {poblacion_titulo} por Provincias ({func.RangoAnos(anos)})")
+    func.AñadirTabla(documento, cabecera, cubo["regiones"], np.hstack((variacion_absoluta, variacion_relativa)), esquema=CrearEsquema(anos))
+    return documento
+
+
+def R1(contexto=None):
     """
     Función principal que ejecuta el módulo R1
 
     Parámetros:
-        None
+        contexto (dict, opcional): Contexto de datos compartido (funciones.CrearContexto)
 
     Retorna:
         None
     """
-    
-    ruta_csv = "./entradas/poblacionProvinciasHM2010-17.csv"
-    provincias, poblacion_total, _ , _ = func.LeerPoblacionProvincias(ruta_csv)
-    
-    variacion_absoluta = CalcularVariacionAbsoluta(poblacion_total)
-    variacion_relativa = CalcularVariacionRelativa(poblacion_total, variacion_absoluta)
+    if contexto is None:
+        contexto = func.CrearContexto()
 
-    datos = np.hstack((provincias.reshape(-1,1), variacion_absoluta, variacion_relativa))
+    # Total nacional y provincias (sumando municipios si el fichero es municipal)
+    cubo = jerarquia.CuboConTotal(comunidades.JerarquiaPoblacion(contexto), "provincia")
 
-    cabecera =  CrearCabecera(variacion_absoluta, variacion_relativa)
-    
-    func.GenerarHtml(
-        titulo="Variación de Población por Provincias (2011-2017)",
-        cabecera=cabecera,
-        datos=datos,
-        salida="./resultados/variacionProvincias.html"
-    )
+    documento = CrearInforme(cubo)
+    func.EscribirDocumento(documento, SALIDA_HTML)
+    exportacion.EscribirDatos(documento, SALIDA_DATOS)
 
-    print("Página HTML generada en './resultados/variacionProvincias.html'")
+    print(f"Página HTML generada en '{SALIDA_HTML}' (datos en '{SALIDA_DATOS}.*')")
         
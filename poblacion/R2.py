@@ -6,143 +6,66 @@ agrupando los datos de provincias y generando una página web con la tabla de re
 Autores: Jose Daniel Ojeda Tro & Javier Linaje Vallejo
 Fecha: 2025-12-06
 """
+import functools
 import funciones as func
 import numpy as np
+import exportacion
+import perfil
+import R3 as r3
+from comunidades import (AgruparProvinciasPorComunidadAutonoma, CuboCCAA, DatosComuniadesAutonomasProvincias,
+                         InvertirDiccionarioComunidades, QuitarFilaTotales)
 
+SALIDA_HTML = "./resultados/poblacionComAutonomas.html"
 
-def AgruparProvinciasPorComunidadAutonoma(provincias, poblaciones, diccionario_comunidades):
-    """
-    Agrupa los datos de población de provincias por comunidad autónoma.
-    
-    Parámetros:
-        provincias (numpy.ndarray): Array con los nombres de las provincias
-        poblaciones (numpy.ndarray): Matriz con datos de población de cada provincia
-        diccionario_comunidades (dict): Diccionario {comunidad: [provincias]}
-    
-    Retorna:
-        tuple: (comunidades, resultado) donde:
-            - comunidades: array con nombres de comunidades autónomas
-            - resultado: matriz con poblaciones agrupadas por comunidad
-    """
-    resultado = np.zeros((len(diccionario_comunidades), poblaciones.shape[1]))
-    
-    for i, comunidad in enumerate(diccionario_comunidades): 
-        for j in range(len(provincias)):
-            if provincias[j] in diccionario_comunidades[comunidad]:
-                resultado[i] += poblaciones[j]
+# Gráfico de R3 que se muestra debajo de la tabla (ruta relativa a la página)
+IMAGEN_HTML = "../imagenes/R3.png"
 
-    comunidades = np.array(list(diccionario_comunidades.keys()))
-    return comunidades, resultado
-            
+# Datos de la tabla sin formato (.npz, .csv, .jsonl y .schema.json, ver exportacion.py)
+SALIDA_DATOS = "./resultados/poblacionComAutonomas"
 
-def DiccionarioComunidadProvincia(datos):
-    """
-    Crea un diccionario que mapea cada comunidad autónoma con sus provincias.
-    
-    Parámetros:
-        datos (list): Lista de strings alternando comunidad-provincia
-    
-    Retorna:
-        dict: Diccionario {comunidad: [lista de provincias]}
-    """
-    comunidades_autonomas = {}
-    i = 0
-    
-    while i < len(datos):
-        comunidad = datos[i]
-        provincia = datos[i+1]
+# Ficheros que lee y escribe el informe (los usa el planificador de main.py)
+ENTRADAS = [func.RUTA_POBLACION, func.RUTA_COMUNIDADES]
+SALIDAS = [SALIDA_HTML] + exportacion.RutasDatos(SALIDA_DATOS)
 
-        if comunidad not in comunidades_autonomas:
-            comunidades_autonomas[comunidad] = []
-        comunidades_autonomas[comunidad].append(provincia)
 
-        i += 2  # Saltar a la siguiente comunidad autónoma
-    
-    return comunidades_autonomas
+# Texto de la cabecera de cada sexo del cubo
+ETIQUETAS_SEXOS = {"Total": "Total", "Hombres": "Hombre", "Mujeres": "Mujer"}
 
 
-def CrearCabecera(total, hombres, mujeres):
+def CrearCabecera(anos, sexos=("Total", "Hombres", "Mujeres")):
     """
     Genera la cabecera HTML para la tabla de población por comunidades autónomas.
     
     Parámetros:
-        total (numpy.ndarray): Datos de población total
-        hombres (numpy.ndarray): Datos de población de hombres
-        mujeres (numpy.ndarray): Datos de población de mujeres
+        anos (numpy.ndarray): Años de la tabla
+        sexos (tuple[str]): Sexos de la tabla, en el orden de las columnas
     
     Retorna:
         str: Código HTML de la cabecera de la tabla
     """
-    cabecera = "<tr>"
-    cabecera += '<th rowspan="2" style="width:100px;">CCAA</th>'
-    cabecera += f'<th colspan="{total.shape[1]}" class="group-header">Total</th>'
-    cabecera += f'<th colspan="{hombres.shape[1]}" class="group-header">Hombre</th>'
-    cabecera += f'<th colspan="{mujeres.shape[1]}" class="group-header">Mujer</th>'
-    cabecera += "</tr>"
-
-    # Fila 2: Años individuales
-    cabecera += "<tr>"
-    celdas_ano = "".join([f"<th>{ano}</th>" for ano in range(2017, 2009, -1)])
-    cabecera += celdas_ano * 3
-    cabecera += "</tr>"
-
-    return cabecera 
+    return func.CompilarCabecera(
+        etiqueta="CCAA",
+        niveles=(tuple(ETIQUETAS_SEXOS.get(sexo, sexo) for sexo in sexos),),
+        anos=tuple(anos.tolist()),
+        estilo_etiqueta="width:100px;"
+    )
 
 
-def DatosComuniadesAutonomasProvincias():
+def CrearEsquema(anos, sexos=("Total", "Hombres", "Mujeres")):
     """
-    Lee y procesa el archivo HTML para obtener la relación entre comunidades autónomas y provincias.
-    
-    Parámetros:
-        None
-    
-    Retorna:
-        dict: Diccionario con la estructura {comunidad: [provincias]}
-    """
-    # Leer datos de la página web
-    datos = func.LeerPaginaWeb('./entradas/comunidadAutonoma-Provincia.htm')
-
-    # Limpiar y organizar los datos
-    datos = [d for d in datos if d != '' and d != 'Ciudades    Autónomas:']
-    comunidades_provincias = [datos[i] + " " + datos[i+1] for i in range(0, len(datos), 2)]
-    # Crear diccionario de comunidades autónomas y provincias
-    diccionario_comunidades = DiccionarioComunidadProvincia(comunidades_provincias)
-
-    return diccionario_comunidades
+    Describe las columnas de la tabla de población (las de CrearCabecera) para exportarlas.
 
-
-def QuitarFilaTotales(provincias, total, poblacion_hombres, poblacion_mujeres):
-    """
-    Elimina la fila de totales (primera fila) de los datos de población.
-    
     Parámetros:
-        provincias (numpy.ndarray): Array con nombres de provincias
-        total (numpy.ndarray): Datos de población total (puede ser None)
-        poblacion_hombres (numpy.ndarray): Datos de población de hombres (puede ser None)
-        poblacion_mujeres (numpy.ndarray): Datos de población de mujeres (puede ser None)
-    
+        anos (numpy.ndarray): Años de la tabla
+        sexos (tuple[str]): Sexos de la tabla, en el orden de las columnas
+
     Retorna:
-        tuple: (provincias_sin_total, tabla_concatenada)
+        dict: Esquema de la tabla (ver funciones.CrearEsquema)
     """
-    provincias = provincias[1:]
-
-    arrays_a_concatenar = []
-    if total is not None:
-        arrays_a_concatenar.append(total[1:, :])
-    if poblacion_hombres is not None:
-        arrays_a_concatenar.append(poblacion_hombres[1:, :])
-    if poblacion_mujeres is not None:
-        arrays_a_concatenar.append(poblacion_mujeres[1:, :])
+    return func.CrearEsquema("CCAA", (tuple(sexos),), tuple(anos.tolist()))
 
-    if arrays_a_concatenar:
-        tabla = np.hstack(arrays_a_concatenar)
-    else:
-        tabla = np.empty((len(provincias), 0))  # si no hay nada que concatenar
 
-    return provincias, tabla
-
-
-def TablaPoblacionMediaCCAA(provincias, total, p_hombres, p_mujeres):
+def TablaPoblacionMediaCCAA(provincias, total, p_hombres, p_mujeres, diccionario_comunidades=None):
     """
     Genera una tabla con la población por comunidades autónomas.
     
@@ -151,11 +74,14 @@ def TablaPoblacionMediaCCAA(provincias, total, p_hombres, p_mujeres):
         total (numpy.ndarray): Datos de población total
         p_hombres (numpy.ndarray): Datos de población de hombres
         p_mujeres (numpy.ndarray): Datos de población de mujeres
+        diccionario_comunidades (dict, opcional): Diccionario {comunidad: [provincias]};
+                                                  si no se indica se lee del HTML
     
     Retorna:
         numpy.ndarray: Tabla con comunidades (columna 0) y datos de población
     """
-    diccionario_comunidades = DatosComuniadesAutonomasProvincias()
+    if diccionario_comunidades is None:
+        diccionario_comunidades = DatosComuniadesAutonomasProvincias()
     provincias, tabla = QuitarFilaTotales(provincias, total, p_hombres, p_mujeres)
     
     # Sumar poblaciones por comunidad autónoma
@@ -165,33 +91,81 @@ def TablaPoblacionMediaCCAA(provincias, total, p_hombres, p_mujeres):
     return tabla
 
 
-def R2():
+@perfil.Perfilado
+def AgruparCsvPorComunidadAutonoma(ruta, diccionario_comunidades, tamano_bloque=10000):
+    """
+    Agrupa por comunidad autónoma un CSV de población leyéndolo en streaming.
+
+    Equivale a LeerPoblacionProvincias + QuitarFilaTotales + AgruparProvinciasPorComunidadAutonoma
+    pero sin cargar el fichero completo: las filas se suman a su comunidad a medida que se leen.
+
+    Parámetros:
+        ruta (str): Ruta del CSV con el formato del INE
+        diccionario_comunidades (dict): Diccionario {comunidad: [provincias]}
+        tamano_bloque (int): Número máximo de filas en memoria a la vez
+
+    Retorna:
+        tuple: (comunidades, sumas) igual que AgruparProvinciasPorComunidadAutonoma
+    """
+    return func.AgruparCsvPorBloques(
+        ruta=ruta,
+        delimitador=";",
+        ini="Total Nacional",
+        fin="Notas:",
+        grupos=InvertirDiccionarioComunidades(diccionario_comunidades),
+        tamano_bloque=tamano_bloque
+    )
+
+
+def CrearInforme(cubo, sexos=None, generar=None):
+    """
+    Compone en memoria la página de población de un cubo por CCAA con el gráfico de R3.
+
+    Parámetros:
+        cubo (dict): Cubo de población por CCAA (ver CuboCCAA)
+        sexos (tuple[str], opcional): Sexos de la tabla (por defecto, todos los del cubo)
+        generar (callable, opcional): Función generar(destino, formato) que dibuja el gráfico
+                                      (por defecto, el de R3 con las CCAA del cubo)
+
+    Retorna:
+        dict: Documento (ver funciones.CrearDocumento)
+    """
+    if sexos is None:
+        sexos = cubo["sexos"]
+    if generar is None:
+        generar = functools.partial(r3.DibujarGrafico, cubo)
+
+    # Columnas total | hombres | mujeres (vista del cubo si están todos los sexos)
+    tabla = func.TablaCubo(cubo, None if tuple(sexos) == cubo["sexos"] else sexos)
+
+    documento = func.CrearDocumento(f"Poblacion total de las comunidades autónomas ({func.RangoAnos(cubo['anos'])})")
+    func.AñadirTabla(documento, CrearCabecera(cubo["anos"], tuple(sexos)), cubo["regiones"], tabla,
+                     esquema=CrearEsquema(cubo["anos"], tuple(sexos)))
+    func.AñadirImagen(documento, IMAGEN_HTML, ancho=800, alto=600, generar=generar)
+    return documento
+
+
+def R2(contexto=None):
     """
     Función principal que ejecuta el módulo R2.
     
     Genera un archivo HTML con la población total por comunidades autónomas,
-    desagregada por sexo y años.
+    desagregada por sexo y años, y el gráfico de R3.
     
     Parámetros:
-        None
+        contexto (dict, opcional): Contexto de datos compartido (funciones.CrearContexto)
     
     Retorna:
         None
     """
 
-    # Leer datos de población 
-    provincias, total, p_hombres, p_mujeres = func.LeerPoblacionProvincias('./entradas/poblacionProvinciasHM2010-17.csv')
-    tabla = TablaPoblacionMediaCCAA(provincias, total, p_hombres, p_mujeres)
-
-    # Crear cabecera HTML
-    cabecera = CrearCabecera(total, p_hombres, p_mujeres)
+    if contexto is None:
+        contexto = func.CrearContexto()
 
-    func.GenerarHtml(
-        titulo="Poblacion total de las comunidades autónomas (2011-2017)",
-        cabecera=cabecera,
-        datos=tabla,
-        salida="./resultados/poblacionComAutonomas.html"
-    )
+    # La tabla y el gráfico se componen en memoria y la página se escribe una sola vez
+    documento = CrearInforme(CuboCCAA(contexto))
+    func.EscribirDocumento(documento, SALIDA_HTML)
+    exportacion.EscribirDatos(documento, SALIDA_DATOS)
 
-    print("Página HTML generada en './resultados/poblacionComAutonomas.html'")
+    print(f"Página HTML generada en '{SALIDA_HTML}' (datos en '{SALIDA_DATOS}.*')")
 
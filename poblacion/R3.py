@@ -1,135 +1,143 @@
 """
 R3.py
 Módulo que genera un gráfico de barras comparando población por sexo
-de las 10 comunidades autónomas con mayor población media e inserta
-el gráfico en el HTML de población por comunidades.
+de las 10 comunidades autónomas con mayor población media. El gráfico
+se muestra en la página de población por comunidades que genera R2.
 
 Autores: Jose Daniel Ojeda Tro & Javier Linaje Vallejo
 Fecha: 2025-12-07
 """
-import matplotlib.pyplot as plt
 import numpy as np
 import funciones as func
-from R2 import TablaPoblacionMediaCCAA
+import graficos
+import perfil
+import comunidades
 
-def GraficaBarrasPares(nombres, par1, par2):
+SALIDA_IMAGEN = "./imagenes/R3.png"
+
+# Ficheros que lee y escribe el informe (los usa el planificador de main.py)
+ENTRADAS = [func.RUTA_POBLACION, func.RUTA_COMUNIDADES]
+SALIDAS = [SALIDA_IMAGEN]
+
+
+def DibujarBarrasPares(figura, nombres, par1, par2, ano):
     """
-    Genera una gráfica de barras que muestra la población por sexo en las CCAA para el año 2017.
-    
+    Dibuja en una figura las barras de población por sexo de las CCAA en un año.
+
     Parámetros:
+        figura (matplotlib.figure.Figure): Figura vacía (ver graficos.CrearFigura)
         nombres (list): Lista con los nombres de las comunidades autónomas
         par1 (list): Población de hombres por comunidad
         par2 (list): Población de mujeres por comunidad
-    
+        ano (int): Año de los datos
+
     Retorna:
-        None (guarda el gráfico en ./imagenes/poblacion_por_sexo_ccaa.png)
+        None
     """
-    plt.figure("lineal")
-    plt.title("Polación por sexo en el año 2017 (CCAA)")
+    ejes = figura.add_subplot()
+    ejes.set_title(f"Polación por sexo en el año {ano} (CCAA)")
 
     x = np.arange(len(nombres))
     ancho = 0.20
-    plt.bar(x - ancho/2, par1, width=ancho, label='Hombres', color='blue')
-    plt.bar(x + ancho/2, par2, width=ancho, label='Mujeres', color='red')
+    ejes.bar(x - ancho/2, par1, width=ancho, label='Hombres', color='blue')
+    ejes.bar(x + ancho/2, par2, width=ancho, label='Mujeres', color='red')
 
-    plt.xticks(x, nombres, rotation=80, ha='right')  # cada grupo tiene un nombre
+    ejes.set_xticks(x, nombres, rotation=80, ha='right')  # cada grupo tiene un nombre
 
-    plt.legend()
-    plt.tight_layout()
-    plt.savefig('./imagenes/R3.png')
+    ejes.legend()
+    figura.tight_layout()
 
 
-def AñadirImagenHtml(html_path, imagen_path, ancho=None, alto=None):
+@perfil.Perfilado
+def GraficaBarrasPares(nombres, par1, par2, ano, destino=SALIDA_IMAGEN, formato=None):
     """
-    Añade una imagen al final de un HTML existente, justo antes del cierre del body.
+    Genera una gráfica de barras que muestra la población por sexo en las CCAA para un año.
 
-    Parámetros:
-        html_path (str): Ruta del archivo HTML existente.
-        imagen_path (str): Ruta de la imagen que se quiere insertar.
-        ancho (int, opcional): Ancho de la imagen en píxeles.
-        alto (int, opcional): Alto de la imagen en píxeles.
-    """
-    # Leer el HTML existente
-    with open(html_path, "r", encoding="utf8") as f:
-        html_content = f.read()
-    
-    # Crear el tag de la imagen con atributos opcionales
-    atributos = ""
-    if ancho:
-        atributos += f' width="{ancho}"'
-    if alto:
-        atributos += f' height="{alto}"'
-    
-    img_tag = f'<img src="{imagen_path}"{atributos} style="display:block; margin:20px auto;">\n'
+    La imagen se dibuja con graficos.py: si los datos no han cambiado se copia de la caché.
     
-    # Insertar la imagen justo antes de </body>
-    if "</body>" in html_content:
-        html_content = html_content.replace("</body>", img_tag + "</body>")
-    else:
-        # Si no hay body, añadir al final
-        html_content += img_tag
+    Parámetros:
+        nombres (list): Lista con los nombres de las comunidades autónomas
+        par1 (list): Población de hombres por comunidad
+        par2 (list): Población de mujeres por comunidad
+        ano (int): Año de los datos
+        destino (str | file): Ruta de la imagen o buffer en memoria (ver graficos.Dibujar)
+        formato (str, opcional): Formato de la imagen ("png" o "svg")
     
-    # Guardar el HTML modificado
-    with open(html_path, "w", encoding="utf8") as f:
-        f.write(html_content)
+    Retorna:
+        None (guarda el gráfico en destino)
+    """
+    datos = {"nombres": list(nombres), "par1": list(par1), "par2": list(par2), "ano": ano}
+    graficos.Dibujar(DibujarBarrasPares, datos, destino, formato)
 
 
-def ObtenerTopCCAA(tabla, n=10):
+def ObtenerTopCCAA(cubo, n=10):
     """
     Filtra y ordena las comunidades autónomas por población media.
     
     Parámetros:
-        tabla (numpy.ndarray): Tabla con CCAA y datos de población
-                               Primera columna: nombres de CCAA
-                               Columnas 1:9: datos de población total (años 2010-2017)
+        cubo (dict): Cubo de población por CCAA (ver comunidades.CuboCCAA)
         n (int): Número de CCAA a retornar (por defecto 10)
     
     Retorna:
-        numpy.ndarray: Tabla filtrada con las n CCAA de mayor población media
+        dict: Cubo con las n CCAA de mayor población media total de todos los años,
+              de mayor a menor
     """
-    # Calcular las medias de población (columnas 1:9 corresponden al total 2010-2017)
-    medias = np.mean(tabla[:, 1:9].astype(float), axis=1)
-    
-    # Obtener los índices de las n CCAA con mayor media (ordenadas de mayor a menor)
-    orden = np.argsort(medias)[-n:][::-1]
-    
-    # Filtrar la tabla
-    tabla_filtrada = tabla[orden]
-    
-    return tabla_filtrada
+    return func.TopRegionesCubo(cubo, n, sexo="Total")
 
 
-def R3():
+def DibujarGrafico(cubo, destino=SALIDA_IMAGEN, formato=None):
     """
-    Función principal que ejecuta el módulo R3.
-    
-    Genera un gráfico de barras comparando la población por sexo de las 10 CCAA
-    con mayor población media en 2017 y lo inserta en el HTML de R2.
+    Dibuja el gráfico de barras por sexo (año más reciente) de las 10 CCAA del cubo con mayor población media.
 
     Parámetros:
-        None
+        cubo (dict): Cubo de población por CCAA (ver comunidades.CuboCCAA), completo o filtrado
+        destino (str | file): Ruta de la imagen o buffer en memoria
+        formato (str, opcional): Formato de la imagen ("png" o "svg")
 
     Retorna:
         None
     """
-    provincias, total, p_hombres, p_mujeres = func.LeerPoblacionProvincias('./entradas/poblacionProvinciasHM2010-17.csv')
-    tabla = TablaPoblacionMediaCCAA(provincias, total, p_hombres, p_mujeres)
-
-    tabla = ObtenerTopCCAA(tabla, n=10)
+    top = ObtenerTopCCAA(cubo, n=10)
 
     # Quitamos los codigos de las comunidades autónomas
-    comunidades_sin_cod = list([s[3:] for s in tabla[:, 0]])
+    comunidades_sin_cod = [s[3:] for s in top["regiones"].tolist()]
+
+    # Población del año más reciente (primera columna de años del CSV)
+    hombres = func.SexoCubo(top, "Hombres")[:, 0].tolist()
+    mujeres = func.SexoCubo(top, "Mujeres")[:, 0].tolist()
+
+    GraficaBarrasPares(comunidades_sin_cod, hombres, mujeres, int(top["anos"][0]), destino, formato)
+
 
-    diccionario = {str(comunidades_sin_cod[i]): {'Hombres': float(tabla[i][9]),'Mujeres' : float(tabla[i][17])} for i in range(len(tabla))}
+def GraficoTopCCAA(contexto, destino=SALIDA_IMAGEN, formato=None):
+    """
+    Dibuja el gráfico de R3 con todas las CCAA del contexto (ver DibujarGrafico).
+
+    Parámetros:
+        contexto (dict): Contexto de datos compartido (funciones.CrearContexto)
+        destino (str | file): Ruta de la imagen o buffer en memoria
+        formato (str, opcional): Formato de la imagen ("png" o "svg")
 
-    hombres = [diccionario[com]['Hombres'] for com in comunidades_sin_cod]
-    mujeres = [diccionario[com]['Mujeres'] for com in comunidades_sin_cod]
+    Retorna:
+        None
+    """
+    DibujarGrafico(comunidades.CuboCCAA(contexto), destino, formato)
 
-    GraficaBarrasPares(comunidades_sin_cod, hombres, mujeres)
 
-    AñadirImagenHtml(
-        html_path="./resultados/poblacionComAutonomas.html",
-        imagen_path="../imagenes/R3.png",
-        ancho=800,
-        alto=600
-    )
\ No newline at end of file
+def R3(contexto=None):
+    """
+    Función principal que ejecuta el módulo R3.
+    
+    Genera un gráfico de barras comparando la población por sexo de las 10 CCAA
+    con mayor población media en 2017 (la página de R2 ya enlaza la imagen).
+
+    Parámetros:
+        contexto (dict, opcional): Contexto de datos compartido (funciones.CrearContexto)
+
+    Retorna:
+        None
+    """
+    if contexto is None:
+        contexto = func.CrearContexto()
+
+    GraficoTopCCAA(contexto)
\ No newline at end of file
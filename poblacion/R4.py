@@ -7,108 +7,120 @@ resultados.
 Autores: Jose Daniel Ojeda Tro & Javier Linaje Vallejo 
 Fecha: 2025-12-06
 """
+import functools
 import numpy as np
+import exportacion
 import funciones as func
 from R1 import CalcularVariacionAbsoluta, CalcularVariacionRelativa
-import R2 as r2
+import comunidades
+import R5 as r5
 
+SALIDA_HTML = "./resultados/variacionComAutonomas.html"
 
-def SepararPorSexos(sumas, num_anos):
-    """
-    Separa la matriz de sumas agrupadas en Hombres y Mujeres.
-    
-    Parámetros:
-        sumas (numpy.ndarray): Matriz con poblaciones agrupadas por CCAA
-        num_anos (int): Número de columnas que corresponden a cada sexo
-    
-    Retorna:
-        tuple: (ccaa_hombres, ccaa_mujeres)
-    """
-    ccaa_hombres = sumas[:, :num_anos]
-    ccaa_mujeres = sumas[:, num_anos:]
-    
-    return ccaa_hombres, ccaa_mujeres
+# Gráfico de R5 que se muestra debajo de la tabla (ruta relativa a la página)
+IMAGEN_HTML = "../imagenes/R5.png"
+
+# Datos de la tabla sin formato (.npz, .csv, .jsonl y .schema.json, ver exportacion.py)
+SALIDA_DATOS = "./resultados/variacionComAutonomas"
 
+# Ficheros que lee y escribe el informe (los usa el planificador de main.py)
+ENTRADAS = [func.RUTA_POBLACION, func.RUTA_COMUNIDADES]
+SALIDAS = [SALIDA_HTML] + exportacion.RutasDatos(SALIDA_DATOS)
 
-def CrearCabecera(var_abs_hombres, var_rel_hombres, var_abs_mujeres, var_rel_mujeres):
+
+def CrearCabecera(anos, sexos=("Hombres", "Mujeres")):
     """
     Genera la cabecera HTML para la tabla de variaciones por sexo.
     
     Parámetros:
-        var_abs_hombres (numpy.ndarray): Variación absoluta de hombres
-        var_rel_hombres (numpy.ndarray): Variación relativa de hombres
-        var_abs_mujeres (numpy.ndarray): Variación absoluta de mujeres
-        var_rel_mujeres (numpy.ndarray): Variación relativa de mujeres
+        anos (numpy.ndarray): Años de las variaciones (todos menos el más antiguo)
+        sexos (tuple[str]): Sexos de la tabla
     
     Retorna:
         str: Cabecera HTML con estructura de 3 filas
     """
-    cabecera = "<tr>"
-    cabecera += '<th rowspan="3">CCAA</th>'
-    cabecera += f'<th colspan="{(var_abs_hombres.shape[1] + var_abs_mujeres.shape[1])}" class="group-header">Variación Absoluta</th>'
-    cabecera += f'<th colspan="{(var_rel_hombres.shape[1] + var_rel_mujeres.shape[1])}" class="group-header">Variación Relativa</th>'
-    cabecera += "</tr>"
+    return func.CompilarCabecera(
+        etiqueta="CCAA",
+        niveles=(("Variación Absoluta", "Variación Relativa"), tuple(sexos)),
+        anos=tuple(anos.tolist())
+    )
 
-    cabecera += "<tr>"
-    cabecera += f'<th colspan="{var_abs_hombres.shape[1]}" class="group-header">Hombres</th>'
-    cabecera += f'<th colspan="{var_abs_mujeres.shape[1]}" class="group-header">Mujeres</th>'
-    cabecera += f'<th colspan="{var_rel_hombres.shape[1]}" class="group-header">Hombres</th>'
-    cabecera += f'<th colspan="{var_rel_mujeres.shape[1]}" class="group-header">Mujeres</th>'
-    cabecera += "</tr>"
 
-    cabecera += "<tr>"
-    celdas_ano = "".join(f"<th>{ano}</th>" for ano in range(2017, 2010, -1))
+def CrearEsquema(anos, sexos=("Hombres", "Mujeres")):
+    """
+    Describe las columnas de la tabla de variaciones por sexo (las de CrearCabecera) para exportarlas.
+
+    Parámetros:
+        anos (numpy.ndarray): Años de las variaciones (todos menos el más antiguo)
+        sexos (tuple[str]): Sexos de la tabla
 
-    cabecera += celdas_ano * 4
-    cabecera += "</tr>"
-    return cabecera 
+    Retorna:
+        dict: Esquema de la tabla (ver funciones.CrearEsquema)
+    """
+    return func.CrearEsquema("CCAA", (("Variación Absoluta", "Variación Relativa"), tuple(sexos)), tuple(anos.tolist()))
 
 
-def R4():
+def CrearInforme(cubo, sexos=("Hombres", "Mujeres"), generar=None, variaciones=None):
     """
-    Función principal que ejecuta el módulo R4.
-    
-    Genera un archivo HTML con las variaciones absolutas y relativas
-    de población por Comunidades Autónomas, desagregadas por sexo.
+    Compone en memoria la página de variaciones por sexo de un cubo por CCAA con el gráfico de R5.
+
     Parámetros:
-        None
+        cubo (dict): Cubo de población por CCAA con al menos dos años (ver comunidades.CuboCCAA)
+        sexos (tuple[str]): Sexos de la tabla
+        generar (callable, opcional): Función generar(destino, formato) que dibuja el gráfico
+                                      (por defecto, el de R5 con las CCAA del cubo)
+        variaciones (tuple, opcional): Variaciones (absoluta, relativa) de los sexos ya calculadas,
+                                       matrices (regiones x sexos x años - 1); por defecto se
+                                       calculan del cubo (ver actualizacion.py)
+
     Retorna:
-        None
+        dict: Documento (ver funciones.CrearDocumento)
     """
-    
-    ruta_csv = "./entradas/poblacionProvinciasHM2010-17.csv"
-    provincias, _, poblacion_hombres, poblacion_mujeres = func.LeerPoblacionProvincias(ruta_csv)
-    
-    provincias, tabla = r2.QuitarFilaTotales(provincias, None, poblacion_hombres, poblacion_mujeres)
-    
-    diccionario_comunidades = r2.DatosComuniadesAutonomasProvincias()
-    comunidades, sumas = r2.AgruparProvinciasPorComunidadAutonoma(provincias, tabla, diccionario_comunidades)
+    if generar is None:
+        generar = functools.partial(r5.DibujarGrafico, cubo)
 
-    num_anos = poblacion_hombres.shape[1]
+    if variaciones is None:
+        # Las variaciones se calculan de una vez para todos los sexos a lo largo del eje de años
+        poblacion = cubo["datos"][:, [cubo["sexos"].index(sexo) for sexo in sexos], :]
 
-    ccaa_hombres, ccaa_mujeres = SepararPorSexos(sumas, num_anos)
-
-    var_abs_hombres = CalcularVariacionAbsoluta(ccaa_hombres)
-    var_rel_hombres = CalcularVariacionRelativa(ccaa_hombres, var_abs_hombres)
-
-    var_abs_mujeres = CalcularVariacionAbsoluta(ccaa_mujeres)
-    var_rel_mujeres = CalcularVariacionRelativa(ccaa_mujeres, var_abs_mujeres)
+        var_abs = CalcularVariacionAbsoluta(poblacion)
+        var_rel = CalcularVariacionRelativa(poblacion, var_abs)
+    else:
+        var_abs, var_rel = variaciones
 
+    # Columnas: absoluta (hombres | mujeres) | relativa (hombres | mujeres)
     datos = np.hstack((
-        comunidades.reshape(-1, 1),
-        var_abs_hombres,
-        var_abs_mujeres,
-        var_rel_hombres,
-        var_rel_mujeres
+        var_abs.reshape(len(var_abs), -1),
+        var_rel.reshape(len(var_rel), -1)
     ))
     
-    cabecera = CrearCabecera(var_abs_hombres, var_rel_hombres, var_abs_mujeres, var_rel_mujeres)
+    anos = cubo["anos"][:-1]
+    cabecera = CrearCabecera(anos, tuple(sexos))
     
-    func.GenerarHtml(
-        titulo="Variación de Población por Comunidades Autónomas y Sexos (2011-2017)",
-        cabecera=cabecera,
-        datos=datos,
-        salida="./resultados/variacionComAutonomas.html"
-    )
+    documento = func.CrearDocumento(f"Variación de Población por Comunidades Autónomas y Sexos ({func.RangoAnos(anos)})")
+    func.AñadirTabla(documento, cabecera, cubo["regiones"], datos, esquema=CrearEsquema(anos, tuple(sexos)))
+    func.AñadirImagen(documento, IMAGEN_HTML, ancho=1000, alto=600, generar=generar)
+    return documento
+
+
+def R4(contexto=None):
+    """
+    Función principal que ejecuta el módulo R4.
+    
+    Genera un archivo HTML con las variaciones absolutas y relativas
+    de población por Comunidades Autónomas, desagregadas por sexo, y el gráfico de R5.
+    Parámetros:
+        contexto (dict, opcional): Contexto de datos compartido (funciones.CrearContexto)
+    Retorna:
+        None
+    """
+    if contexto is None:
+        contexto = func.CrearContexto()
+
+    # Cubo por CCAA ya agregado en el contexto; la tabla y el gráfico se componen en
+    # memoria y la página se escribe una sola vez
+    documento = CrearInforme(comunidades.CuboCCAA(contexto))
+    func.EscribirDocumento(documento, SALIDA_HTML)
+    exportacion.EscribirDatos(documento, SALIDA_DATOS)
 
-    print("Página HTML generada en './resultados/variacionComAutonomas.html'")
\ No newline at end of file
+    print(f"Página HTML generada en '{SALIDA_HTML}' (datos en '{SALIDA_DATOS}.*')")
\ No newline at end of file
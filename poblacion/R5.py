@@ -2,82 +2,223 @@
 R5.py
 Módulo que genera un gráfico de líneas mostrando la evolución de la población total
 (2010-2017) para las 10 comunidades autónomas con mayor población media.
-El gráfico se inserta en el HTML de variación por comunidades autónomas.
+El gráfico se muestra en la página de variación por comunidades autónomas que genera R4.
 
 Autores: Jose Daniel Ojeda Tro & Javier Linaje Vallejo 
 Fecha: 2025-12-07
 """
-import matplotlib.pyplot as plt
+import os
+import numpy as np
 import funciones as func
-from R2 import TablaPoblacionMediaCCAA
-from R3 import ObtenerTopCCAA, AñadirImagenHtml
+import graficos
+import perfil
+from comunidades import CuboCCAA
+from R3 import ObtenerTopCCAA
 
+SALIDA_IMAGEN = "./imagenes/R5.png"
 
-def GraficoLineasEvolucion(nombres, datos_totales):
+# Directorio de los gráficos pequeños de cada CCAA (ver GraficosCCAA)
+DIRECTORIO_CCAA = "./imagenes/ccaa"
+
+# Ficheros que lee y escribe el informe (los usa el planificador de main.py); con
+# ccaa=True (main.py --ccaa) escribe además SALIDAS_CCAA
+ENTRADAS = [func.RUTA_POBLACION, func.RUTA_COMUNIDADES]
+SALIDAS = [SALIDA_IMAGEN]
+SALIDAS_CCAA = [DIRECTORIO_CCAA]
+
+
+def DibujarLineasEvolucion(figura, nombres, datos_totales, anos, titulo, poblacion):
     """
-    Genera un gráfico de líneas mostrando la evolución de población total 
-    para las CCAA indicadas durante el período 2010-2017.
-    
+    Dibuja en una figura una línea de evolución de la población por cada CCAA.
+
     Parámetros:
+        figura (matplotlib.figure.Figure): Figura vacía (ver graficos.CrearFigura)
         nombres (list): Lista con los nombres de las CCAA
-        datos_totales (numpy.ndarray): Matriz con datos de población total (años 2010-2017)
-                                        Forma: (n_ccaa, 8 años)
-    
+        datos_totales (numpy.ndarray): Matriz (n_ccaa, n_años) con la población
+        anos (numpy.ndarray): Año de cada columna de datos_totales
+        titulo (str): Título del gráfico
+        poblacion (str): Texto del eje de la población ("Población Total", "Población (Hombres)", ...)
+
     Retorna:
-        None (guarda el gráfico en ./imagenes/evolucion_poblacion_ccaa.png)
+        None
     """
-    plt.figure(figsize=(12, 6))
-    plt.title("Evolución de la Población Total por CCAA (2010-2017)")
+    ejes = figura.add_subplot()
+    ejes.set_title(titulo)
     
-    años = list(range(2010, 2018))  # 2010 a 2017 inclusive
+    # Las columnas pueden venir del año más reciente al más antiguo (como en el CSV)
+    orden = np.argsort(anos)
+    años = np.asarray(anos)[orden]
     
     # Dibujar una línea por cada CCAA
     for i, nombre in enumerate(nombres):
-        plt.plot(años, datos_totales[i], marker='o', label=nombre, linewidth=2)
+        ejes.plot(años, datos_totales[i][orden], marker='o', label=nombre, linewidth=2)
     
-    plt.xlabel("Año")
-    plt.ylabel("Población Total")
-    plt.legend(loc='best', fontsize=8)
-    plt.grid(True, alpha=0.3)
-    plt.tight_layout()
-    
-    plt.savefig('./imagenes/R5.png')
-    print("Gráfico guardado en './imagenes/R5.png'")
+    ejes.set_xlabel("Año")
+    ejes.set_ylabel(poblacion)
+    ejes.legend(loc='best', fontsize=8)
+    ejes.grid(True, alpha=0.3)
+    figura.tight_layout()
 
 
-def R5():
+@perfil.Perfilado
+def GraficoLineasEvolucion(nombres, datos_totales, anos, destino=SALIDA_IMAGEN, formato=None, sexo="Total"):
     """
-    Función principal que ejecuta el módulo R5.
-    
-    Genera un gráfico de líneas con la evolución de población de las 10 CCAA
-    con mayor población media y lo inserta en el HTML de variación por comunidades.
+    Genera un gráfico de líneas mostrando la evolución de población total 
+    para las CCAA indicadas durante el período de los datos.
+
+    La imagen se dibuja con graficos.py: si los datos no han cambiado se copia de la caché.
     
     Parámetros:
-        None
+        nombres (list): Lista con los nombres de las CCAA
+        datos_totales (numpy.ndarray): Matriz con datos de población total
+                                        Forma: (n_ccaa, n_años)
+        anos (numpy.ndarray): Año de cada columna de datos_totales
+        destino (str | file): Ruta de la imagen o buffer en memoria (ver graficos.Dibujar)
+        formato (str, opcional): Formato de la imagen ("png" o "svg")
+        sexo (str): Sexo de los datos, para el título ("Total", "Hombres" o "Mujeres")
     
+    Retorna:
+        None (guarda el gráfico en destino)
+    """
+    # Los textos se calculan aquí: la clave de la caché solo incluye el código de este módulo
+    poblacion = "Población Total" if sexo == "Total" else f"Población ({sexo})"
+    datos = {
+        "nombres": list(nombres),
+        "datos_totales": np.asarray(datos_totales),
+        "anos": np.asarray(anos),
+        "titulo": f"Evolución de la {poblacion} por CCAA ({func.RangoAnos(anos)})",
+        "poblacion": poblacion,
+    }
+    graficos.Dibujar(DibujarLineasEvolucion, datos, destino, formato, estilo={"figsize": (12, 6)})
+    if isinstance(destino, str):
+        print(f"Gráfico guardado en '{destino}'")
+
+
+def DibujarGrafico(cubo, destino=SALIDA_IMAGEN, formato=None, sexo="Total"):
+    """
+    Dibuja el gráfico de evolución de las 10 CCAA del cubo con mayor población media.
+
+    Parámetros:
+        cubo (dict): Cubo de población por CCAA (ver comunidades.CuboCCAA), completo o filtrado
+        destino (str | file): Ruta de la imagen o buffer en memoria
+        formato (str, opcional): Formato de la imagen ("png" o "svg")
+        sexo (str): Sexo cuya evolución se dibuja
+
     Retorna:
         None
     """
-    provincias, total, p_hombres, p_mujeres = func.LeerPoblacionProvincias('./entradas/poblacionProvinciasHM2010-17.csv')
-    
-    tabla = TablaPoblacionMediaCCAA(provincias, total, p_hombres, p_mujeres)
-    
-    tabla_top10 = ObtenerTopCCAA(tabla, n=10)
+    top10 = ObtenerTopCCAA(cubo, n=10)
     
-    comunidades_sin_cod = [s[3:] for s in tabla_top10[:, 0]]
+    comunidades_sin_cod = [s[3:] for s in top10["regiones"].tolist()]
     
-    # Extraer datos de población total (columnas 1:9 corresponden a 2010-2017)
-    datos_totales = tabla_top10[:, 1:9].astype(float)
+    # Población de todos los años
+    datos_totales = func.SexoCubo(top10, sexo)
     
     # Generar gráfico de líneas
-    GraficoLineasEvolucion(comunidades_sin_cod, datos_totales)
+    GraficoLineasEvolucion(comunidades_sin_cod, datos_totales, top10["anos"], destino, formato, sexo)
+
+
+def DibujarEvolucionSexos(figura, titulo, datos, anos, sexos):
+    """
+    Dibuja en una figura pequeña la evolución de la población de una CCAA por sexo.
+
+    Parámetros:
+        figura (matplotlib.figure.Figure): Figura vacía (ver graficos.CrearFigura)
+        titulo (str): Título del gráfico (nombre de la CCAA y años)
+        datos (numpy.ndarray): Matriz (sexos x años) con la población
+        anos (numpy.ndarray): Año de cada columna de datos
+        sexos (tuple[str]): Sexo de cada fila de datos
+
+    Retorna:
+        None
+    """
+    ejes = figura.add_subplot()
+    ejes.set_title(titulo, fontsize=10)
+
+    orden = np.argsort(anos)
+    años = np.asarray(anos)[orden]
+    for fila, sexo in zip(datos, sexos):
+        ejes.plot(años, fila[orden], marker='o', markersize=3, label=sexo)
+
+    ejes.tick_params(labelsize=7)
+    ejes.legend(fontsize=7)
+    ejes.grid(True, alpha=0.3)
+    figura.tight_layout()
+
+
+@perfil.Perfilado
+def GraficosCCAA(cubo, directorio=DIRECTORIO_CCAA, formato="png", procesos=None):
+    """
+    Dibuja en paralelo un gráfico pequeño con la evolución por sexo de cada CCAA del cubo.
+
+    Los gráficos se reparten entre los procesos de un pool (ver graficos.DibujarVarios)
+    y los que no han cambiado se copian de la caché.
+
+    Parámetros:
+        cubo (dict): Cubo de población por CCAA (ver comunidades.CuboCCAA)
+        directorio (str): Directorio de las imágenes (se crea si no existe)
+        formato (str): Formato de las imágenes ("png" o "svg")
+        procesos (int, opcional): Número de procesos (por defecto, uno por CPU; 1 = en este proceso)
+
+    Retorna:
+        list[str]: Rutas de las imágenes, "ccaa-<código>.<formato>", en el orden del cubo
+    """
+    os.makedirs(directorio, exist_ok=True)
+
+    rango_anos = func.RangoAnos(cubo["anos"])
+    trabajos = []
+    for fila, (region, codigo) in enumerate(zip(cubo["regiones"].tolist(), func.CodigosEtiquetas(cubo["regiones"]).tolist())):
+        trabajos.append({
+            "dibujar": DibujarEvolucionSexos,
+            "datos": {
+                "titulo": f"{region[3:] if codigo >= 0 else region} ({rango_anos})",
+                "datos": np.asarray(cubo["datos"][fila], dtype=np.float64),
+                "anos": np.asarray(cubo["anos"]),
+                "sexos": cubo["sexos"],
+            },
+            "destino": os.path.join(directorio, f"ccaa-{codigo if codigo >= 0 else fila:02d}.{formato}"),
+            "formato": formato,
+            "estilo": {"figsize": (4, 3)},
+        })
+
+    graficos.DibujarVarios(trabajos, procesos)
+    return [trabajo["destino"] for trabajo in trabajos]
+
+
+def GraficoEvolucionCCAA(contexto, destino=SALIDA_IMAGEN, formato=None):
+    """
+    Dibuja el gráfico de R5 con todas las CCAA del contexto (ver DibujarGrafico).
+
+    Parámetros:
+        contexto (dict): Contexto de datos compartido (funciones.CrearContexto)
+        destino (str | file): Ruta de la imagen o buffer en memoria
+        formato (str, opcional): Formato de la imagen ("png" o "svg")
+
+    Retorna:
+        None
+    """
+    DibujarGrafico(CuboCCAA(contexto), destino, formato)
+
+
+def R5(contexto=None, ccaa=False):
+    """
+    Función principal que ejecuta el módulo R5.
+    
+    Genera un gráfico de líneas con la evolución de población de las 10 CCAA
+    con mayor población media (la página de R4 ya enlaza la imagen) y, con
+    ccaa=True, un gráfico pequeño por CCAA en DIRECTORIO_CCAA (ver GraficosCCAA).
     
-    # Insertar imagen en el HTML de R4
-    AñadirImagenHtml(
-        html_path="./resultados/variacionComAutonomas.html",
-        imagen_path="../imagenes/R5.png",
-        ancho=1000,
-        alto=600
-    )
+    Parámetros:
+        contexto (dict, opcional): Contexto de datos compartido (funciones.CrearContexto)
+        ccaa (bool): Si es True se dibujan también los gráficos por CCAA
     
-    print("Gráfico añadido a './resultados/variacionComAutonomas.html'")
+    Retorna:
+        None
+    """
+    if contexto is None:
+        contexto = func.CrearContexto()
+
+    GraficoEvolucionCCAA(contexto)
+    if ccaa:
+        rutas = GraficosCCAA(CuboCCAA(contexto))
+        print(f"{len(rutas)} gráficos por CCAA guardados en '{DIRECTORIO_CCAA}'")
@@ -0,0 +1,476 @@
+"""
+actualizacion.py
+Almacén de los datos de población por años para añadir un año nuevo sin recalcular la serie.
+
+El almacén es un directorio con un fichero .npy por nivel territorial, dato y año
+(población, variación absoluta y variación relativa, cada uno una matriz
+región x sexo) y un índice JSON con las regiones de cada nivel, los sexos y los
+años. Se crea una vez a partir de la jerarquía de los ficheros de entrada (ver
+jerarquia.py). Cuando el INE publica un año nuevo, AnadirAno:
+
+- lee solo la columna del año nuevo y la del año anterior (memoria mapeada),
+- calcula los agregados de los niveles superiores (provincia, CCAA, nacional) y
+  las variaciones respecto al año anterior solo para ese año,
+- comprueba los totales publicados en el fichero del año nuevo y
+- escribe los ficheros del año y después el índice (que es lo que lo hace visible).
+
+Así el coste de añadir un año depende del número de regiones y no del número de
+años de la serie. Los informes R1-R5 se vuelven a escribir con los datos del
+almacén sin recalcular las variaciones de los años anteriores, y se anota en el
+manifiesto de planificador.py. El CSV de entrada de main.py solo se reescribe si
+se pide con --escribir-csv; si no, main.py vuelve a generar los informes con sus
+propias entradas la próxima vez que se ejecute.
+
+Uso:
+    python actualizacion.py crear [--almacen DIRECTORIO]
+    python actualizacion.py anadir CSV [--almacen DIRECTORIO] [--sin-informes] [--escribir-csv RUTA]
+
+Autores: Jose Daniel Ojeda Tro & Javier Linaje Vallejo
+Fecha: 2026-10-18
+"""
+import argparse
+import json
+import os
+import time
+import numpy as np
+import comunidades
+import exportacion
+import funciones as func
+import graficos
+import jerarquia
+import perfil
+import planificador
+import R1 as r1
+import R2 as r2
+import R3 as r3
+import R4 as r4
+import R5 as r5
+
+
+DIRECTORIO_ALMACEN = "./almacen"
+
+NOMBRE_INDICE = "indice.json"
+
+# Se incrementa cuando cambia el formato del almacén
+VERSION_ALMACEN = 1
+
+DATOS = ("poblacion", "variacion_absoluta", "variacion_relativa")
+
+
+def RutaColumna(directorio, nivel, dato, ano):
+    """
+    Devuelve la ruta del fichero de un dato de un nivel en un año.
+
+    Parámetros:
+        directorio (str): Directorio del almacén.
+        nivel (str): Nivel territorial.
+        dato (str): Uno de DATOS.
+        ano (int): Año.
+
+    Retorna:
+        str: Ruta del fichero .npy.
+    """
+    return os.path.join(directorio, nivel, f"{dato}-{ano}.npy")
+
+
+def GuardarArray(ruta, valores):
+    """
+    Guarda un array como .npy de forma atómica (fichero temporal + renombrado).
+
+    Parámetros:
+        ruta (str): Ruta del fichero.
+        valores (numpy.ndarray): Array a guardar.
+
+    Retorna:
+        None
+    """
+    temporal = ruta + ".tmp"
+    with open(temporal, "wb") as f:
+        np.save(f, valores)
+    os.replace(temporal, ruta)
+
+
+def LeerIndice(directorio):
+    """
+    Lee el índice del almacén.
+
+    Parámetros:
+        directorio (str): Directorio del almacén.
+
+    Retorna:
+        dict: {"version", "sexos", "anos" (del más reciente al más antiguo), "niveles": {nivel: [regiones]}}
+
+    Excepciones:
+        ValueError: Si el directorio no tiene un almacén o es de otra versión.
+    """
+    try:
+        with open(os.path.join(directorio, NOMBRE_INDICE), encoding="utf8") as f:
+            indice = json.load(f)
+    except OSError:
+        raise ValueError(f"'{directorio}' no tiene un almacén (ver CrearAlmacen)") from None
+
+    if indice.get("version") != VERSION_ALMACEN:
+        raise ValueError(f"El almacén '{directorio}' es de otra versión; hay que volver a crearlo")
+    return indice
+
+
+def GuardarIndice(directorio, indice):
+    """
+    Escribe el índice del almacén de forma atómica.
+
+    Parámetros:
+        directorio (str): Directorio del almacén.
+        indice (dict): Índice (ver LeerIndice).
+
+    Retorna:
+        None
+    """
+    func.EscribirFicheroAtomico(
+        os.path.join(directorio, NOMBRE_INDICE),
+        lambda f: json.dump(indice, f, indent=2, ensure_ascii=False),
+    )
+
+
+def GruposNivel(niveles, nivel, inferior, provincia_comunidad):
+    """
+    Calcula a qué región de un nivel pertenece cada región del nivel inferior.
+
+    Parámetros:
+        niveles (dict): Cubos de los niveles (ver jerarquia.CrearJerarquia).
+        nivel (str): Nivel de los grupos ("provincia", "ccaa" o "nacional").
+        inferior (str): Nivel que se agrupa.
+        provincia_comunidad (dict): Diccionario {provincia: comunidad} (ver comunidades.MapaProvinciaComunidad).
+
+    Retorna:
+        numpy.ndarray: Fila del nivel de cada región del nivel inferior (-1 = sin grupo).
+    """
+    regiones = niveles[inferior]["regiones"]
+
+    if nivel == "nacional":
+        return np.zeros(len(regiones), dtype=np.intp)
+    if nivel == "ccaa":
+        return func.IndiceGrupos(regiones, func.CompilarGrupos(provincia_comunidad))
+
+    # Provincia de cada municipio: las dos primeras cifras de su código
+    indice = jerarquia.IndiceRegiones(niveles[nivel]["regiones"])
+    return np.array([indice.get(codigo, -1) for codigo in (func.CodigosEtiquetas(regiones) // 1000).tolist()], dtype=np.intp)
+
+
+@perfil.Perfilado
+def CrearAlmacen(datos_jerarquia, provincia_comunidad, directorio=DIRECTORIO_ALMACEN):
+    """
+    Crea el almacén con todos los años de una jerarquía (se calculan una sola vez).
+
+    Parámetros:
+        datos_jerarquia (dict): Jerarquía creada con jerarquia.CrearJerarquia (p. ej. comunidades.JerarquiaPoblacion).
+        provincia_comunidad (dict): Diccionario {provincia: comunidad} con el que se creó.
+        directorio (str): Directorio del almacén (se sustituye el índice si ya existe).
+
+    Retorna:
+        dict: Índice del almacén (ver LeerIndice).
+    """
+    niveles = datos_jerarquia["niveles"]
+    presentes = [nivel for nivel in jerarquia.NIVELES if nivel in niveles]
+    anos = niveles["nacional"]["anos"].tolist()
+
+    for i, nivel in enumerate(presentes):
+        os.makedirs(os.path.join(directorio, nivel), exist_ok=True)
+        poblacion = np.asarray(niveles[nivel]["datos"], dtype=np.float64)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            absoluta = r1.CalcularVariacionAbsoluta(poblacion)
+            relativa = r1.CalcularVariacionRelativa(poblacion, absoluta)
+
+        for j, ano in enumerate(anos):
+            GuardarArray(RutaColumna(directorio, nivel, "poblacion", ano), poblacion[..., j])
+            # El año más antiguo no tiene variación
+            if j < len(anos) - 1:
+                GuardarArray(RutaColumna(directorio, nivel, "variacion_absoluta", ano), absoluta[..., j])
+                GuardarArray(RutaColumna(directorio, nivel, "variacion_relativa", ano), relativa[..., j])
+
+        if i > 0:
+            GuardarArray(os.path.join(directorio, nivel, "grupos.npy"), GruposNivel(niveles, nivel, presentes[i - 1], provincia_comunidad))
+
+    indice = {
+        "version": VERSION_ALMACEN,
+        "sexos": list(niveles["nacional"]["sexos"]),
+        "anos": anos,
+        "niveles": {nivel: niveles[nivel]["regiones"].tolist() for nivel in presentes},
+    }
+    GuardarIndice(directorio, indice)
+    return indice
+
+
+def ColumnaBase(indice, cubo_ano):
+    """
+    Ordena los datos del año nuevo como las regiones y sexos del nivel inferior del almacén.
+
+    Las regiones se buscan por su código INE o, si no tienen, por su etiqueta.
+
+    Parámetros:
+        indice (dict): Índice del almacén.
+        cubo_ano (dict): Cubo de población con solo el año nuevo.
+
+    Retorna:
+        numpy.ndarray: Matriz (regiones x sexos) en float64.
+
+    Excepciones:
+        ValueError: Si faltan regiones o sexos del almacén en el año nuevo.
+    """
+    base = next(iter(indice["niveles"]))
+    etiquetas = np.array(indice["niveles"][base], dtype=str)
+    filas_ano = jerarquia.IndiceRegiones(cubo_ano["regiones"])
+
+    claves = [codigo if codigo >= 0 else etiqueta for etiqueta, codigo in zip(etiquetas.tolist(), func.CodigosEtiquetas(etiquetas).tolist())]
+    faltan = [str(clave) for clave in claves if clave not in filas_ano]
+    if faltan:
+        raise ValueError(f"Regiones sin dato en el año nuevo: {', '.join(faltan[:10])}" + (" ..." if len(faltan) > 10 else ""))
+
+    faltan = [sexo for sexo in indice["sexos"] if sexo not in cubo_ano["sexos"]]
+    if faltan:
+        raise ValueError(f"Sexos sin dato en el año nuevo: {', '.join(faltan)}")
+
+    filas = [filas_ano[clave] for clave in claves]
+    sexos = [cubo_ano["sexos"].index(sexo) for sexo in indice["sexos"]]
+    return np.asarray(cubo_ano["datos"], dtype=np.float64)[np.ix_(filas, sexos, [0])][..., 0]
+
+
+def ComprobarTotalesAno(indice, columnas, cubo_ano, estricto=False):
+    """
+    Comprueba los agregados del año nuevo con los totales publicados en su fichero
+    (la fila "Total Nacional" y, si el almacén es municipal, las filas de provincia).
+
+    Parámetros:
+        indice (dict): Índice del almacén.
+        columnas (dict): Columnas calculadas {nivel: matriz (regiones x sexos)}.
+        cubo_ano (dict): Cubo de población con solo el año nuevo.
+        estricto (bool): Si es True una diferencia es un error en lugar de un aviso.
+
+    Retorna:
+        None
+
+    Excepciones:
+        ValueError: Si es estricto y algún total publicado no coincide (ver jerarquia.ComprobarTotales).
+    """
+    codigos = func.CodigosEtiquetas(cubo_ano["regiones"])
+    sexos = [cubo_ano["sexos"].index(sexo) for sexo in indice["sexos"]]
+    publicados = np.asarray(cubo_ano["datos"])[:, sexos, 0]
+
+    for fila in np.flatnonzero(codigos < 0).tolist():
+        jerarquia.ComprobarTotales(columnas["nacional"][0], publicados[fila], cubo_ano["regiones"][fila], estricto)
+
+    if "municipio" in indice["niveles"]:
+        provincias = jerarquia.IndiceRegiones(np.array(indice["niveles"]["provincia"], dtype=str))
+        for fila in np.flatnonzero((codigos >= 0) & (codigos < 1000)).tolist():
+            calculado = columnas["provincia"][provincias[int(codigos[fila])]] if int(codigos[fila]) in provincias else 0
+            jerarquia.ComprobarTotales(calculado, publicados[fila], cubo_ano["regiones"][fila], estricto)
+
+
+@perfil.Perfilado
+def AnadirAno(cubo_ano, directorio=DIRECTORIO_ALMACEN, estricto=False):
+    """
+    Añade al almacén un año nuevo, posterior a todos los que tiene.
+
+    Solo se leen la columna del año anterior de cada nivel y se calculan los agregados
+    y las variaciones del año nuevo, así que el coste no depende del número de años.
+
+    Parámetros:
+        cubo_ano (dict): Cubo de población con solo el año nuevo (p. ej. el CSV de la
+                         publicación del año, ver funciones.LeerCuboPoblacion), con las
+                         regiones del nivel inferior del almacén.
+        directorio (str): Directorio del almacén.
+        estricto (bool): Si es True una diferencia con los totales publicados es un error
+                         (por defecto solo se avisa).
+
+    Retorna:
+        dict: Índice actualizado del almacén.
+
+    Excepciones:
+        ValueError: Si el cubo no tiene un solo año, el año no es posterior a los del
+                    almacén, faltan regiones o sexos o (si es estricto) los totales
+                    publicados no coinciden.
+    """
+    indice = LeerIndice(directorio)
+
+    if len(cubo_ano["anos"]) != 1:
+        raise ValueError(f"El fichero del año nuevo tiene {len(cubo_ano['anos'])} años y debe tener uno")
+    ano, anterior = int(cubo_ano["anos"][0]), indice["anos"][0]
+    if ano <= anterior:
+        raise ValueError(f"El año {ano} no es posterior al último del almacén ({anterior})")
+
+    # Columna del nivel inferior y agregados de los superiores
+    niveles = list(indice["niveles"])
+    columnas = {niveles[0]: ColumnaBase(indice, cubo_ano)}
+    for inferior, nivel in zip(niveles, niveles[1:]):
+        grupos = np.load(os.path.join(directorio, nivel, "grupos.npy"))
+        columnas[nivel] = func.SumarPorGrupos(columnas[inferior], grupos, len(indice["niveles"][nivel]))
+
+    ComprobarTotalesAno(indice, columnas, cubo_ano, estricto)
+
+    for nivel, columna in columnas.items():
+        # Variaciones respecto al año anterior: mismas fórmulas que R1 sobre los dos años
+        pares = np.stack((columna, np.load(RutaColumna(directorio, nivel, "poblacion", anterior), mmap_mode="r")), axis=-1)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            absoluta = r1.CalcularVariacionAbsoluta(pares)
+            relativa = r1.CalcularVariacionRelativa(pares, absoluta)
+
+        GuardarArray(RutaColumna(directorio, nivel, "poblacion", ano), columna)
+        GuardarArray(RutaColumna(directorio, nivel, "variacion_absoluta", ano), absoluta[..., 0])
+        GuardarArray(RutaColumna(directorio, nivel, "variacion_relativa", ano), relativa[..., 0])
+
+    # El índice se escribe el último: hasta entonces el año nuevo no existe para los lectores
+    indice["anos"].insert(0, ano)
+    GuardarIndice(directorio, indice)
+    return indice
+
+
+def LeerDato(directorio, nivel, dato="poblacion", indice=None):
+    """
+    Lee un dato de un nivel para todos los años del almacén.
+
+    Parámetros:
+        directorio (str): Directorio del almacén.
+        nivel (str): Nivel territorial.
+        dato (str): Uno de DATOS.
+        indice (dict, opcional): Índice ya leído.
+
+    Retorna:
+        numpy.ndarray: Matriz (regiones x sexos x años), del año más reciente al más antiguo
+                       (las variaciones no tienen el año más antiguo).
+    """
+    if indice is None:
+        indice = LeerIndice(directorio)
+
+    anos = indice["anos"] if dato == "poblacion" else indice["anos"][:-1]
+    columnas = [np.load(RutaColumna(directorio, nivel, dato, ano), mmap_mode="r") for ano in anos]
+    return np.stack(columnas, axis=-1)
+
+
+def CuboAlmacen(directorio, nivel, indice=None):
+    """
+    Devuelve el cubo de población de un nivel del almacén.
+
+    Parámetros:
+        directorio (str): Directorio del almacén.
+        nivel (str): Nivel territorial.
+        indice (dict, opcional): Índice ya leído.
+
+    Retorna:
+        dict: Cubo de población (ver funciones.CrearCubo).
+    """
+    if indice is None:
+        indice = LeerIndice(directorio)
+    return func.CrearCubo(indice["niveles"][nivel], indice["sexos"], indice["anos"], LeerDato(directorio, nivel, "poblacion", indice))
+
+
+def CuboCsv(directorio, indice=None):
+    """
+    Devuelve el cubo del almacén con las filas del CSV de entrada: el total nacional,
+    las provincias y, si el almacén es municipal, los municipios.
+
+    Parámetros:
+        directorio (str): Directorio del almacén.
+        indice (dict, opcional): Índice ya leído.
+
+    Retorna:
+        dict: Cubo de población (ver funciones.EscribirCuboCsv).
+    """
+    if indice is None:
+        indice = LeerIndice(directorio)
+
+    niveles = ["nacional"] + [nivel for nivel in ("provincia", "municipio") if nivel in indice["niveles"]]
+    cubos = [CuboAlmacen(directorio, nivel, indice) for nivel in niveles]
+    return func.CrearCubo(
+        np.concatenate([cubo["regiones"] for cubo in cubos]),
+        indice["sexos"],
+        indice["anos"],
+        np.concatenate([cubo["datos"] for cubo in cubos]),
+    )
+
+
+@perfil.Perfilado
+def ActualizarInformes(directorio=DIRECTORIO_ALMACEN):
+    """
+    Vuelve a escribir las páginas, los datos exportados y los gráficos de R1-R5 con los datos del almacén.
+
+    Las variaciones de R1 y R4 se leen del almacén, no se recalculan.
+
+    Parámetros:
+        directorio (str): Directorio del almacén.
+
+    Retorna:
+        None
+    """
+    indice = LeerIndice(directorio)
+    sexos = indice["sexos"]
+
+    # R1: total nacional y provincias
+    niveles_r1 = ("nacional", "provincia")
+    cubo_r1 = func.CrearCubo(
+        np.concatenate([indice["niveles"][nivel] for nivel in niveles_r1]),
+        sexos,
+        indice["anos"],
+        np.concatenate([LeerDato(directorio, nivel, "poblacion", indice) for nivel in niveles_r1]),
+    )
+    total = sexos.index("Total")
+    variaciones_r1 = tuple(
+        np.concatenate([LeerDato(directorio, nivel, dato, indice)[:, total] for nivel in niveles_r1])
+        for dato in DATOS[1:]
+    )
+    documento = r1.CrearInforme(cubo_r1, variaciones=variaciones_r1)
+    func.EscribirDocumento(documento, r1.SALIDA_HTML)
+    exportacion.EscribirDatos(documento, r1.SALIDA_DATOS)
+
+    # R2-R5: CCAA
+    ccaa = CuboAlmacen(directorio, "ccaa", indice)
+    documento = r2.CrearInforme(ccaa)
+    func.EscribirDocumento(documento, r2.SALIDA_HTML)
+    exportacion.EscribirDatos(documento, r2.SALIDA_DATOS)
+    r3.DibujarGrafico(ccaa)
+
+    sexos_r4 = [sexos.index(sexo) for sexo in ("Hombres", "Mujeres")]
+    variaciones_r4 = tuple(LeerDato(directorio, "ccaa", dato, indice)[:, sexos_r4] for dato in DATOS[1:])
+    documento = r4.CrearInforme(ccaa, variaciones=variaciones_r4)
+    func.EscribirDocumento(documento, r4.SALIDA_HTML)
+    exportacion.EscribirDatos(documento, r4.SALIDA_DATOS)
+    r5.DibujarGrafico(ccaa)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Almacén por años de los datos de población.")
+    parser.add_argument("--almacen", default=DIRECTORIO_ALMACEN, help=f"directorio del almacén (por defecto, {DIRECTORIO_ALMACEN})")
+    parser.add_argument("--estricto", action="store_true",
+                        help="se detiene si los agregados no coinciden con los totales publicados (por defecto solo avisa)")
+    ordenes = parser.add_subparsers(dest="orden", required=True)
+    ordenes.add_parser("crear", help="crea el almacén con los ficheros de entrada de los informes")
+    anadir = ordenes.add_parser("anadir", help="añade un año nuevo y actualiza los informes")
+    anadir.add_argument("fichero", help="CSV del INE con solo el año nuevo")
+    anadir.add_argument("--sin-informes", action="store_true", help="no vuelve a escribir las páginas y gráficos de R1-R5")
+    anadir.add_argument("--escribir-csv", metavar="RUTA",
+                        help=f"escribe la serie completa del almacén como CSV (con {func.RUTA_POBLACION}, "
+                             "main.py parte de los mismos datos)")
+    argumentos = parser.parse_args()
+
+    if argumentos.estricto:
+        os.environ["POBLACION_TOTALES_ESTRICTOS"] = "1"
+
+    inicio = time.perf_counter()
+    if argumentos.orden == "crear":
+        contexto = func.CrearContexto()
+        indice = CrearAlmacen(comunidades.JerarquiaPoblacion(contexto), comunidades.MapaProvinciaComunidad(contexto), argumentos.almacen)
+        print(f"Almacén creado en '{argumentos.almacen}': años {func.RangoAnos(np.array(indice['anos']))} "
+              f"({time.perf_counter() - inicio:.2f} s)")
+    else:
+        indice = AnadirAno(func.LeerCuboPoblacion(argumentos.fichero), argumentos.almacen, argumentos.estricto)
+        print(f"Año {indice['anos'][0]} añadido a '{argumentos.almacen}' ({time.perf_counter() - inicio:.2f} s)")
+        if argumentos.escribir_csv:
+            func.EscribirCuboCsv(argumentos.escribir_csv, CuboCsv(argumentos.almacen))
+            print(f"CSV escrito en '{argumentos.escribir_csv}'")
+        if not argumentos.sin_informes:
+            ActualizarInformes(argumentos.almacen)
+            # Si el CSV de entrada de main.py tiene los mismos datos los informes quedan
+            # al día; si no, se quitan del manifiesto para que main.py los regenere
+            al_dia = bool(argumentos.escribir_csv) and os.path.abspath(argumentos.escribir_csv) == os.path.abspath(func.RUTA_POBLACION)
+            planificador.ActualizarManifiesto(al_dia=al_dia)
+            graficos.LimitarCacheGraficos()
+            print("Informes R1-R5 actualizados")
@@ -0,0 +1,245 @@
+"""
+benchmark.py
+Medidas de rendimiento de las funciones principales y de la ejecución completa de R1-R5.
+
+Para cada escala (número de regiones x número de años) se generan ficheros de
+entrada sintéticos con el formato del INE (ver sintetico.py) y se mide cada caso
+varias veces. De cada caso se guarda el tiempo (mínimo y mediana), el número de
+elementos procesados por segundo y el pico de memoria reservada (tracemalloc,
+medido en una ejecución aparte para no alterar los tiempos). El resultado se
+escribe en JSON para poder comparar unas versiones con otras.
+
+Uso:
+    python benchmark.py [--regiones N ...] [--anos N ...] [--repeticiones N]
+                        [--casos NOMBRE ...] [--salida FICHERO.json]
+
+Autores: Jose Daniel Ojeda Tro & Javier Linaje Vallejo
+Fecha: 2026-10-18
+"""
+import os
+os.environ.setdefault("MPLBACKEND", "Agg")
+
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import cache
+import comunidades
+import funciones as func
+import jerarquia
+import planificador
+import ranking
+import sintetico
+
+
+# Se incrementa cuando cambia el formato del JSON de resultados
+VERSION_BENCHMARK = 1
+
+DIRECTORIO_PROYECTO = os.path.dirname(os.path.abspath(__file__))
+
+
+def PrepararDirectorio(directorio, n_regiones, n_anos, semilla=0):
+    """
+    Crea un directorio de trabajo con entradas sintéticas y la estructura que esperan R1-R5.
+
+    Parámetros:
+        directorio (str): Directorio de trabajo
+        n_regiones (int): Número de regiones
+        n_anos (int): Número de años
+        semilla (int): Semilla del generador
+
+    Retorna:
+        dict: Rutas de los ficheros de entrada {"poblacion": ..., "comunidades": ...}
+    """
+    rutas = sintetico.GenerarEntradas(os.path.join(directorio, "entradas"), n_regiones, n_anos, semilla)
+    os.makedirs(os.path.join(directorio, "resultados"), exist_ok=True)
+    os.makedirs(os.path.join(directorio, "imagenes"), exist_ok=True)
+    shutil.copy(os.path.join(DIRECTORIO_PROYECTO, "resultados", func.NOMBRE_ESTILO), os.path.join(directorio, "resultados"))
+    return rutas
+
+
+def CasosBenchmark(directorio, rutas):
+    """
+    Prepara los casos que se miden sobre unos ficheros de entrada.
+
+    Cada caso es una función sin argumentos (lo que se mide) y el número de
+    elementos que procesa, para calcular el rendimiento por segundo. Lo que no
+    forma parte de la medida (leer las entradas de otros casos) se hace aquí.
+
+    Parámetros:
+        directorio (str): Directorio de trabajo (ver PrepararDirectorio)
+        rutas (dict): Rutas de los ficheros de entrada
+
+    Retorna:
+        dict: Diccionario {nombre: (funcion, elementos)}
+    """
+    provincias, total, hombres, mujeres = func.LeerPoblacionProvincias(rutas["poblacion"], usar_cache=False)
+    diccionario = comunidades.DatosComuniadesAutonomasProvincias(rutas["comunidades"], usar_cache=False)
+    celdas = len(provincias) * (total.shape[1] + hombres.shape[1] + mujeres.shape[1])
+    valores = np.hstack((total, hombres, mujeres))
+    datos = np.column_stack((provincias, valores))
+    cabecera = func.CompilarCabecera("Región", (("Total", "Hombres", "Mujeres"),), tuple(range(total.shape[1])))
+    salida_html = os.path.join(directorio, "resultados", "benchmark.html")
+    celdas_html = sum(1 for _ in func.LeerPaginaWeb(rutas["comunidades"]))
+    datos_jerarquia = jerarquia.CrearJerarquia(
+        func.LeerCuboPoblacion(rutas["poblacion"], usar_cache=False), comunidades.InvertirDiccionarioComunidades(diccionario))
+    # Las clasificaciones se miden en el nivel más detallado de los datos
+    nivel = "municipio" if "municipio" in datos_jerarquia["niveles"] else "provincia"
+    directorio_cache = os.path.join(directorio, "cache")
+    directorio_cache_original = cache.DIRECTORIO_CACHE
+
+    def LeerConCacheCaliente():
+        # La primera llamada (fuera de la medida) llena la caché; esta abre los .npy con mmap
+        cache.DIRECTORIO_CACHE = directorio_cache
+        try:
+            return func.LeerPoblacionProvincias(rutas["poblacion"])
+        finally:
+            cache.DIRECTORIO_CACHE = directorio_cache_original
+
+    def EjecutarR1R5():
+        # Los informes usan rutas relativas al directorio de trabajo; la caché no se usa
+        # para medir el procesamiento completo
+        actual = os.getcwd()
+        os.chdir(directorio)
+        cache.DIRECTORIO_CACHE = ""
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                planificador.EjecutarInformes(procesos=1, forzar=True, manifiesto=None)
+        finally:
+            cache.DIRECTORIO_CACHE = directorio_cache_original
+            os.chdir(actual)
+
+    LeerConCacheCaliente()
+
+    return {
+        "LectorCsv": (lambda: func.LectorCsv(rutas["poblacion"], ";", "Total Nacional", "Notas:"), celdas),
+        "LeerPoblacionProvincias": (lambda: func.LeerPoblacionProvincias(rutas["poblacion"], usar_cache=False), celdas),
+        "LeerPoblacionProvincias[cache]": (LeerConCacheCaliente, celdas),
+        "AgruparProvinciasPorComunidadAutonoma": (
+            lambda: comunidades.AgruparProvinciasPorComunidadAutonoma(provincias, valores, diccionario), celdas),
+        "LeerPaginaWeb": (lambda: list(func.LeerPaginaWeb(rutas["comunidades"])), celdas_html),
+        "GenerarHtml": (lambda: func.GenerarHtml("Benchmark", cabecera, datos, salida_html), celdas),
+        "FormatearNumero": (lambda: [func.FormatearNumero(v) for v in valores.ravel().tolist()], celdas),
+        "FormatearNumeros": (lambda: func.FormatearNumeros(valores), celdas),
+        "Clasificacion": (
+            lambda: ranking.ClasificacionNivel(datos_jerarquia, nivel, "variacion_relativa", n=10), celdas),
+        "Clasificacion[cambios]": (
+            lambda: ranking.ClasificacionNivel(datos_jerarquia, nivel, "variacion_relativa", n=10, con_cambios=True), celdas),
+        "R1-R5": (EjecutarR1R5, celdas),
+    }
+
+
+def MedirCaso(funcion, repeticiones):
+    """
+    Mide el tiempo y el pico de memoria de un caso.
+
+    Parámetros:
+        funcion (callable): Caso a medir (sin argumentos)
+        repeticiones (int): Número de ejecuciones cronometradas
+
+    Retorna:
+        dict: {"segundos_min", "segundos_mediana", "memoria_pico_bytes"}
+    """
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+
+    # La memoria se mide aparte porque tracemalloc ralentiza la ejecución
+    tracemalloc.start()
+    try:
+        funcion()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "segundos_min": min(tiempos),
+        "segundos_mediana": statistics.median(tiempos),
+        "memoria_pico_bytes": pico,
+    }
+
+
+def EjecutarBenchmark(escalas, repeticiones=3, casos=None, directorio=None):
+    """
+    Ejecuta los casos de benchmark para cada escala.
+
+    Parámetros:
+        escalas (list[tuple]): Pares (número de regiones, número de años)
+        repeticiones (int): Número de ejecuciones cronometradas de cada caso
+        casos (list[str], opcional): Nombres de los casos a medir (por defecto, todos)
+        directorio (str, opcional): Directorio donde se generan los datos (por defecto, uno temporal)
+
+    Retorna:
+        dict: Resultados con los datos del entorno y una entrada por caso y escala
+    """
+    resultados = []
+    temporal = tempfile.mkdtemp(prefix="benchmark-") if directorio is None else None
+    base = directorio or temporal
+
+    try:
+        for n_regiones, n_anos in escalas:
+            trabajo = os.path.join(base, f"{n_regiones}x{n_anos}")
+            rutas = PrepararDirectorio(trabajo, n_regiones, n_anos)
+            preparados = CasosBenchmark(trabajo, rutas)
+
+            for nombre, (funcion, elementos) in preparados.items():
+                if casos and nombre not in casos:
+                    continue
+
+                medida = MedirCaso(funcion, repeticiones)
+                medida.update({
+                    "caso": nombre,
+                    "regiones": n_regiones,
+                    "anos": n_anos,
+                    "elementos": elementos,
+                    "elementos_por_segundo": elementos / medida["segundos_mediana"] if medida["segundos_mediana"] else None,
+                })
+                resultados.append(medida)
+                print(f"{nombre:<40} {n_regiones:>6} x {n_anos:<3} {medida['segundos_mediana'] * 1000:10.2f} ms"
+                      f" {medida['memoria_pico_bytes'] / 2**20:10.2f} MiB", file=sys.stderr)
+    finally:
+        if temporal:
+            shutil.rmtree(temporal, ignore_errors=True)
+
+    return {
+        "version": VERSION_BENCHMARK,
+        "fecha": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "plataforma": platform.platform(),
+        "repeticiones": repeticiones,
+        "resultados": resultados,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mide el rendimiento de las funciones principales y de R1-R5.")
+    parser.add_argument("--regiones", type=int, nargs="+", default=[sintetico.N_PROVINCIAS, 8000],
+                        help="números de regiones a medir (52 = provincias; 8000 ~ municipios)")
+    parser.add_argument("--anos", type=int, nargs="+", default=[8, 32], help="números de años a medir")
+    parser.add_argument("--repeticiones", type=int, default=3, help="ejecuciones cronometradas de cada caso")
+    parser.add_argument("--casos", nargs="+", default=None, help="casos a medir (por defecto, todos)")
+    parser.add_argument("--datos", default=None, help="directorio donde se conservan los datos generados")
+    parser.add_argument("--salida", default=None, help="fichero JSON de resultados (por defecto, la salida estándar)")
+    argumentos = parser.parse_args()
+
+    escalas = [(r, a) for r in argumentos.regiones for a in argumentos.anos]
+    informe = EjecutarBenchmark(escalas, argumentos.repeticiones, argumentos.casos, argumentos.datos)
+
+    if argumentos.salida:
+        with open(argumentos.salida, "w", encoding="utf8") as f:
+            json.dump(informe, f, indent=2)
+    else:
+        json.dump(informe, sys.stdout, indent=2)
+        print()
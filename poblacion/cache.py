@@ -0,0 +1,257 @@
+"""
+cache.py
+Caché persistente en disco de los datos ya procesados de los ficheros de entrada.
+
+Cada entrada se guarda como un directorio con un fichero .npy por array, de modo
+que en las siguientes ejecuciones se abre con memoria mapeada en lugar de volver
+a procesar el CSV o el HTML. La clave de cada entrada depende de la ruta, el
+tamaño, la fecha de modificación y el hash del contenido del fichero de entrada,
+así que cualquier cambio en él invalida la caché automáticamente. El hash se
+guarda junto al tamaño y la fecha con que se calculó (ver HashEntrada), así que
+el fichero solo se vuelve a leer entero cuando cambia alguno de los dos.
+
+Autores: Jose Daniel Ojeda Tro & Javier Linaje Vallejo
+Fecha: 2026-10-18
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import numpy as np
+import perfil
+
+
+# Directorio de la caché; POBLACION_CACHE="" la desactiva
+DIRECTORIO_CACHE = os.environ.get("POBLACION_CACHE", "./.cache")
+
+# Tamaño máximo del directorio de caché (se eliminan primero las entradas menos usadas)
+LIMITE_CACHE_BYTES = 256 * 1024 * 1024
+
+# Se incrementa cuando cambia el formato de lo que se guarda en caché
+VERSION_CACHE = 2
+
+# Fichero del directorio de la caché con el hash de cada fichero de entrada
+FICHERO_HASHES = "hashes.json"
+
+# Hashes ya calculados {ruta absoluta: [tamaño, mtime_ns, hash]} y directorios de
+# caché cuyo FICHERO_HASHES ya se ha leído
+HASHES_ENTRADAS = {}
+HASHES_CARGADOS = set()
+
+REGISTRO = logging.getLogger(__name__)
+
+
+def HashFichero(ruta, tamano_bloque=1 << 20):
+    """
+    Calcula el hash del contenido de un fichero leyéndolo por bloques.
+
+    Parámetros:
+        ruta (str): Ruta del fichero.
+        tamano_bloque (int): Bytes leídos en cada bloque.
+
+    Retorna:
+        str: Hash hexadecimal (BLAKE2b) del contenido.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    with open(ruta, "rb") as f:
+        for bloque in iter(lambda: f.read(tamano_bloque), b""):
+            h.update(bloque)
+    return h.hexdigest()
+
+
+def HashEntrada(ruta, directorio=None):
+    """
+    Devuelve el hash del contenido de un fichero de entrada sin leerlo si no ha cambiado.
+
+    El hash se reutiliza mientras el tamaño y la fecha de modificación (st_mtime_ns)
+    del fichero sean los mismos con los que se calculó; se guarda en memoria y en
+    FICHERO_HASHES dentro del directorio de la caché para las siguientes ejecuciones.
+
+    Parámetros:
+        ruta (str): Ruta del fichero de entrada.
+        directorio (str, opcional): Directorio de la caché.
+
+    Retorna:
+        str: Hash hexadecimal (BLAKE2b) del contenido (ver HashFichero).
+    """
+    directorio = directorio or DIRECTORIO_CACHE
+    if not directorio:
+        return HashFichero(ruta)
+
+    fichero_hashes = os.path.join(directorio, FICHERO_HASHES)
+    if directorio not in HASHES_CARGADOS:
+        HASHES_CARGADOS.add(directorio)
+        try:
+            with open(fichero_hashes, encoding="utf8") as f:
+                HASHES_ENTRADAS.update(json.load(f))
+        except (OSError, ValueError):
+            # Sin fichero de hashes (o ilegible): se calculan de nuevo
+            pass
+
+    info = os.stat(ruta)
+    ruta_absoluta = os.path.abspath(ruta)
+    guardado = HASHES_ENTRADAS.get(ruta_absoluta)
+    if guardado is not None and guardado[:2] == [info.st_size, info.st_mtime_ns]:
+        return guardado[2]
+
+    valor = HashFichero(ruta)
+    HASHES_ENTRADAS[ruta_absoluta] = [info.st_size, info.st_mtime_ns, valor]
+
+    # Se escribe en un temporal del mismo directorio y se renombra, como las entradas
+    try:
+        os.makedirs(directorio, exist_ok=True)
+        descriptor, temporal = tempfile.mkstemp(prefix=".tmp-", suffix=".json", dir=directorio)
+        with os.fdopen(descriptor, "w", encoding="utf8") as f:
+            json.dump(HASHES_ENTRADAS, f)
+        os.replace(temporal, fichero_hashes)
+    except OSError as error:
+        REGISTRO.warning("No se pudo guardar '%s': %s", fichero_hashes, error)
+    return valor
+
+
+def ClaveCache(ruta, nombre):
+    """
+    Calcula la clave de caché de un fichero de entrada.
+
+    Parámetros:
+        ruta (str): Ruta del fichero de entrada.
+        nombre (str): Nombre del dato que se guarda (p. ej. "poblacion").
+
+    Retorna:
+        str: Nombre del directorio de la entrada, "<nombre>-<clave>".
+    """
+    info = os.stat(ruta)
+    partes = [
+        str(VERSION_CACHE),
+        os.path.abspath(ruta),
+        str(info.st_size),
+        str(info.st_mtime_ns),
+        HashEntrada(ruta),
+    ]
+    clave = hashlib.blake2b("|".join(partes).encode("utf8"), digest_size=16).hexdigest()
+    return f"{nombre}-{clave}"
+
+
+@perfil.Perfilado
+def CargarCache(entrada, directorio=None):
+    """
+    Abre con memoria mapeada los arrays de una entrada de la caché.
+
+    Parámetros:
+        entrada (str): Nombre de la entrada (ver ClaveCache).
+        directorio (str, opcional): Directorio de la caché.
+
+    Retorna:
+        dict | None: Diccionario {nombre: numpy.ndarray} o None si la entrada no existe.
+    """
+    ruta_entrada = os.path.join(directorio or DIRECTORIO_CACHE, entrada)
+    if not os.path.isdir(ruta_entrada):
+        return None
+
+    try:
+        arrays = {
+            fichero[:-4]: np.load(os.path.join(ruta_entrada, fichero), mmap_mode="r")
+            for fichero in os.listdir(ruta_entrada)
+            if fichero.endswith(".npy")
+        }
+    except (OSError, ValueError):
+        # Entrada corrupta o a medio borrar: se trata como ausente
+        return None
+
+    # Se actualiza la fecha para que la entrada cuente como usada recientemente
+    os.utime(ruta_entrada)
+    return arrays
+
+
+@perfil.Perfilado
+def GuardarCache(entrada, arrays, directorio=None, limite_bytes=LIMITE_CACHE_BYTES):
+    """
+    Guarda un diccionario de arrays como entrada de la caché.
+
+    La entrada se escribe primero en un directorio temporal y después se renombra,
+    para que otra ejecución nunca vea una entrada a medio escribir.
+
+    Parámetros:
+        entrada (str): Nombre de la entrada (ver ClaveCache).
+        arrays (dict): Diccionario {nombre: numpy.ndarray}.
+        directorio (str, opcional): Directorio de la caché.
+        limite_bytes (int | None): Tamaño máximo del directorio de la caché; con None no
+                                  se recorta (quien guarda muchas entradas seguidas lo
+                                  recorta al final con LimitarCache).
+
+    Retorna:
+        None
+    """
+    directorio = directorio or DIRECTORIO_CACHE
+    os.makedirs(directorio, exist_ok=True)
+
+    destino = os.path.join(directorio, entrada)
+    temporal = tempfile.mkdtemp(prefix=".tmp-", dir=directorio)
+    try:
+        for nombre, array in arrays.items():
+            np.save(os.path.join(temporal, nombre + ".npy"), np.asarray(array), allow_pickle=False)
+        os.replace(temporal, destino)
+    except OSError as error:
+        shutil.rmtree(temporal, ignore_errors=True)
+        # Si otra ejecución ya ha guardado la misma entrada el renombrado falla y se
+        # usa la suya; cualquier otro error (disco lleno, permisos...) se avisa
+        if not os.path.isdir(destino):
+            REGISTRO.warning("No se pudo guardar la entrada de caché '%s': %s", entrada, error)
+
+    if limite_bytes is not None:
+        LimitarCache(directorio, limite_bytes)
+
+
+def LimitarCache(directorio, limite_bytes):
+    """
+    Elimina las entradas usadas hace más tiempo hasta que la caché quepa en el límite.
+
+    Parámetros:
+        directorio (str): Directorio de la caché.
+        limite_bytes (int): Tamaño máximo permitido en bytes.
+
+    Retorna:
+        None
+    """
+    entradas = []
+    for nombre in os.listdir(directorio):
+        ruta_entrada = os.path.join(directorio, nombre)
+        if nombre.startswith(".tmp-") or not os.path.isdir(ruta_entrada):
+            continue
+        tamano = sum(os.path.getsize(os.path.join(ruta_entrada, f)) for f in os.listdir(ruta_entrada))
+        entradas.append((os.path.getmtime(ruta_entrada), tamano, ruta_entrada))
+
+    total = sum(tamano for _, tamano, _ in entradas)
+    for _, tamano, ruta_entrada in sorted(entradas):
+        if total <= limite_bytes:
+            break
+        shutil.rmtree(ruta_entrada, ignore_errors=True)
+        total -= tamano
+
+
+def LeerConCache(ruta, nombre, leer, usar_cache=True):
+    """
+    Devuelve los arrays procesados de un fichero, usando la caché si es válida.
+
+    Parámetros:
+        ruta (str): Ruta del fichero de entrada.
+        nombre (str): Nombre del dato que se guarda (p. ej. "poblacion").
+        leer (callable): Función sin argumentos que procesa el fichero y devuelve
+                         un diccionario {nombre: numpy.ndarray}.
+        usar_cache (bool): Si es False se procesa siempre el fichero sin tocar la caché.
+
+    Retorna:
+        dict: Diccionario {nombre: numpy.ndarray}.
+    """
+    if not usar_cache or not DIRECTORIO_CACHE:
+        return leer()
+
+    entrada = ClaveCache(ruta, nombre)
+    arrays = CargarCache(entrada)
+    if arrays is None:
+        arrays = leer()
+        GuardarCache(entrada, arrays)
+
+    return arrays
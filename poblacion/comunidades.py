@@ -0,0 +1,249 @@
+"""
+comunidades.py
+Relación provincia -> comunidad autónoma y población agrupada por CCAA.
+
+La tabla de correspondencia se extrae del HTML de comunidades (pasando por la
+caché en disco) y los agregados se memorizan en el contexto de datos (ver
+funciones.CrearContexto). Lo usan tanto las páginas de R2 y R4 como los
+gráficos de R3 y R5, así que estos no dependen de los módulos de las páginas.
+
+Autores: Jose Daniel Ojeda Tro & Javier Linaje Vallejo
+Fecha: 2026-10-18
+"""
+import numpy as np
+import cache
+import funciones as func
+import jerarquia
+import perfil
+
+
+def DiccionarioComunidadProvincia(datos):
+    """
+    Crea un diccionario que mapea cada comunidad autónoma con sus provincias.
+    
+    Parámetros:
+        datos (list): Lista de strings alternando comunidad-provincia
+    
+    Retorna:
+        dict: Diccionario {comunidad: [lista de provincias]}
+    """
+    comunidades_autonomas = {}
+    i = 0
+    
+    while i < len(datos):
+        comunidad = datos[i]
+        provincia = datos[i+1]
+
+        if comunidad not in comunidades_autonomas:
+            comunidades_autonomas[comunidad] = []
+        comunidades_autonomas[comunidad].append(provincia)
+
+        i += 2  # Saltar a la siguiente comunidad autónoma
+    
+    return comunidades_autonomas
+
+
+@perfil.Perfilado
+def LeerTablaComunidades(ruta=func.RUTA_COMUNIDADES, usar_cache=True):
+    """
+    Extrae del HTML la tabla de correspondencia provincia -> comunidad autónoma.
+
+    La tabla se guarda en la caché en disco (ver cache.py), así que el HTML
+    solo se vuelve a procesar cuando cambia.
+
+    Parámetros:
+        ruta (str): Ruta del HTML con la relación CCAA-provincia
+        usar_cache (bool): Si es False se procesa siempre el HTML
+
+    Retorna:
+        dict: {"comunidades": numpy.ndarray, "provincias": numpy.ndarray} con una
+              fila por provincia (comunidades[i] es la comunidad de provincias[i])
+    """
+    def leer():
+        # Leer datos de la página web
+        datos = func.LeerPaginaWeb(ruta)
+
+        # Limpiar y organizar los datos: código y nombre van en celdas separadas
+        datos = [d for d in datos if d != '' and d != 'Ciudades    Autónomas:']
+        nombres = [datos[i] + " " + datos[i+1] for i in range(0, len(datos), 2)]
+        return {"comunidades": np.array(nombres[0::2]), "provincias": np.array(nombres[1::2])}
+
+    return cache.LeerConCache(ruta, "comunidades", leer, usar_cache)
+
+
+def DatosComuniadesAutonomasProvincias(ruta=func.RUTA_COMUNIDADES, usar_cache=True):
+    """
+    Lee y procesa el archivo HTML para obtener la relación entre comunidades autónomas y provincias.
+    
+    Parámetros:
+        ruta (str): Ruta del HTML con la relación CCAA-provincia
+        usar_cache (bool): Si es False se procesa siempre el HTML
+    
+    Retorna:
+        dict: Diccionario con la estructura {comunidad: [provincias]}
+    """
+    tabla = LeerTablaComunidades(ruta, usar_cache)
+
+    # Crear diccionario de comunidades autónomas y provincias
+    comunidades_provincias = np.column_stack((tabla["comunidades"], tabla["provincias"])).ravel().tolist()
+    diccionario_comunidades = DiccionarioComunidadProvincia(comunidades_provincias)
+
+    return diccionario_comunidades
+
+
+def InvertirDiccionarioComunidades(diccionario_comunidades):
+    """
+    Invierte el diccionario {comunidad: [provincias]} en {provincia: comunidad}.
+
+    Parámetros:
+        diccionario_comunidades (dict): Diccionario {comunidad: [provincias]}
+
+    Retorna:
+        dict: Diccionario {provincia: comunidad}
+    """
+    return {provincia: comunidad
+            for comunidad, provincias in diccionario_comunidades.items()
+            for provincia in provincias}
+
+
+def QuitarFilaTotales(provincias, total, poblacion_hombres, poblacion_mujeres):
+    """
+    Elimina la fila de totales (primera fila) de los datos de población.
+    
+    Parámetros:
+        provincias (numpy.ndarray): Array con nombres de provincias
+        total (numpy.ndarray): Datos de población total (puede ser None)
+        poblacion_hombres (numpy.ndarray): Datos de población de hombres (puede ser None)
+        poblacion_mujeres (numpy.ndarray): Datos de población de mujeres (puede ser None)
+    
+    Retorna:
+        tuple: (provincias_sin_total, tabla_concatenada)
+    """
+    provincias = provincias[1:]
+
+    arrays_a_concatenar = []
+    if total is not None:
+        arrays_a_concatenar.append(total[1:, :])
+    if poblacion_hombres is not None:
+        arrays_a_concatenar.append(poblacion_hombres[1:, :])
+    if poblacion_mujeres is not None:
+        arrays_a_concatenar.append(poblacion_mujeres[1:, :])
+
+    if arrays_a_concatenar:
+        tabla = np.hstack(arrays_a_concatenar)
+    else:
+        tabla = np.empty((len(provincias), 0))  # si no hay nada que concatenar
+
+    return provincias, tabla
+
+
+@perfil.Perfilado
+def AgruparProvinciasPorComunidadAutonoma(provincias, poblaciones, diccionario_comunidades):
+    """
+    Agrupa los datos de población de provincias por comunidad autónoma.
+
+    Cada provincia se asigna a su comunidad por el código INE del principio del
+    nombre ("02 Albacete" -> 2) y las sumas se hacen de una vez con np.bincount.
+    Las comunidades salen en el orden de funciones.CompilarGrupos, así que una comunidad
+    sin provincias en el diccionario no aparece en el resultado.
+    
+    Parámetros:
+        provincias (numpy.ndarray): Array con los nombres de las provincias
+        poblaciones (numpy.ndarray): Matriz con datos de población de cada provincia
+        diccionario_comunidades (dict): Diccionario {comunidad: [provincias]}
+    
+    Retorna:
+        tuple: (comunidades, resultado) donde:
+            - comunidades: array con nombres de comunidades autónomas
+            - resultado: matriz con poblaciones agrupadas por comunidad
+    """
+    grupos = func.CompilarGrupos(InvertirDiccionarioComunidades(diccionario_comunidades))
+    indices = func.IndiceGrupos(provincias, grupos)
+
+    # Las etiquetas y el número de grupos salen de la misma agrupación que los índices
+    comunidades = np.array(grupos["nombres"], dtype=str)
+    resultado = func.SumarPorGrupos(poblaciones, indices, len(comunidades))
+
+    return comunidades, resultado
+
+
+def DiccionarioComunidades(contexto):
+    """
+    Devuelve el diccionario {comunidad: [provincias]} del contexto (el HTML se lee una sola vez).
+
+    Parámetros:
+        contexto (dict): Contexto creado con funciones.CrearContexto
+
+    Retorna:
+        dict: Diccionario {comunidad: [provincias]}
+    """
+    return func.Memorizar(
+        contexto,
+        "comunidades",
+        lambda: DatosComuniadesAutonomasProvincias(contexto["rutas"]["comunidades"])
+    )
+
+
+def MapaProvinciaComunidad(contexto):
+    """
+    Devuelve el mapa inverso {provincia: comunidad} del contexto.
+
+    Parámetros:
+        contexto (dict): Contexto creado con funciones.CrearContexto
+
+    Retorna:
+        dict: Diccionario {provincia: comunidad}
+    """
+    return func.Memorizar(
+        contexto,
+        "provincia_comunidad",
+        lambda: InvertirDiccionarioComunidades(DiccionarioComunidades(contexto))
+    )
+
+
+def JerarquiaPoblacion(contexto):
+    """
+    Devuelve los agregados por municipio, provincia, CCAA y nacional del contexto
+    (calculados y comprobados una sola vez, ver jerarquia.py; una diferencia con los
+    totales publicados solo se avisa salvo con funciones.TotalesEstrictos).
+
+    Parámetros:
+        contexto (dict): Contexto creado con funciones.CrearContexto
+
+    Retorna:
+        dict: Jerarquía creada con jerarquia.CrearJerarquia
+    """
+    return func.Memorizar(
+        contexto,
+        "jerarquia",
+        lambda: jerarquia.CrearJerarquia(func.CuboPoblacion(contexto), MapaProvinciaComunidad(contexto),
+                                         estricto=func.TotalesEstrictos())
+    )
+
+
+def CuboCCAA(contexto):
+    """
+    Devuelve el cubo de población agrupado por CCAA (región x sexo x año) del contexto.
+
+    Parámetros:
+        contexto (dict): Contexto creado con funciones.CrearContexto
+
+    Retorna:
+        dict: Cubo con una región por comunidad autónoma
+    """
+    return jerarquia.CuboNivel(JerarquiaPoblacion(contexto), "ccaa")
+
+
+def SumasCCAA(contexto):
+    """
+    Devuelve la población agrupada por CCAA (total, hombres y mujeres) del contexto.
+
+    Parámetros:
+        contexto (dict): Contexto creado con funciones.CrearContexto
+
+    Retorna:
+        tuple: (comunidades, sumas) donde sumas tiene las columnas
+               total | hombres | mujeres de cada año
+    """
+    cubo = CuboCCAA(contexto)
+    return cubo["regiones"], func.TablaCubo(cubo)
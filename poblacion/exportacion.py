@@ -0,0 +1,340 @@
+"""
+exportacion.py
+Exportación de las tablas de los informes en formatos para máquinas, sin formatear.
+
+Las páginas HTML muestran los números formateados al estilo español ("1.234,56"),
+que no sirven para volver a procesarlos. Cada tabla con esquema (ver
+funciones.CrearEsquema) se escribe además, con los números tal como se calcularon:
+
+- <base>.npz: arrays "etiquetas", "columnas" y "valores" (matriz filas x columnas).
+  Se guarda sin comprimir, así que CargarNpz lo abre con memoria mapeada, sin copiar
+  los datos.
+- <base>.csv: una fila de cabecera con los nombres de las columnas y una fila por
+  región (separador ",", punto decimal, celdas sin dato vacías).
+- <base>.jsonl: un objeto JSON por región {"ccaa": ..., "total_2017": ...} (sin dato = null).
+- <base>.schema.json: el esquema: nombre, grupos y año de cada columna, tipo de los
+  valores, número de filas y ficheros escritos.
+
+El CSV y el JSON Lines se escriben por bloques de filas, sin construir el texto entero
+en memoria, y todos los ficheros se escriben en un temporal que después se renombra.
+
+Autores: Jose Daniel Ojeda Tro & Javier Linaje Vallejo
+Fecha: 2026-10-18
+"""
+import csv
+import json
+import os
+import struct
+import tempfile
+import unicodedata
+import zipfile
+import numpy as np
+import funciones as func
+import perfil
+
+
+FORMATOS = ("npz", "csv", "jsonl")
+
+EXTENSION_ESQUEMA = ".schema.json"
+
+# Se incrementa cuando cambia el formato de los ficheros exportados
+VERSION_ESQUEMA = 1
+
+
+def NombreColumna(partes):
+    """
+    Convierte los textos de una columna en un nombre apto para máquinas.
+
+    Parámetros:
+        partes (tuple): Grupos y año de la columna, p. ej. ("Variación Absoluta", "Hombres", 2017).
+
+    Retorna:
+        str: Nombre en minúsculas, sin tildes y separado por "_" ("variacion_absoluta_hombres_2017").
+    """
+    texto = "_".join(str(parte) for parte in partes)
+    texto = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii").lower()
+    return "_".join("".join(c if c.isalnum() else " " for c in texto).split())
+
+
+def RutasDatos(base, formatos=FORMATOS):
+    """
+    Devuelve las rutas de los ficheros que escribe EscribirDatos para una tabla.
+
+    Parámetros:
+        base (str): Ruta de los ficheros sin extensión.
+        formatos (tuple[str]): Formatos que se escriben.
+
+    Retorna:
+        list[str]: Rutas del esquema y de cada formato.
+    """
+    return [base + EXTENSION_ESQUEMA] + [f"{base}.{formato}" for formato in formatos]
+
+
+def CrearEsquemaDatos(titulo, bloque, base, formatos=FORMATOS):
+    """
+    Crea el esquema que acompaña a los ficheros exportados de una tabla.
+
+    Parámetros:
+        titulo (str): Título del documento.
+        bloque (dict): Bloque de tabla con esquema (ver funciones.AñadirTabla).
+        base (str): Ruta de los ficheros sin extensión.
+        formatos (tuple[str]): Formatos que se escriben.
+
+    Retorna:
+        dict: Esquema {"version", "titulo", "filas", "etiqueta", "tipo", "columnas", "ficheros"}.
+
+    Excepciones:
+        ValueError: Si el esquema no tiene tantas columnas como la tabla.
+    """
+    esquema, valores = bloque["esquema"], bloque["valores"]
+    if len(esquema["columnas"]) != valores.shape[1]:
+        raise ValueError(f"El esquema tiene {len(esquema['columnas'])} columnas y la tabla {valores.shape[1]}")
+
+    nombre = os.path.basename(base)
+    return {
+        "version": VERSION_ESQUEMA,
+        "titulo": titulo,
+        "filas": len(bloque["etiquetas"]),
+        "etiqueta": {"nombre": NombreColumna((esquema["etiqueta"],)), "titulo": esquema["etiqueta"]},
+        "tipo": str(valores.dtype),
+        "columnas": [
+            {"nombre": NombreColumna(partes), "grupos": [str(grupo) for grupo in partes[:-1]], "ano": int(partes[-1])}
+            for partes in esquema["columnas"]
+        ],
+        "ficheros": {formato: f"{nombre}.{formato}" for formato in formatos},
+    }
+
+
+def ValorDatos(valor):
+    """
+    Convierte un número en el valor que se escribe en CSV y JSON (None si no hay dato).
+
+    Parámetros:
+        valor (int | float): Número.
+
+    Retorna:
+        int | float | None: El número, o None si es NaN o infinito.
+    """
+    if isinstance(valor, float) and not np.isfinite(valor):
+        return None
+    return valor
+
+
+def EscribirCsvDatos(archivo, esquema, etiquetas, valores, filas_por_bloque=1000):
+    """
+    Escribe una tabla como CSV por bloques de filas.
+
+    Parámetros:
+        archivo (file): Fichero de texto abierto para escritura.
+        esquema (dict): Esquema de la tabla (ver CrearEsquemaDatos).
+        etiquetas (numpy.ndarray): Etiqueta de cada fila.
+        valores (numpy.ndarray): Matriz (filas x columnas) de números.
+        filas_por_bloque (int): Número de filas que se convierten y escriben a la vez.
+
+    Retorna:
+        None
+    """
+    escritor = csv.writer(archivo, lineterminator="\n")
+    escritor.writerow([esquema["etiqueta"]["nombre"]] + [columna["nombre"] for columna in esquema["columnas"]])
+
+    for ini in range(0, len(etiquetas), filas_por_bloque):
+        escritor.writerows(
+            [etiqueta] + ["" if ValorDatos(valor) is None else valor for valor in fila]
+            for etiqueta, fila in zip(etiquetas[ini:ini + filas_por_bloque].tolist(), valores[ini:ini + filas_por_bloque].tolist())
+        )
+
+
+def EscribirJsonlDatos(archivo, esquema, etiquetas, valores, filas_por_bloque=1000):
+    """
+    Escribe una tabla como JSON Lines (un objeto por fila) por bloques de filas.
+
+    Parámetros:
+        archivo (file): Fichero de texto abierto para escritura.
+        esquema (dict): Esquema de la tabla (ver CrearEsquemaDatos).
+        etiquetas (numpy.ndarray): Etiqueta de cada fila.
+        valores (numpy.ndarray): Matriz (filas x columnas) de números.
+        filas_por_bloque (int): Número de filas que se convierten y escriben a la vez.
+
+    Retorna:
+        None
+    """
+    claves = [esquema["etiqueta"]["nombre"]] + [columna["nombre"] for columna in esquema["columnas"]]
+
+    for ini in range(0, len(etiquetas), filas_por_bloque):
+        archivo.write("".join(
+            json.dumps(dict(zip(claves, [etiqueta] + [ValorDatos(valor) for valor in fila])), ensure_ascii=False, separators=(",", ":")) + "\n"
+            for etiqueta, fila in zip(etiquetas[ini:ini + filas_por_bloque].tolist(), valores[ini:ini + filas_por_bloque].tolist())
+        ))
+
+
+def EscribirNpzDatos(ruta, esquema, etiquetas, valores):
+    """
+    Escribe una tabla como .npz sin comprimir (ver CargarNpz).
+
+    Parámetros:
+        ruta (str): Ruta del fichero.
+        esquema (dict): Esquema de la tabla (ver CrearEsquemaDatos).
+        etiquetas (numpy.ndarray): Etiqueta de cada fila.
+        valores (numpy.ndarray): Matriz (filas x columnas) de números.
+
+    Retorna:
+        None
+    """
+    descriptor, temporal = tempfile.mkstemp(prefix=".tmp-", suffix=".npz", dir=os.path.dirname(os.path.abspath(ruta)))
+
+    try:
+        with open(descriptor, "wb") as f:
+            np.savez(
+                f,
+                etiquetas=np.asarray(etiquetas, dtype=str),
+                columnas=np.array([columna["nombre"] for columna in esquema["columnas"]], dtype=str),
+                valores=np.ascontiguousarray(valores),
+            )
+        os.chmod(temporal, 0o644)
+        os.replace(temporal, ruta)
+    except BaseException:
+        os.unlink(temporal)
+        raise
+
+
+@perfil.Perfilado
+def EscribirDatos(documento, base, formatos=FORMATOS, filas_por_bloque=1000):
+    """
+    Escribe sin formato las tablas con esquema de un documento.
+
+    Con una sola tabla los ficheros son <base>.<formato>; con varias, <base>-<n>.<formato>.
+
+    Parámetros:
+        documento (dict): Documento creado con funciones.CrearDocumento.
+        base (str): Ruta de los ficheros sin extensión.
+        formatos (tuple[str]): Formatos que se escriben (de FORMATOS).
+        filas_por_bloque (int): Número de filas que se convierten y escriben a la vez.
+
+    Retorna:
+        list[str]: Rutas de los ficheros escritos.
+
+    Excepciones:
+        ValueError: Si algún formato no existe o un esquema no coincide con su tabla.
+    """
+    desconocidos = [formato for formato in formatos if formato not in FORMATOS]
+    if desconocidos:
+        raise ValueError(f"Formatos desconocidos: {', '.join(desconocidos)} (valores: {', '.join(FORMATOS)})")
+
+    bloques = [bloque for bloque in documento["bloques"] if bloque["tipo"] == "tabla" and bloque.get("esquema")]
+    escritos = []
+
+    for n, bloque in enumerate(bloques, start=1):
+        base_tabla = base if len(bloques) == 1 else f"{base}-{n}"
+        esquema = CrearEsquemaDatos(documento["titulo"], bloque, base_tabla, formatos)
+        etiquetas, valores = np.asarray(bloque["etiquetas"]), bloque["valores"]
+
+        if "npz" in formatos:
+            EscribirNpzDatos(f"{base_tabla}.npz", esquema, etiquetas, valores)
+        if "csv" in formatos:
+            func.EscribirFicheroAtomico(f"{base_tabla}.csv", lambda archivo: EscribirCsvDatos(archivo, esquema, etiquetas, valores, filas_por_bloque))
+        if "jsonl" in formatos:
+            func.EscribirFicheroAtomico(f"{base_tabla}.jsonl", lambda archivo: EscribirJsonlDatos(archivo, esquema, etiquetas, valores, filas_por_bloque))
+
+        # El esquema se escribe el último, cuando ya están todos sus ficheros
+        func.EscribirFicheroAtomico(base_tabla + EXTENSION_ESQUEMA, lambda archivo: json.dump(esquema, archivo, indent=2, ensure_ascii=False))
+        escritos += RutasDatos(base_tabla, formatos)
+
+    return escritos
+
+
+# Versiones del formato .npy cuya cabecera lee CargarNpz; con cualquier otra se usa np.load
+VERSIONES_NPY_MAPEABLES = ((1, 0), (2, 0))
+
+# Bit de las opciones de un miembro del zip que indica que los tamaños van después de los datos
+BIT_DESCRIPTOR_DATOS = 0x08
+
+# Cabecera local de cada miembro del zip (campos fijos, 30 bytes)
+CABECERA_LOCAL_ZIP = struct.Struct("<4s5H3L2H")
+
+
+def MiembroMapeable(info):
+    """
+    Indica si un miembro de un .npz está guardado de forma que CargarNpz puede mapearlo.
+
+    Solo se mapean los miembros sin comprimir, sin descriptor de datos (los tamaños
+    están en la cabecera local) y cuyos tamaños y posición no necesitan ZIP64.
+
+    Parámetros:
+        info (zipfile.ZipInfo): Miembro del zip.
+
+    Retorna:
+        bool: True si el miembro se puede mapear.
+    """
+    return (
+        info.compress_type == zipfile.ZIP_STORED
+        and not info.flag_bits & BIT_DESCRIPTOR_DATOS
+        and max(info.file_size, info.compress_size, info.header_offset) < zipfile.ZIP64_LIMIT
+    )
+
+
+def CargarNpz(ruta):
+    """
+    Abre los arrays de un .npz sin comprimir con memoria mapeada, sin copiar los datos.
+
+    Los arrays de un .npz sin comprimir están guardados tal cual dentro del zip, así que
+    se mapea directamente la zona del fichero de cada uno. Si algún miembro está
+    comprimido, necesita ZIP64 o usa un descriptor de datos (ver MiembroMapeable), o
+    es de una versión del formato .npy distinta de VERSIONES_NPY_MAPEABLES, el fichero
+    entero se lee con np.load.
+
+    Parámetros:
+        ruta (str): Ruta del fichero (p. ej. el de EscribirDatos).
+
+    Retorna:
+        dict: Diccionario {nombre: numpy.ndarray} (numpy.memmap si se ha podido mapear).
+    """
+    miembros = []
+    with zipfile.ZipFile(ruta) as zip_npz, open(ruta, "rb") as f:
+        for info in zip_npz.infolist():
+            if not MiembroMapeable(info):
+                return CargarNpzCompleto(ruta)
+
+            # Cabecera local del zip: campos fijos + nombre + campo extra (np.savez pone
+            # siempre en él un campo ZIP64, aunque los tamaños quepan en 32 bits)
+            f.seek(info.header_offset)
+            cabecera = CABECERA_LOCAL_ZIP.unpack(f.read(CABECERA_LOCAL_ZIP.size))
+            firma, largo_nombre, largo_extra = cabecera[0], cabecera[9], cabecera[10]
+            if firma != zipfile.stringFileHeader:
+                return CargarNpzCompleto(ruta)
+            inicio = info.header_offset + CABECERA_LOCAL_ZIP.size + largo_nombre + largo_extra
+            f.seek(inicio)
+
+            version = np.lib.format.read_magic(f)
+            if version not in VERSIONES_NPY_MAPEABLES:
+                return CargarNpzCompleto(ruta)
+            if version == (1, 0):
+                forma, fortran, tipo = np.lib.format.read_array_header_1_0(f)
+            else:
+                forma, fortran, tipo = np.lib.format.read_array_header_2_0(f)
+
+            nombre = info.filename[:-len(".npy")] if info.filename.endswith(".npy") else info.filename
+            miembros.append((nombre, inicio, f.tell(), forma, fortran, tipo))
+
+        arrays = {}
+        for nombre, inicio, datos, forma, fortran, tipo in miembros:
+            if tipo.hasobject or 0 in forma:
+                f.seek(inicio)
+                arrays[nombre] = np.lib.format.read_array(f)
+            else:
+                arrays[nombre] = np.memmap(ruta, dtype=tipo, mode="r", offset=datos, shape=forma, order="F" if fortran else "C")
+
+    return arrays
+
+
+def CargarNpzCompleto(ruta):
+    """
+    Lee todos los arrays de un .npz con np.load (copiándolos en memoria).
+
+    Parámetros:
+        ruta (str): Ruta del fichero.
+
+    Retorna:
+        dict: Diccionario {nombre: numpy.ndarray}.
+    """
+    with np.load(ruta, allow_pickle=False) as datos:
+        return {nombre: datos[nombre] for nombre in datos.files}
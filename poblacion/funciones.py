@@ -1,122 +1,1550 @@
-import csv, numpy as np
-from bs4 import BeautifulSoup
+import base64, bz2, csv, functools, gzip, io, itertools, json, lzma, mmap, os, tempfile, numpy as np
+from html.parser import HTMLParser
+import cache
+import perfil
 
 
+@perfil.Perfilado
 def LectorCsv(ruta, delimitador : str, ini : str, fin : str): 
   """
   Lee un fichero CSV y devuelve únicamente las filas comprendidas entre dos marcadores.
 
+  Parámetros:
+      ruta (str): Ruta del archivo CSV (comprimido con gzip, bzip2 o xz o no, ver FilasEntreMarcadores).
+      delimitador (str): Carácter usado como delimitador en el CSV. Debe tener longitud 1.
+      ini (str): Cadena que indica el inicio del bloque de datos a extraer.
+      fin (str): Cadena que indica el final del bloque de datos a extraer.
+
+  Retorna:
+      numpy.ndarray: Matriz con las filas seleccionadas del archivo CSV.
+
+  Excepciones:
+      ValueError: Si el delimitador tiene una longitud distinta de 1.
+  """
+  if len(delimitador) !=1:
+    raise ValueError("El delimitador debe ser un solo caracter")
+
+  lista_csv = list(FilasEntreMarcadores(ruta, delimitador, ini, fin))
+
+  np_csv = np.array(lista_csv)  
+  return np_csv
+
+
+# Números mágicos de los formatos comprimidos que se leen directamente (sin descomprimir a disco)
+COMPRESIONES = {
+  b"\x1f\x8b": gzip.open,
+  b"BZh": bz2.open,
+  b"\xfd7zXZ\x00": lzma.open,
+}
+
+
+def CompresionFichero(ruta):
+  """
+  Detecta si un fichero está comprimido (gzip, bzip2 o xz) por sus primeros bytes.
+
+  Parámetros:
+      ruta (str): Ruta del fichero.
+
+  Retorna:
+      callable | None: Función para abrirlo (gzip.open, bz2.open o lzma.open) o None si no está comprimido.
+  """
+  with open(ruta, "rb") as f:
+    cabecera = f.read(max(len(magico) for magico in COMPRESIONES))
+  for magico, abrir in COMPRESIONES.items():
+    if cabecera.startswith(magico):
+      return abrir
+  return None
+
+
+def AbrirTexto(ruta):
+  """
+  Abre un fichero de texto UTF-8, comprimido o no.
+
+  Los ficheros comprimidos se descomprimen en streaming a medida que se leen, sin
+  crear ninguna copia descomprimida en disco.
+
+  Parámetros:
+      ruta (str): Ruta del fichero (.csv, .htm, .gz, .bz2, .xz...; el formato se detecta por el contenido).
+
+  Retorna:
+      io.TextIOBase: Fichero abierto en modo texto (usar con with).
+  """
+  abrir = CompresionFichero(ruta)
+  if abrir is None:
+    return open(ruta, encoding="utf8")
+  return abrir(ruta, "rt", encoding="utf8")
+
+
+def LineasMapeadas(datos, inicio=0):
+  """
+  Recorre (generador) las líneas de un buffer mapeado en memoria a partir de una posición.
+
+  Solo se decodifica cada línea al pedirla; el resto del fichero no se copia.
+
+  Parámetros:
+      datos (mmap.mmap): Contenido del fichero.
+      inicio (int): Posición (en bytes) del comienzo de la primera línea.
+
+  Retorna:
+      generator[str]: Líneas, con su salto de línea.
+  """
+  while inicio < len(datos):
+    final = datos.find(b"\n", inicio)
+    final = len(datos) if final < 0 else final + 1
+    yield datos[inicio:final].decode("utf8")
+    inicio = final
+
+
+def FiltrarMarcadores(filas, ini : str, fin : str):
+  """
+  Devuelve (generador) las filas comprendidas entre dos marcadores (ver FilasEntreMarcadores).
+
+  Parámetros:
+      filas (iterable[list[str]]): Filas del CSV (p. ej. de csv.reader).
+      ini (str): Cadena que indica el inicio del bloque de datos a extraer.
+      fin (str): Cadena que indica el final del bloque de datos a extraer.
+
+  Retorna:
+      generator[list[str]]: Filas seleccionadas, sin la última celda si está vacía.
+  """
+  escribir = False
+
+  for reg in filas:
+      if reg and reg[-1] == '':
+        reg = reg[:-1]
+      if fin in reg:
+        escribir = False
+      if ini in reg or escribir:
+        escribir = True
+        yield reg
+
+
+def FilasEntreMarcadores(ruta, delimitador : str, ini : str, fin : str):
+  """
+  Recorre un fichero CSV devolviendo (generador) las filas comprendidas entre dos marcadores.
+
+  La fila que contiene ini se incluye y la que contiene fin no. El fichero nunca se
+  carga entero en memoria:
+
+  - Si está comprimido (gzip, bzip2 o xz) se descomprime en streaming línea a línea.
+  - Si no, se mapea en memoria, se busca directamente la primera aparición de ini en
+    los bytes y solo se decodifican las líneas a partir de ella.
+
+  Parámetros:
+      ruta (str): Ruta del archivo CSV (comprimido o no).
+      delimitador (str): Carácter usado como delimitador en el CSV.
+      ini (str): Cadena que indica el inicio del bloque de datos a extraer.
+      fin (str): Cadena que indica el final del bloque de datos a extraer.
+
+  Retorna:
+      generator[list[str]]: Filas seleccionadas del archivo CSV.
+  """
+  if CompresionFichero(ruta) is not None or os.path.getsize(ruta) == 0:
+    with AbrirTexto(ruta) as csvarchivo:
+      yield from FiltrarMarcadores(csv.reader(csvarchivo, delimiter=delimitador), ini, fin)
+    return
+
+  with open(ruta, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as datos:
+    # Las líneas anteriores a la primera que contiene el texto de ini no pueden tener
+    # ini como celda, así que el csv empieza a leerse en esa línea
+    posicion = datos.find(ini.encode("utf8"))
+    if posicion < 0:
+      return
+    inicio = datos.rfind(b"\n", 0, posicion) + 1
+    yield from FiltrarMarcadores(csv.reader(LineasMapeadas(datos, inicio), delimiter=delimitador), ini, fin)
+
+
+def LectorCsvPorBloques(ruta, delimitador : str, ini : str, fin : str, tamano_bloque=10000):
+  """
+  Versión en streaming de LectorCsv: devuelve las filas entre los marcadores en bloques.
+
+  Solo hay en memoria un bloque de tamano_bloque filas a la vez, por lo que
+  sirve para ficheros mayores que la memoria disponible.
+
+  Parámetros:
+      ruta (str): Ruta del archivo CSV.
+      delimitador (str): Carácter usado como delimitador en el CSV. Debe tener longitud 1.
+      ini (str): Cadena que indica el inicio del bloque de datos a extraer.
+      fin (str): Cadena que indica el final del bloque de datos a extraer.
+      tamano_bloque (int): Número máximo de filas por bloque.
+
+  Retorna:
+      generator[numpy.ndarray]: Matrices con las filas de cada bloque.
+
+  Excepciones:
+      ValueError: Si el delimitador tiene una longitud distinta de 1 o el tamaño de bloque no es positivo.
+  """
+  if len(delimitador) !=1:
+    raise ValueError("El delimitador debe ser un solo caracter")
+  if tamano_bloque < 1:
+    raise ValueError("El tamaño de bloque debe ser positivo")
+
+  bloque = []
+  for reg in FilasEntreMarcadores(ruta, delimitador, ini, fin):
+    bloque.append(reg)
+    if len(bloque) == tamano_bloque:
+      yield np.array(bloque)
+      bloque = []
+
+  if bloque:
+    yield np.array(bloque)
+
+
+def CodigosEtiquetas(etiquetas):
+  """
+  Extrae el código numérico INE del principio de cada etiqueta ("02 Albacete" -> 2).
+
+  Parámetros:
+      etiquetas (numpy.ndarray): Etiquetas de las filas.
+
+  Retorna:
+      numpy.ndarray: Códigos (int64); -1 en las etiquetas sin código (p. ej. "Total Nacional").
+  """
+  etiquetas = np.asarray(etiquetas, dtype=str)
+  codigos = np.full(etiquetas.shape[0], -1, dtype=np.int64)
+  if etiquetas.size == 0:
+    return codigos
+
+  prefijos = np.char.partition(etiquetas, " ")[:, 0]
+  con_codigo = np.char.isdigit(prefijos)
+  codigos[con_codigo] = prefijos[con_codigo].astype(np.int64)
+  return codigos
+
+
+def CompilarGrupos(grupos):
+  """
+  Prepara una agrupación para asignar filas a grupos de forma vectorizada.
+
+  Las claves con código INE (enteros o etiquetas como "02 Albacete") se indexan en una
+  tabla código -> grupo; el resto se buscan por la etiqueta completa.
+
+  Parámetros:
+      grupos (dict): Diccionario {etiqueta o código: grupo}.
+
+  Retorna:
+      dict: Agrupación compilada con los nombres de los grupos (en orden de aparición),
+            la tabla de códigos y el diccionario de etiquetas sin código.
+  """
+  # Los grupos se numeran en el orden en que aparecen en el diccionario
+  indices = {}
+  for grupo in grupos.values():
+    if grupo not in indices:
+      indices[grupo] = len(indices)
+
+  claves = [str(clave) if isinstance(clave, (int, np.integer)) else clave for clave in grupos]
+  codigos = CodigosEtiquetas(np.array(claves, dtype=str)) if claves else np.empty(0, dtype=np.int64)
+
+  tabla_codigos = np.full(int(codigos.max(initial=-1)) + 1, -1, dtype=np.intp)
+  por_etiqueta = {}
+  for clave, codigo, grupo in zip(claves, codigos, grupos.values()):
+    if codigo >= 0:
+      tabla_codigos[codigo] = indices[grupo]
+    else:
+      por_etiqueta[clave] = indices[grupo]
+
+  return {
+    "nombres": list(indices),
+    "tabla_codigos": tabla_codigos,
+    "por_etiqueta": por_etiqueta,
+  }
+
+
+@perfil.Perfilado
+def IndiceGrupos(etiquetas, grupos_compilados):
+  """
+  Asigna a cada fila el índice de su grupo.
+
+  Parámetros:
+      etiquetas (numpy.ndarray): Etiquetas de las filas.
+      grupos_compilados (dict): Agrupación creada con CompilarGrupos.
+
+  Retorna:
+      numpy.ndarray: Índice del grupo de cada fila; -1 si la fila no pertenece a ningún grupo.
+  """
+  tabla_codigos = grupos_compilados["tabla_codigos"]
+  codigos = CodigosEtiquetas(etiquetas)
+
+  indices = np.full(codigos.shape[0], -1, dtype=np.intp)
+  en_tabla = (codigos >= 0) & (codigos < tabla_codigos.shape[0])
+  indices[en_tabla] = tabla_codigos[codigos[en_tabla]]
+
+  # Filas sin código: se buscan por la etiqueta completa
+  por_etiqueta = grupos_compilados["por_etiqueta"]
+  if por_etiqueta:
+    for i in np.flatnonzero(codigos < 0):
+      indices[i] = por_etiqueta.get(str(etiquetas[i]), -1)
+
+  return indices
+
+
+@perfil.Perfilado
+def SumarPorGrupos(valores, indices, n_grupos):
+  """
+  Suma las filas de una matriz por grupo con una sola llamada a np.bincount.
+
+  Parámetros:
+      valores (numpy.ndarray): Matriz (filas x columnas) de números.
+      indices (numpy.ndarray): Índice del grupo de cada fila (-1 = fila ignorada).
+      n_grupos (int): Número de grupos.
+
+  Retorna:
+      numpy.ndarray: Matriz (n_grupos x columnas) de sumas en float64.
+  """
+  valores = np.asarray(valores)
+  validas = indices >= 0
+  n_columnas = valores.shape[1]
+
+  # Cada celda (fila, columna) va a la posición grupo * n_columnas + columna
+  posiciones = (indices[validas, None] * n_columnas + np.arange(n_columnas)).ravel()
+  sumas = np.bincount(posiciones, weights=valores[validas].ravel(), minlength=n_grupos * n_columnas)
+  return sumas.reshape(n_grupos, n_columnas)
+
+
+def CrearAgregador(grupos):
+  """
+  Crea un agregador incremental que suma filas numéricas por grupo.
+
+  Parámetros:
+      grupos (dict): Diccionario {etiqueta o código: grupo} (ver CompilarGrupos). Las filas
+                     cuya etiqueta no aparece en el diccionario (p. ej. "Total Nacional") se ignoran.
+
+  Retorna:
+      dict: Estado del agregador, para usar con AcumularBloque y ResultadoAgregador.
+  """
+  grupos_compilados = CompilarGrupos(grupos)
+
+  return {
+    "grupos": grupos_compilados,
+    "nombres": grupos_compilados["nombres"],
+    "sumas": None,
+  }
+
+
+def AcumularBloque(agregador, bloque):
+  """
+  Suma en el agregador las filas de un bloque (columna 0 = etiqueta, resto = números).
+
+  Parámetros:
+      agregador (dict): Agregador creado con CrearAgregador.
+      bloque (numpy.ndarray): Bloque de filas, p. ej. de LectorCsvPorBloques.
+
+  Retorna:
+      None
+  """
+  n_grupos = len(agregador["nombres"])
+  indices = IndiceGrupos(bloque[:, 0], agregador["grupos"])
+  sumas = SumarPorGrupos(bloque[:, 1:].astype(float), indices, n_grupos)
+
+  if agregador["sumas"] is None:
+    agregador["sumas"] = sumas
+  else:
+    agregador["sumas"] += sumas
+
+
+def ResultadoAgregador(agregador):
+  """
+  Devuelve los grupos y sus sumas acumuladas hasta el momento.
+
+  Parámetros:
+      agregador (dict): Agregador creado con CrearAgregador.
+
+  Retorna:
+      tuple: (nombres, sumas) con los nombres de los grupos y la matriz de sumas.
+  """
+  sumas = agregador["sumas"]
+  if sumas is None:
+    sumas = np.zeros((len(agregador["nombres"]), 0))
+  return np.array(agregador["nombres"]), sumas
+
+
+def AgruparCsvPorBloques(ruta, delimitador : str, ini : str, fin : str, grupos, tamano_bloque=10000):
+  """
+  Lee un CSV en streaming y suma sus filas por grupo en una sola pasada.
+
+  Parámetros:
+      ruta (str): Ruta del archivo CSV.
+      delimitador (str): Carácter usado como delimitador en el CSV.
+      ini (str): Cadena que indica el inicio del bloque de datos a extraer.
+      fin (str): Cadena que indica el final del bloque de datos a extraer.
+      grupos (dict): Diccionario {etiqueta: grupo}.
+      tamano_bloque (int): Número máximo de filas en memoria a la vez.
+
+  Retorna:
+      tuple: (nombres, sumas) igual que ResultadoAgregador.
+  """
+  agregador = CrearAgregador(grupos)
+  for bloque in LectorCsvPorBloques(ruta, delimitador, ini, fin, tamano_bloque):
+    AcumularBloque(agregador, bloque)
+  return ResultadoAgregador(agregador)
+
+
+VALORES_AUSENTES = ("", "..", "-", ".")
+
+
+def ValorNumerico(celda):
+  """
+  Convierte una celda de texto en número; las celdas sin dato del INE ("..", "-", vacías) dan NaN.
+
+  Parámetros:
+      celda (str): Texto de la celda.
+
+  Retorna:
+      float: Valor numérico de la celda.
+  """
+  celda = celda.strip()
+  if celda in VALORES_AUSENTES:
+    return np.nan
+  return float(celda)
+
+
+def TipoNumericoCompacto(valores):
+  """
+  Devuelve los valores con el tipo numérico más compacto que los representa sin pérdida.
+
+  Si todos los valores son enteros se usa int32 (o int64 si no caben); en otro caso se mantiene float64.
+
+  Parámetros:
+      valores (numpy.ndarray): Matriz de números en float64.
+
+  Retorna:
+      numpy.ndarray: Matriz con tipo int32, int64 o float64.
+  """
+  if valores.size == 0 or not np.all(np.isfinite(valores)) or not np.all(valores == np.floor(valores)):
+    return valores
+
+  for tipo in (np.int32, np.int64):
+    limites = np.iinfo(tipo)
+    if valores.min() >= limites.min and valores.max() <= limites.max:
+      return valores.astype(tipo)
+
+  return valores
+
+
+@perfil.Perfilado
+def LeerCsvNumerico(ruta, delimitador : str, ini : str, fin : str, capacidad=1024):
+  """
+  Lee las filas entre dos marcadores separando la columna de etiquetas y los datos numéricos.
+
+  A diferencia de LectorCsv no construye la matriz intermedia de cadenas: cada fila se
+  convierte directamente en una matriz numérica reservada de antemano (que se amplía
+  duplicando su capacidad si hace falta).
+
   Parámetros:
       ruta (str): Ruta del archivo CSV.
       delimitador (str): Carácter usado como delimitador en el CSV. Debe tener longitud 1.
       ini (str): Cadena que indica el inicio del bloque de datos a extraer.
       fin (str): Cadena que indica el final del bloque de datos a extraer.
+      capacidad (int): Número de filas reservadas inicialmente.
+
+  Retorna:
+      tuple:
+          etiquetas (numpy.ndarray): Primera columna de cada fila.
+          valores (numpy.ndarray): Resto de columnas (int32/int64 si son enteras, float64 si no).
+
+  Excepciones:
+      ValueError: Si el delimitador tiene una longitud distinta de 1 o las filas no tienen
+                  el mismo número de columnas.
+  """
+  if len(delimitador) !=1:
+    raise ValueError("El delimitador debe ser un solo caracter")
+
+  etiquetas = []
+  valores = None
+  n = 0
+
+  for reg in FilasEntreMarcadores(ruta, delimitador, ini, fin):
+    if valores is None:
+      valores = np.empty((max(capacidad, 1), len(reg) - 1))
+    elif n == valores.shape[0]:
+      ampliada = np.empty((2 * n, valores.shape[1]))
+      ampliada[:n] = valores
+      valores = ampliada
+
+    if len(reg) - 1 != valores.shape[1]:
+      raise ValueError(f"La fila '{reg[0]}' tiene {len(reg) - 1} valores y se esperaban {valores.shape[1]}")
+
+    etiquetas.append(reg[0])
+    try:
+      valores[n] = reg[1:]
+    except ValueError:
+      valores[n] = [ValorNumerico(celda) for celda in reg[1:]]
+    n += 1
+
+  if valores is None:
+    return np.array(etiquetas), np.empty((0, 0))
+
+  return np.array(etiquetas), TipoNumericoCompacto(valores[:n])
+
+
+def CabeceraCsv(ruta, delimitador : str, ini : str):
+  """
+  Devuelve las filas de un fichero CSV anteriores a la que contiene el marcador de inicio.
+
+  En los CSV del INE son las líneas de título y las cabeceras de las columnas.
+
+  Parámetros:
+      ruta (str): Ruta del archivo CSV.
+      delimitador (str): Carácter usado como delimitador en el CSV.
+      ini (str): Cadena que indica el inicio del bloque de datos.
+
+  Retorna:
+      list[list[str]]: Filas anteriores al marcador.
+  """
+  filas = []
+  with AbrirTexto(ruta) as csvarchivo:
+    for reg in csv.reader(csvarchivo, delimiter=delimitador):
+      if ini in reg:
+        break
+      if reg and reg[-1] == '':
+        reg = reg[:-1]
+      filas.append(reg)
+  return filas
+
+
+def EjesCabecera(filas, n_columnas):
+  """
+  Obtiene los ejes de sexo y año de las dos últimas filas de cabecera de un CSV del INE.
+
+  La penúltima fila tiene el nombre de cada grupo de columnas solo en la primera
+  columna del grupo (";Total;;;...;Hombres;;;...") y la última el año de cada
+  columna (";2017;2016;..."). Todos los grupos tienen que tener los mismos años.
+
+  Parámetros:
+      filas (list[list[str]]): Filas de cabecera (ver CabeceraCsv).
+      n_columnas (int): Número de columnas de datos.
+
+  Retorna:
+      tuple: (sexos, anos) con los nombres de los grupos (tuple[str]) y los años (numpy.ndarray)
+
+  Excepciones:
+      ValueError: Si las cabeceras no tienen esa estructura.
+  """
+  if not filas or len(filas[-1]) - 1 < n_columnas:
+    raise ValueError(f"La cabecera de años no tiene las {n_columnas} columnas de datos")
+
+  anos_columnas = [celda.strip() for celda in filas[-1][1:n_columnas + 1]]
+  grupos_columnas = filas[-2][1:n_columnas + 1] if len(filas) > 1 else []
+
+  sexos = tuple(celda.strip() for celda in grupos_columnas if celda.strip()) or ("Total",)
+  n_anos = n_columnas // len(sexos)
+
+  if not all(ano.isdigit() for ano in anos_columnas) or n_anos * len(sexos) != n_columnas:
+    raise ValueError(f"La cabecera no reparte las {n_columnas} columnas en {len(sexos)} grupos de años")
+
+  anos = np.array(anos_columnas, dtype=np.int64).reshape(len(sexos), n_anos)
+  if not (anos == anos[0]).all():
+    raise ValueError("Los grupos de columnas de la cabecera no tienen los mismos años")
+
+  return sexos, anos[0]
+
+
+def CrearCubo(regiones, sexos, anos, datos):
+  """
+  Crea un cubo de población con los ejes región x sexo x año.
+
+  Parámetros:
+      regiones (numpy.ndarray): Etiqueta de cada región (eje 0).
+      sexos (tuple[str]): Nombre de cada sexo o desagregación (eje 1), p. ej. ("Total", "Hombres", "Mujeres").
+      anos (numpy.ndarray): Año de cada posición del eje 2, en el orden del CSV.
+      datos (numpy.ndarray): Matriz (regiones x sexos x años).
+
+  Retorna:
+      dict: Cubo {"regiones", "sexos", "anos", "datos"}
+  """
+  return {
+    "regiones": np.asarray(regiones),
+    "sexos": tuple(str(sexo) for sexo in sexos),
+    "anos": np.asarray(anos),
+    "datos": datos,
+  }
+
+
+@perfil.Perfilado
+def LeerCuboPoblacion(ruta : str, usar_cache=True):
+  """
+  Lee un CSV de población del INE como cubo región x sexo x año.
+
+  Los sexos y los años se leen de las cabeceras del CSV, así que sirve para series
+  de cualquier longitud. El cubo es una vista de la matriz leída, sin copias; se
+  guarda en la caché en disco (ver cache.py) y las siguientes lecturas lo abren con
+  memoria mapeada mientras el CSV no cambie.
+
+  Parámetros:
+      ruta (str): Ruta del archivo CSV con los datos de población.
+      usar_cache (bool): Si es False se procesa siempre el CSV.
+
+  Retorna:
+      dict: Cubo de población (ver CrearCubo); la primera región es "Total Nacional".
+  """
+  def leer():
+    regiones, valores = LeerCsvNumerico(
+        ruta=ruta,
+        delimitador=";",
+        ini="Total Nacional",
+        fin="Notas:"
+    )
+    sexos, anos = EjesCabecera(CabeceraCsv(ruta, ";", "Total Nacional"), valores.shape[1])
+
+    # Solo hace falta redondear si el CSV trae decimales (si no, los datos ya son enteros)
+    if valores.dtype.kind == "f":
+      valores = np.round(valores)
+
+    datos = valores.reshape(len(regiones), len(sexos), len(anos))
+    return {"regiones": regiones, "sexos": np.array(sexos), "anos": anos, "datos": datos}
+
+  cubo = cache.LeerConCache(ruta, "cubo", leer, usar_cache)
+  return CrearCubo(cubo["regiones"], cubo["sexos"], cubo["anos"], cubo["datos"])
+
+
+def EscribirCuboCsv(ruta, cubo, titulo="Población por regiones y sexo.\nUnidades: Personas"):
+  """
+  Escribe un cubo de población como CSV con el formato del INE (lo que lee LeerCuboPoblacion).
+
+  Las celdas sin dato (NaN) se escriben como "..". El fichero se escribe en un
+  temporal del mismo directorio que después se renombra.
+
+  Parámetros:
+      ruta (str): Ruta del CSV.
+      cubo (dict): Cubo de población; tiene que tener la fila "Total Nacional".
+      titulo (str): Líneas de título anteriores a las cabeceras.
+
+  Retorna:
+      None
+  """
+  datos = np.asarray(cubo["datos"])
+  huecos = ";" * (len(cubo["anos"]) - 1)
+  anos = ";".join(str(ano) for ano in cubo["anos"].tolist())
+  tabla = datos.reshape(len(datos), -1)
+
+  # Los enteros (aunque vengan en float64) se escriben sin decimales, como los lee LeerCsvNumerico
+  conocidos = tabla[~np.isnan(tabla)] if tabla.dtype.kind == "f" else tabla
+  if np.array_equal(conocidos, np.floor(conocidos)):
+    formato = lambda v: ".." if v != v else str(int(v))
+  else:
+    formato = lambda v: ".." if v != v else repr(v)
+
+  directorio = os.path.dirname(os.path.abspath(ruta))
+  descriptor, temporal = tempfile.mkstemp(prefix=".tmp-", suffix=".csv", dir=directorio)
+  try:
+    with open(descriptor, "w", encoding="utf8", newline="") as f:
+      f.write(titulo + "\n")
+      f.write("".join(f";{sexo}{huecos}" for sexo in cubo["sexos"]) + ";\n")
+      f.write(f";{';'.join([anos] * len(cubo['sexos']))};\n")
+      for etiqueta, fila in zip(cubo["regiones"].tolist(), tabla.tolist()):
+        f.write(etiqueta + ";" + ";".join(map(formato, fila)) + ";\n")
+      f.write("Notas:\n")
+    os.chmod(temporal, 0o644)
+    os.replace(temporal, ruta)
+  except BaseException:
+    os.unlink(temporal)
+    raise
+
+
+def LeerPoblacionProvincias(ruta : str, usar_cache=True):
+
+  """
+  Lee los datos de población por provincias desde un CSV y los organiza en matrices NumPy.
+
+  Es una vista del cubo de población (ver LeerCuboPoblacion) separada por sexos.
+
+  Parámetros:
+      ruta (str): Ruta del archivo CSV con los datos de población.
+      usar_cache (bool): Si es False se procesa siempre el CSV.
+
+  Retorna:
+      tuple:
+          provincias (numpy.ndarray): Nombres de las provincias.
+          total (numpy.ndarray): Población total por años (entera si el CSV no trae decimales).
+          hombres (numpy.ndarray): Datos de población masculina.
+          mujeres (numpy.ndarray): Datos de población femenina.
+  """
+  cubo = LeerCuboPoblacion(ruta, usar_cache)
+
+  return cubo["regiones"], SexoCubo(cubo, "Total"), SexoCubo(cubo, "Hombres"), SexoCubo(cubo, "Mujeres")
+
+
+def SexoCubo(cubo, sexo):
+  """
+  Devuelve la matriz región x año de un sexo del cubo (vista, sin copia).
+
+  Parámetros:
+      cubo (dict): Cubo de población.
+      sexo (str): Nombre del sexo ("Total", "Hombres", "Mujeres").
+
+  Retorna:
+      numpy.ndarray: Matriz (regiones x años).
+  """
+  return cubo["datos"][:, cubo["sexos"].index(sexo), :]
+
+
+def TablaCubo(cubo, sexos=None):
+  """
+  Devuelve el cubo como tabla región x (sexo, año), con las columnas en el orden del CSV.
+
+  Parámetros:
+      cubo (dict): Cubo de población.
+      sexos (tuple[str], opcional): Sexos que se incluyen, en ese orden (por defecto, todos).
+
+  Retorna:
+      numpy.ndarray: Matriz (regiones x sexos * años); vista si se incluyen todos los sexos.
+  """
+  datos = cubo["datos"]
+  if sexos is not None:
+    datos = datos[:, [cubo["sexos"].index(sexo) for sexo in sexos], :]
+  return datos.reshape(datos.shape[0], -1)
+
+
+def SeleccionarCubo(cubo, regiones=slice(None), anos=slice(None)):
+  """
+  Devuelve un cubo con un subconjunto de regiones y años.
+
+  Con slices el resultado es una vista; con listas de índices, una copia de esas filas.
+
+  Parámetros:
+      cubo (dict): Cubo de población.
+      regiones (slice | numpy.ndarray): Regiones que se seleccionan (índices).
+      anos (slice | numpy.ndarray): Años que se seleccionan (índices).
+
+  Retorna:
+      dict: Cubo con la selección.
+  """
+  return CrearCubo(cubo["regiones"][regiones], cubo["sexos"], cubo["anos"][anos], cubo["datos"][regiones][:, :, anos])
+
+
+def PosicionesCubo(cubo, indice, regiones=None, anos=None):
+  """
+  Busca las posiciones en el cubo de unas regiones (por etiqueta o código INE) y unos años.
+
+  Las posiciones se devuelven ordenadas y sin repetir, es decir, en el orden del cubo.
+
+  Parámetros:
+      cubo (dict): Cubo de población.
+      indice (dict): Índice {etiqueta o código: fila} de las regiones (ver jerarquia.IndiceRegiones).
+      regiones (list, opcional): Etiquetas ("02 Albacete") o códigos INE (2) de las regiones.
+      anos (list[int], opcional): Años.
+
+  Retorna:
+      tuple: (filas, columnas) como tuplas de índices, o None en los ejes que no se filtran.
+
+  Excepciones:
+      ValueError: Si alguna región o año no está en el cubo.
+  """
+  filas = columnas = None
+
+  if regiones is not None:
+    desconocidas = [str(region) for region in regiones if region not in indice]
+    if desconocidas:
+      raise ValueError(f"Regiones desconocidas: {', '.join(desconocidas)}")
+    filas = tuple(sorted({indice[region] for region in regiones}))
+
+  if anos is not None:
+    posiciones = {ano: j for j, ano in enumerate(cubo["anos"].tolist())}
+    desconocidos = [str(ano) for ano in anos if ano not in posiciones]
+    if desconocidos:
+      raise ValueError(f"Años sin datos: {', '.join(desconocidos)}")
+    columnas = tuple(sorted({posiciones[ano] for ano in anos}))
+
+  return filas, columnas
+
+
+def SinTotalesCubo(cubo):
+  """
+  Quita las regiones sin código INE (p. ej. "Total Nacional").
+
+  Parámetros:
+      cubo (dict): Cubo de población.
+
+  Retorna:
+      dict: Cubo con solo las regiones con código; vista si son consecutivas.
+  """
+  filas = np.flatnonzero(CodigosEtiquetas(cubo["regiones"]) >= 0)
+  if filas.size and filas[-1] - filas[0] + 1 == filas.size:
+    filas = slice(filas[0], filas[-1] + 1)
+  return SeleccionarCubo(cubo, regiones=filas)
+
+
+def AgruparCubo(cubo, grupos):
+  """
+  Suma las regiones del cubo por grupo (p. ej. provincias por comunidad autónoma).
+
+  Parámetros:
+      cubo (dict): Cubo de población.
+      grupos (dict): Diccionario {región o código: grupo} (ver CompilarGrupos).
+
+  Retorna:
+      dict: Cubo con una región por grupo (en orden de aparición) y las sumas en float64.
+  """
+  compilados = CompilarGrupos(grupos)
+  n_grupos = len(compilados["nombres"])
+  indices = IndiceGrupos(cubo["regiones"], compilados)
+
+  sumas = SumarPorGrupos(TablaCubo(cubo), indices, n_grupos)
+  return CrearCubo(np.array(compilados["nombres"]), cubo["sexos"], cubo["anos"], sumas.reshape(n_grupos, *cubo["datos"].shape[1:]))
+
+
+def IndicesMayores(valores, n):
+  """
+  Devuelve las filas de los n valores mayores de cada columna, de mayor a menor.
+
+  Con np.argpartition solo se separan los n mayores de cada columna (tiempo lineal)
+  y solo esos se ordenan; con una matriz se hace para todas las columnas a la vez.
+  Los NaN cuentan como los valores más pequeños y en los empates va antes la fila
+  menor, así que el resultado es el mismo que con una ordenación estable completa.
+
+  Parámetros:
+      valores (numpy.ndarray): Vector (filas) o matriz (filas x columnas).
+      n (int): Número de filas por columna.
+
+  Retorna:
+      numpy.ndarray: Índices de fila (n) o (n x columnas).
+  """
+  valores = np.asarray(valores)
+  n_filas = len(valores)
+  n = max(0, min(n, n_filas))
+  if n == 0:
+    return np.empty((0,) + valores.shape[1:], dtype=np.intp)
+
+  # Se trabaja con una columna por fila de la matriz, así cada partición recorre memoria contigua
+  claves = np.ascontiguousarray(np.moveaxis(valores, 0, -1)).reshape(-1, n_filas)
+  if claves.dtype.kind == "f":
+    claves = np.where(np.isnan(claves), -np.inf, claves)
+
+  if n < n_filas:
+    k = n_filas - n
+    particion = np.argpartition(claves, k, axis=1)
+    filas = particion[:, k:]
+
+    # Si hay valores iguales al n-ésimo mayor fuera de la selección, argpartition ha
+    # elegido entre ellos al azar: en esas columnas entran los de menor fila
+    umbral = np.take_along_axis(claves, particion[:, k:k + 1], axis=1)
+    empates = (claves == umbral).sum(axis=1) > (np.take_along_axis(claves, filas, axis=1) == umbral).sum(axis=1)
+    if empates.any():
+      columnas, limite = claves[empates], umbral[empates]
+      iguales = columnas == limite
+      faltan = n - (columnas > limite).sum(axis=1, keepdims=True)
+      seleccion = (columnas > limite) | (iguales & (np.cumsum(iguales, axis=1) <= faltan))
+      filas[empates] = np.nonzero(seleccion)[1].reshape(-1, n)
+  else:
+    filas = np.broadcast_to(np.arange(n_filas), claves.shape)
+
+  # Orden de los seleccionados: valor descendente y, en los empates, fila ascendente
+  orden = np.lexsort((-filas, np.take_along_axis(claves, filas, axis=1)), axis=1)[:, ::-1]
+  filas = np.take_along_axis(filas, orden, axis=1)
+  return np.moveaxis(filas.reshape(valores.shape[1:] + (n,)), -1, 0)
+
+
+def TopRegionesCubo(cubo, n=10, sexo="Total"):
+  """
+  Devuelve las n regiones con mayor población media de todos los años.
+
+  Parámetros:
+      cubo (dict): Cubo de población.
+      n (int): Número de regiones.
+      sexo (str): Sexo por el que se ordena.
+
+  Retorna:
+      dict: Cubo con esas regiones, de mayor a menor población media.
+  """
+  medias = np.mean(SexoCubo(cubo, sexo), axis=1, dtype=np.float64)
+  return SeleccionarCubo(cubo, regiones=IndicesMayores(medias, n))
+
+
+def RangoAnos(anos):
+  """
+  Texto con el primer y el último año de una serie ("2011-2017").
+
+  Parámetros:
+      anos (numpy.ndarray): Años.
+
+  Retorna:
+      str: "<primero>-<último>", o solo el año si la serie tiene uno
+  """
+  primero, ultimo = int(np.min(anos)), int(np.max(anos))
+  return str(primero) if primero == ultimo else f"{primero}-{ultimo}"
+
+
+NOMBRE_ESTILO = "estilo.css"
+
+ENLACE_ESTILO_HTML = f'<link rel="stylesheet" href="{NOMBRE_ESTILO}">'
+
+PLANTILLA_INICIO_HTML = """<!DOCTYPE html><html>
+    <head><title>Tabla de Variación de Población</title>
+    <link rel="stylesheet" href="estilo.css">
+    <meta charset="utf8"></head>
+    <body>
+    <h1>{}</h1>
+    """
+
+INICIO_TABLA_HTML = """<table>
+    """
+
+FIN_TABLA_HTML = "</table>"
+
+FIN_HTML = "</body></html>"
+
+# Formato en el que se incrustan los gráficos en las páginas autónomas y su tipo MIME
+FORMATO_GRAFICO_AUTONOMO = "svg"
+TIPOS_MIME = {"svg": "image/svg+xml", "png": "image/png"}
+
+
+def HtmlAutonomo():
+    """
+    Indica si las páginas se generan autónomas (variable de entorno POBLACION_HTML_AUTONOMO).
+
+    Una página autónoma lleva dentro la hoja de estilos y los gráficos, así que se sirve
+    con una sola petición en lugar de una por la página, otra por el CSS y otra por imagen.
+
+    Retorna:
+        bool: True si la variable está definida y no es "" ni "0".
+    """
+    return os.environ.get("POBLACION_HTML_AUTONOMO", "") not in ("", "0")
+
+
+# Formas de escribir las tablas de las páginas (ver ModoTablas)
+MODOS_TABLAS = ("tabla", "paginas", "json")
+
+# Las tablas con más filas que esto se dividen en páginas o se cargan desde JSON
+FILAS_POR_PAGINA = 500
+
+# Sufijo del fichero que anota las páginas y los JSON de tablas de cada página (ver BorrarFicherosTablas)
+SUFIJO_FICHEROS_TABLAS = ".tablas.json"
+
+# Alto (en píxeles) de cada fila y de la zona visible de las tablas cargadas desde JSON
+ALTO_FILA_VIRTUAL = 32
+ALTO_TABLA_VIRTUAL = 600
+
+# Muestra solo las filas visibles (y unas pocas más) de las tablas cargadas desde JSON;
+# las filas de arriba y de abajo se sustituyen por una fila vacía de la misma altura
+SCRIPT_TABLA_VIRTUAL = """<script>
+document.querySelectorAll("div.tabla-virtual").forEach(function (caja) {
+  var cuerpo = caja.querySelector("tbody"), alto = +caja.dataset.altoFila, columnas = caja.dataset.columnas, filas = [];
+  function Relleno(n) {
+    return n > 0 ? '<tr><td colspan="' + columnas + '" style="height:' + n * alto + 'px; padding:0; border:0;"></td></tr>' : "";
+  }
+  function Pintar() {
+    var ini = Math.max(0, Math.floor(caja.scrollTop / alto) - 10);
+    var fin = Math.min(filas.length, ini + Math.ceil(caja.clientHeight / alto) + 20);
+    var html = Relleno(ini);
+    for (var i = ini; i < fin; i++) {
+      html += "<tr style='height:" + alto + "px;'><td style='width:100px;'>" + filas[i].join("</td><td>") + "</td></tr>";
+    }
+    cuerpo.innerHTML = html + Relleno(filas.length - fin);
+  }
+  var pendiente = false;
+  caja.addEventListener("scroll", function () {
+    if (!pendiente) {
+      pendiente = true;
+      requestAnimationFrame(function () { pendiente = false; Pintar(); });
+    }
+  });
+  fetch(caja.dataset.fuente)
+    .then(function (respuesta) { return respuesta.json(); })
+    .then(function (datos) { filas = datos.filas; Pintar(); })
+    .catch(function () {
+      cuerpo.innerHTML = '<tr><td colspan="' + columnas + '">No se han podido cargar los datos (' + caja.dataset.fuente +
+                         '); la página tiene que abrirse desde un servidor HTTP.</td></tr>';
+    });
+});
+</script>
+"""
+
+
+def ModoTablas():
+    """
+    Indica cómo se escriben las tablas grandes (variable de entorno POBLACION_HTML_MODO).
+
+    - "tabla" (por defecto): una única tabla en la página.
+    - "paginas": las filas se reparten en páginas de FILAS_POR_PAGINA filas y la página
+      principal es un índice con un enlace a cada una.
+    - "json": los datos se escriben en un fichero JSON junto a la página y un pequeño
+      script los carga y muestra solo las filas visibles.
+
+    Retorna:
+        str: Uno de MODOS_TABLAS.
+
+    Excepciones:
+        ValueError: Si la variable tiene un valor desconocido.
+    """
+    modo = os.environ.get("POBLACION_HTML_MODO", "") or "tabla"
+    if modo not in MODOS_TABLAS:
+        raise ValueError(f"POBLACION_HTML_MODO desconocido: {modo} (valores: {', '.join(MODOS_TABLAS)})")
+    return modo
+
+
+def TotalesEstrictos():
+    """
+    Indica si una diferencia con los totales publicados detiene los informes
+    (variable de entorno POBLACION_TOTALES_ESTRICTOS; por defecto solo se avisa, ver jerarquia.ComprobarTotales).
+
+    Retorna:
+        bool: True si la variable está definida y no es "" ni "0".
+    """
+    return os.environ.get("POBLACION_TOTALES_ESTRICTOS", "") not in ("", "0")
+
+
+@functools.lru_cache(maxsize=None)
+def CompilarCabecera(etiqueta, niveles, anos, estilo_etiqueta=None):
+    """
+    Genera (una sola vez por combinación de argumentos) la cabecera HTML de una tabla agrupada.
+
+    La cabecera tiene una fila por cada nivel de agrupación y una última fila con los años.
+    Cada grupo de un nivel se repite dentro de cada grupo del nivel anterior, p. ej.
+    niveles=(("Variación Absoluta", "Variación Relativa"), ("Hombres", "Mujeres")).
+
+    Parámetros:
+        etiqueta (str): Texto de la columna de etiquetas (p. ej. "CCAA").
+        niveles (tuple[tuple[str]]): Grupos de cada nivel, del más externo al más interno.
+        anos (tuple): Años de la última fila de la cabecera.
+        estilo_etiqueta (str, opcional): Estilo CSS de la celda de la etiqueta.
+
+    Retorna:
+        str: Código HTML de la cabecera de la tabla
+    """
+    estilo = f' style="{estilo_etiqueta}"' if estilo_etiqueta else ""
+    cabecera = f'<tr><th rowspan="{len(niveles) + 1}"{estilo}>{etiqueta}</th>'
+
+    repeticiones = 1
+    for k, grupos in enumerate(niveles):
+        # Columnas que ocupa cada grupo de este nivel: los años por los grupos de los niveles interiores
+        colspan = len(anos)
+        for interiores in niveles[k + 1:]:
+            colspan *= len(interiores)
+
+        if k > 0:
+            cabecera += "<tr>"
+        cabecera += "".join(f'<th colspan="{colspan}" class="group-header">{grupo}</th>' for grupo in grupos) * repeticiones
+        cabecera += "</tr>"
+        repeticiones *= len(grupos)
+
+    celdas_ano = "".join(f"<th>{ano}</th>" for ano in anos)
+    cabecera += "<tr>" + celdas_ano * repeticiones + "</tr>"
+
+    return cabecera
+
+
+def CrearEsquema(etiqueta, niveles, anos):
+    """
+    Describe las columnas de una tabla agrupada: las mismas y en el mismo orden que CompilarCabecera.
+
+    Parámetros:
+        etiqueta (str): Texto de la columna de etiquetas (p. ej. "CCAA").
+        niveles (tuple[tuple[str]]): Grupos de cada nivel, del más externo al más interno.
+        anos (tuple): Años de cada grupo.
+
+    Retorna:
+        dict: Esquema {"etiqueta": etiqueta, "columnas": [(grupo, ..., año), ...]}
+    """
+    return {"etiqueta": etiqueta, "columnas": list(itertools.product(*niveles, anos))}
+
+
+def FormatearColumna(columna, decimales=2):
+    """
+    Formatea al estilo español todos los valores de una columna.
+
+    Parámetros:
+        columna (numpy.ndarray): Valores de la columna
+        decimales (int): Número de decimales (se ignora en los números enteros)
+
+    Retorna:
+        list[str]: Valores formateados
+    """
+    return FormatearNumeros(columna, decimales).tolist()
+
+
+def CrearDocumento(titulo):
+    """
+    Crea un documento HTML vacío al que se añaden tablas e imágenes antes de escribirlo.
+
+    Parámetros:
+        titulo (str): Título de la página
+
+    Retorna:
+        dict: Documento {"titulo": titulo, "bloques": [...]}
+    """
+    return {"titulo": titulo, "bloques": []}
+
+
+def AñadirTabla(documento, cabecera, etiquetas, valores, decimales=2, esquema=None):
+    """
+    Añade una tabla de datos al documento (los datos no se formatean hasta escribirlo).
+
+    Parámetros:
+        documento (dict): Documento creado con CrearDocumento
+        cabecera (str): Filas <tr> de la cabecera (ver CompilarCabecera)
+        etiquetas (numpy.ndarray): Texto de la primera columna de cada fila
+        valores (numpy.ndarray): Matriz (filas x columnas) de números
+        decimales (int): Número de decimales de los valores no enteros
+        esquema (dict, opcional): Descripción de las columnas (ver CrearEsquema); las tablas
+                                  con esquema se pueden exportar sin formato (ver exportacion.py)
+
+    Retorna:
+        None
+    """
+    documento["bloques"].append({
+        "tipo": "tabla",
+        "cabecera": cabecera,
+        "etiquetas": etiquetas,
+        "valores": np.asarray(valores).reshape(len(etiquetas), -1),
+        "decimales": decimales,
+        "esquema": esquema,
+    })
+
+
+def AñadirImagen(documento, ruta_imagen, ancho=None, alto=None, generar=None):
+    """
+    Añade una imagen centrada al documento.
+
+    Parámetros:
+        documento (dict): Documento creado con CrearDocumento
+        ruta_imagen (str): Ruta de la imagen, relativa a la página HTML
+        ancho (int, opcional): Ancho de la imagen en píxeles
+        alto (int, opcional): Alto de la imagen en píxeles
+        generar (callable, opcional): Función generar(destino, formato) que dibuja la imagen
+                                      en un fichero abierto; en las páginas autónomas se usa
+                                      para incrustarla sin leerla de disco
+
+    Retorna:
+        None
+    """
+    documento["bloques"].append({"tipo": "imagen", "ruta": ruta_imagen, "ancho": ancho, "alto": alto, "generar": generar})
+
+
+def EscribirFilasTabla(archivo, etiquetas, valores, decimales=2, filas_por_bloque=1000):
+    """
+    Escribe las filas <tr> de una tabla por bloques de filas.
+
+    Cada bloque se formatea columna a columna y se escribe directamente en el fichero,
+    así que en memoria solo está el texto de un bloque y no el de la página entera.
+
+    Parámetros:
+        archivo (file): Fichero de texto abierto para escritura
+        etiquetas (numpy.ndarray): Texto de la primera columna de cada fila
+        valores (numpy.ndarray): Matriz (filas x columnas) de números
+        decimales (int): Número de decimales de los valores no enteros
+        filas_por_bloque (int): Número de filas que se formatean y escriben a la vez
+
+    Retorna:
+        None
+    """
+    for ini in range(0, len(etiquetas), filas_por_bloque):
+        bloque = valores[ini:ini + filas_por_bloque]
+        columnas = [FormatearColumna(bloque[:, j], decimales) for j in range(bloque.shape[1])]
+        filas = ["</td><td>".join(celdas) for celdas in zip(*columnas)] or [None] * len(bloque)
+
+        archivo.write("".join(
+            f"<tr><td style='width:100px;'>{etiqueta}</td>" + (f"<td>{celdas}</td>" if celdas is not None else "") + "</tr>"
+            for etiqueta, celdas in zip(etiquetas[ini:ini + filas_por_bloque], filas)
+        ))
+
+
+def EtiquetaImagen(ruta_imagen, ancho=None, alto=None):
+    """
+    Genera la etiqueta <img> de una imagen centrada.
+
+    Parámetros:
+        ruta_imagen (str): Ruta (o URL data:) de la imagen
+        ancho (int, opcional): Ancho de la imagen en píxeles
+        alto (int, opcional): Alto de la imagen en píxeles
+
+    Retorna:
+        str: Código HTML de la imagen
+    """
+    atributos = ""
+    if ancho:
+        atributos += f' width="{ancho}"'
+    if alto:
+        atributos += f' height="{alto}"'
+
+    return f'<img src="{ruta_imagen}"{atributos} style="display:block; margin:20px auto;">\n'
+
+
+def EstiloEnLinea(directorio):
+    """
+    Genera la etiqueta <style> con la hoja de estilos de un directorio de resultados.
+
+    Parámetros:
+        directorio (str): Directorio de la página HTML
+
+    Retorna:
+        str: Etiqueta <style>, o el enlace a la hoja de estilos si no existe el fichero
+    """
+    try:
+        with open(os.path.join(directorio, NOMBRE_ESTILO), encoding="utf8") as f:
+            return f"<style>{f.read()}</style>"
+    except OSError:
+        return ENLACE_ESTILO_HTML
 
-  Retorna:
-      numpy.ndarray: Matriz con las filas seleccionadas del archivo CSV.
 
-  Excepciones:
-      ValueError: Si el delimitador tiene una longitud distinta de 1.
-  """
-  if len(delimitador) !=1:
-    raise ValueError("El delimitador debe ser un solo caracter")
+@perfil.Perfilado
+def ImagenEnLinea(bloque, directorio, formato=FORMATO_GRAFICO_AUTONOMO):
+    """
+    Devuelve una imagen del documento como URL data: en base64.
 
-  lista_csv = []
-  escribir = False
-  
-  with open(ruta, encoding="utf8") as csvarchivo:
-    entrada = csv.reader(csvarchivo, delimiter=delimitador)
-    for reg in entrada:
-        if reg[-1] == '':
-          reg = reg[:-1]
-        if fin in reg:
-          escribir = False
-        if ini in reg or escribir:
-          escribir = True
-          lista_csv.append(reg)
-        
+    Si la imagen se sabe generar se dibuja en memoria, sin pasar por un fichero en
+    disco; si no, se lee el fichero de la imagen.
 
-  np_csv = np.array(lista_csv)  
-  return np_csv
+    Parámetros:
+        bloque (dict): Bloque de imagen del documento (ver AñadirImagen)
+        directorio (str): Directorio de la página HTML
+        formato (str): Formato en el que se dibuja la imagen ("svg" o "png")
 
+    Retorna:
+        str: URL data: de la imagen, o su ruta si no existe el fichero
+    """
+    if bloque["generar"] is not None:
+        buffer = io.BytesIO()
+        bloque["generar"](buffer, formato)
+        datos = buffer.getvalue()
+    else:
+        formato = os.path.splitext(bloque["ruta"])[1][1:].lower()
+        try:
+            with open(os.path.join(directorio, bloque["ruta"]), "rb") as f:
+                datos = f.read()
+        except OSError:
+            return bloque["ruta"]
 
-def LeerPoblacionProvincias(ruta : str):
+    mime = TIPOS_MIME.get(formato, "application/octet-stream")
+    return f"data:{mime};base64,{base64.b64encode(datos).decode('ascii')}"
 
-  """
-  Lee los datos de población por provincias desde un CSV y los organiza en matrices NumPy.
 
-  Parámetros:
-      ruta (str): Ruta del archivo CSV con los datos de población.
+def VolcarDocumento(documento, archivo, directorio, filas_por_bloque=1000, autonomo=False):
+    """
+    Escribe el HTML del documento en un fichero de texto abierto (o en un io.StringIO).
 
-  Retorna:
-      tuple:
-          provincias (numpy.ndarray): Nombres de las provincias.
-          total (numpy.ndarray): Población total por años (float).
-          hombres_2017 (numpy.ndarray): Datos de población masculina.
-          mujeres_2017 (numpy.ndarray): Datos de población femenina.
-  """
-  datos = LectorCsv(
-      ruta=ruta,
-      delimitador=";",
-      ini="Total Nacional",
-      fin="Notas:"
-  )
+    Parámetros:
+        documento (dict): Documento creado con CrearDocumento
+        archivo (file): Fichero de texto abierto para escritura
+        directorio (str): Directorio de la página HTML (de él se lee la hoja de estilos
+                          y las imágenes que no se saben generar)
+        filas_por_bloque (int): Número de filas de las tablas que se formatean y escriben a la vez
+        autonomo (bool): Si es True la hoja de estilos y las imágenes se incrustan en la página
+
+    Retorna:
+        None
+    """
+    inicio = PLANTILLA_INICIO_HTML.format(documento["titulo"])
+    if autonomo:
+        inicio = inicio.replace(ENLACE_ESTILO_HTML, EstiloEnLinea(directorio))
+    archivo.write(inicio)
 
-  provincias = datos[:,0]
-  total = np.round(datos[:,1:9].astype(float),2)
-  hombres_2017 = np.round(datos[:,9:17].astype(float))
-  mujeres_2017 = np.round(datos[:,17:].astype(float))
+    for bloque in documento["bloques"]:
+        if bloque["tipo"] == "tabla":
+            archivo.write(INICIO_TABLA_HTML)
+            archivo.write(bloque["cabecera"])
+            EscribirFilasTabla(archivo, bloque["etiquetas"], bloque["valores"], bloque["decimales"], filas_por_bloque)
+            archivo.write(FIN_TABLA_HTML)
+        elif bloque["tipo"] == "imagen":
+            ruta = ImagenEnLinea(bloque, directorio) if autonomo else bloque["ruta"]
+            archivo.write(EtiquetaImagen(ruta, bloque["ancho"], bloque["alto"]))
+        elif bloque["tipo"] == "html":
+            archivo.write(bloque["html"])
 
-  return provincias,total, hombres_2017, mujeres_2017
+    archivo.write(FIN_HTML)
 
 
-def GenerarHtml(titulo, cabecera, datos, salida, imagen = None):
+def EscribirFicheroAtomico(salida, escribir):
     """
-    Genera una tabla HTML con la variación absoluta y relativa de la población por provincias
+    Escribe un fichero de texto en un temporal del mismo directorio que después se renombra.
 
     Parámetros:
-        provincias (numpy.ndarray): Array con las provincias
-        variacion_absoluta (numpy.ndarray): Array con la variación absoluta de la población por provincias
-        variacion_relativa (numpy.ndarray): Array con la variación relativa de la población por provincias
+        salida (str): Ruta del fichero
+        escribir (callable): Función escribir(archivo) que escribe el contenido en el fichero abierto
 
     Retorna:
         None
     """
-    
-    # Construcción del contenido HTML usando concatenación de strings
-    paginaHTML = """<!DOCTYPE html><html>
-    <head><title>Tabla de Variación de Población</title>
-    <link rel="stylesheet" href="estilo.css">
-    <meta charset="utf8"></head>
-    <body>
-    <h1>{}</h1>
-    <table>
-    """.format(titulo)
-
-    
-    # Fila 1: Cabeceras Agrupadas
-    paginaHTML += cabecera
-    
-    for i in range(datos.shape[0]):
-        paginaHTML += "<tr>"
-        paginaHTML += f"<td style='width:100px;'>{datos[i][0]}</td>"
-        
-        for j in range(1,datos.shape[1]):
-            valor = datos[i][j]
-            valor = FormatearNumero(valor, 2)
-
-            paginaHTML += f"<td>{valor}</td>"
-            
-        paginaHTML += "</tr>"
-        
-    paginaHTML += "</table></body></html>"
-
-    #print("Tabla HTML generada.")
-    # Escritura en fichero
-    with open(salida, "w", encoding="utf8") as archivo:
-        archivo.write(paginaHTML)
-  
-    archivo.close()
+    directorio = os.path.dirname(os.path.abspath(salida))
+    descriptor, temporal = tempfile.mkstemp(prefix=".tmp-", suffix=os.path.splitext(salida)[1], dir=directorio)
+
+    try:
+        with open(descriptor, "w", encoding="utf8") as archivo:
+            escribir(archivo)
+
+        # mkstemp crea el fichero con permisos 0600; se dejan los habituales
+        os.chmod(temporal, 0o644)
+        os.replace(temporal, salida)
+    except BaseException:
+        os.unlink(temporal)
+        raise
+
+
+def EscribirJsonTabla(archivo, etiquetas, valores, decimales=2, filas_por_bloque=1000):
+    """
+    Escribe una tabla como JSON compacto {"filas": [[etiqueta, valor, ...], ...]} por bloques de filas.
+
+    Los valores van ya formateados al estilo español, como en la tabla HTML.
+
+    Parámetros:
+        archivo (file): Fichero de texto abierto para escritura
+        etiquetas (numpy.ndarray): Texto de la primera columna de cada fila
+        valores (numpy.ndarray): Matriz (filas x columnas) de números
+        decimales (int): Número de decimales de los valores no enteros
+        filas_por_bloque (int): Número de filas que se formatean y escriben a la vez
+
+    Retorna:
+        None
+    """
+    archivo.write('{"filas":[')
+    for ini in range(0, len(etiquetas), filas_por_bloque):
+        bloque = valores[ini:ini + filas_por_bloque]
+        columnas = [FormatearColumna(bloque[:, j], decimales) for j in range(bloque.shape[1])]
+        filas = zip(np.asarray(etiquetas[ini:ini + filas_por_bloque]).tolist(), *columnas)
+        archivo.write(("," if ini else "") + ",".join(json.dumps(fila, ensure_ascii=False, separators=(",", ":")) for fila in filas))
+    archivo.write("]}")
+
+
+def NavegacionPaginas(base, tabla, pagina, n_paginas, indice):
+    """
+    Genera los enlaces a la página anterior, al índice y a la siguiente de una tabla dividida.
+
+    Parámetros:
+        base (str): Nombre de la página principal sin extensión
+        tabla (int): Número de la tabla en el documento (desde 1)
+        pagina (int): Número de la página (desde 1)
+        n_paginas (int): Número de páginas de la tabla
+        indice (str): Nombre del fichero de la página principal
+
+    Retorna:
+        str: Código HTML de la navegación
+    """
+    enlaces = []
+    if pagina > 1:
+        enlaces.append(f'<a href="{base}-{tabla}-{pagina - 1}.html">&laquo; Anterior</a>')
+    enlaces.append(f'<a href="{indice}">Índice</a>')
+    if pagina < n_paginas:
+        enlaces.append(f'<a href="{base}-{tabla}-{pagina + 1}.html">Siguiente &raquo;</a>')
+    return f'<p style="text-align:center;">{" | ".join(enlaces)} (página {pagina} de {n_paginas})</p>\n'
+
+
+def RutaFicherosTablas(salida):
+    """
+    Devuelve la ruta del fichero donde se anotan las páginas y los JSON de tablas de una página.
+
+    Parámetros:
+        salida (str): Ruta de la página principal
+
+    Retorna:
+        str: Ruta de ".<base>.tablas.json" en el directorio de la página
+    """
+    directorio, indice = os.path.split(os.path.abspath(salida))
+    return os.path.join(directorio, f".{os.path.splitext(indice)[0]}{SUFIJO_FICHEROS_TABLAS}")
+
+
+def BorrarFicherosTablas(salida, ficheros):
+    """
+    Borra los ficheros de tablas que escribió la ejecución anterior y que la nueva ya no escribe.
+
+    Solo se tocan los ficheros anotados en RutaFicherosTablas(salida) la vez anterior
+    (p. ej. las páginas que sobran si la tabla tiene ahora menos filas, o todos al
+    cambiar de modo); cualquier otro fichero del directorio se deja como está. Después
+    se anotan los ficheros de esta ejecución.
+
+    Parámetros:
+        salida (str): Ruta de la página principal
+        ficheros (list[str]): Nombres de los ficheros de tablas escritos ahora (en el
+                              directorio de la página)
+
+    Retorna:
+        None
+    """
+    registro = RutaFicherosTablas(salida)
+    try:
+        with open(registro, encoding="utf8") as f:
+            anteriores = json.load(f)
+    except (OSError, ValueError):
+        anteriores = []
+
+    directorio = os.path.dirname(registro)
+    for nombre in set(anteriores) - set(ficheros):
+        # Se ignoran nombres con directorio para no borrar nada fuera del de la página
+        if os.path.basename(nombre) == nombre:
+            try:
+                os.unlink(os.path.join(directorio, nombre))
+            except FileNotFoundError:
+                pass
+
+    if ficheros:
+        EscribirFicheroAtomico(registro, lambda archivo: json.dump(sorted(ficheros), archivo, ensure_ascii=False))
+    elif anteriores:
+        os.unlink(registro)
+
+
+@perfil.Perfilado
+def DividirTablas(documento, salida, modo, filas_por_pagina=FILAS_POR_PAGINA, filas_por_bloque=1000, autonomo=False):
+    """
+    Escribe aparte las tablas grandes del documento y devuelve la página principal que las enlaza.
+
+    Las tablas de hasta filas_por_pagina filas se quedan como están. Las mayores se
+    sustituyen según el modo (ver ModoTablas):
+
+    - "paginas": se escriben las páginas <base>-<tabla>-<página>.html, con la cabecera y
+      filas_por_pagina filas cada una, y en su lugar queda la lista de enlaces a ellas.
+    - "json": se escriben los datos en <base>-<tabla>.json y en su lugar queda la tabla
+      vacía con el script que muestra las filas visibles (SCRIPT_TABLA_VIRTUAL).
+
+    Parámetros:
+        documento (dict): Documento creado con CrearDocumento
+        salida (str): Ruta de la página principal
+        modo (str): "paginas" o "json"
+        filas_por_pagina (int): Número de filas de cada página
+        filas_por_bloque (int): Número de filas que se formatean y escriben a la vez
+        autonomo (bool): Si es True las páginas de la tabla llevan dentro la hoja de estilos
+
+    Retorna:
+        tuple: (documento, ficheros) con el documento de la página principal y los nombres
+               de las páginas y los JSON escritos (ver BorrarFicherosTablas)
+
+    Excepciones:
+        ValueError: Si el modo no es "paginas" ni "json" o filas_por_pagina no es positivo.
+    """
+    if modo not in MODOS_TABLAS[1:]:
+        raise ValueError(f"Modo de tablas desconocido: {modo}")
+    if filas_por_pagina < 1:
+        raise ValueError("El número de filas por página debe ser positivo")
+
+    directorio = os.path.dirname(os.path.abspath(salida))
+    indice = os.path.basename(salida)
+    base = os.path.splitext(indice)[0]
+
+    principal = CrearDocumento(documento["titulo"])
+    tablas = 0
+    ficheros = []
+    con_script = False
+
+    for bloque in documento["bloques"]:
+        if bloque["tipo"] != "tabla":
+            principal["bloques"].append(bloque)
+            continue
+        tablas += 1
+        etiquetas, valores = bloque["etiquetas"], bloque["valores"]
+        if len(etiquetas) <= filas_por_pagina:
+            principal["bloques"].append(bloque)
+            continue
+
+        if modo == "paginas":
+            n_paginas = -(-len(etiquetas) // filas_por_pagina)
+            enlaces = []
+            for pagina in range(1, n_paginas + 1):
+                ini, fin = (pagina - 1) * filas_por_pagina, min(pagina * filas_por_pagina, len(etiquetas))
+                navegacion = {"tipo": "html", "html": NavegacionPaginas(base, tablas, pagina, n_paginas, indice)}
+
+                documento_pagina = CrearDocumento(f"{documento['titulo']} (página {pagina} de {n_paginas})")
+                documento_pagina["bloques"].append(navegacion)
+                AñadirTabla(documento_pagina, bloque["cabecera"], etiquetas[ini:fin], valores[ini:fin], bloque["decimales"], bloque["esquema"])
+                documento_pagina["bloques"].append(navegacion)
+                EscribirFicheroAtomico(
+                    os.path.join(directorio, f"{base}-{tablas}-{pagina}.html"),
+                    lambda archivo: VolcarDocumento(documento_pagina, archivo, directorio, filas_por_bloque, autonomo),
+                )
+
+                enlaces.append(f'<li><a href="{base}-{tablas}-{pagina}.html">{etiquetas[ini]} &ndash; {etiquetas[fin - 1]}</a></li>')
+                ficheros.append(f"{base}-{tablas}-{pagina}.html")
+
+            principal["bloques"].append({
+                "tipo": "html",
+                "html": f"<p>{len(etiquetas)} filas en {n_paginas} páginas de {filas_por_pagina}:</p>\n<ol>{''.join(enlaces)}</ol>\n",
+            })
+        else:
+            fuente = f"{base}-{tablas}.json"
+            EscribirFicheroAtomico(
+                os.path.join(directorio, fuente),
+                lambda archivo: EscribirJsonTabla(archivo, etiquetas, valores, bloque["decimales"], filas_por_bloque),
+            )
+            principal["bloques"].append({
+                "tipo": "html",
+                "html": (f'<div class="tabla-virtual" data-fuente="{fuente}" data-alto-fila="{ALTO_FILA_VIRTUAL}" '
+                         f'data-columnas="{valores.shape[1] + 1}" style="height:{ALTO_TABLA_VIRTUAL}px; overflow-y:auto;">'
+                         f'<table><thead>{bloque["cabecera"]}</thead><tbody></tbody></table></div>\n'
+                         f'<p>{len(etiquetas)} filas.</p>\n'),
+            })
+            ficheros.append(fuente)
+            con_script = True
+
+    if con_script:
+        principal["bloques"].append({"tipo": "html", "html": SCRIPT_TABLA_VIRTUAL})
+    return principal, ficheros
+
+
+@perfil.Perfilado
+def EscribirDocumento(documento, salida, filas_por_bloque=1000, autonomo=None, modo=None, filas_por_pagina=FILAS_POR_PAGINA):
+    """
+    Escribe el documento en un fichero HTML de una sola vez (ver VolcarDocumento).
+
+    La página se escribe en un fichero temporal del mismo directorio que después se
+    renombra, así que quien lea la salida nunca ve una página a medio escribir. Después
+    se borran las páginas y los JSON de tablas que escribió la ejecución anterior y que
+    ya no se enlazan (ver BorrarFicherosTablas).
+
+    Parámetros:
+        documento (dict): Documento creado con CrearDocumento
+        salida (str): Ruta del fichero HTML
+        filas_por_bloque (int): Número de filas de las tablas que se formatean y escriben a la vez
+        autonomo (bool, opcional): Si es True la hoja de estilos y las imágenes se incrustan
+                                   en la página (por defecto, según HtmlAutonomo())
+        modo (str, opcional): Cómo se escriben las tablas grandes: "tabla", "paginas" o "json"
+                              (por defecto, según ModoTablas(); ver DividirTablas)
+        filas_por_pagina (int): Filas a partir de las que una tabla se divide o se carga desde JSON
+
+    Retorna:
+        None
+    """
+    if autonomo is None:
+        autonomo = HtmlAutonomo()
+    if modo is None:
+        modo = ModoTablas()
+
+    ficheros = []
+    if modo != "tabla":
+        documento, ficheros = DividirTablas(documento, salida, modo, filas_por_pagina, filas_por_bloque, autonomo)
+
+    directorio = os.path.dirname(os.path.abspath(salida))
+    EscribirFicheroAtomico(salida, lambda archivo: VolcarDocumento(documento, archivo, directorio, filas_por_bloque, autonomo))
+
+    # Las páginas y los JSON de una ejecución anterior se borran cuando la nueva página ya no los enlaza
+    BorrarFicherosTablas(salida, ficheros)
+
+
+def EscribirTablaHtml(titulo, cabecera, etiquetas, valores, salida, filas_por_bloque=1000, decimales=2):
+    """
+    Escribe una página HTML con una tabla de datos (ver EscribirDocumento).
+
+    Parámetros:
+        titulo (str): Título de la página
+        cabecera (str): Filas <tr> de la cabecera (ver CompilarCabecera)
+        etiquetas (numpy.ndarray): Texto de la primera columna de cada fila
+        valores (numpy.ndarray): Matriz (filas x columnas) de números
+        salida (str): Ruta del fichero HTML
+        filas_por_bloque (int): Número de filas que se formatean y escriben a la vez
+        decimales (int): Número de decimales de los valores no enteros
+
+    Retorna:
+        None
+    """
+    documento = CrearDocumento(titulo)
+    AñadirTabla(documento, cabecera, etiquetas, valores, decimales)
+    EscribirDocumento(documento, salida, filas_por_bloque)
+
+
+def GenerarHtml(titulo, cabecera, datos, salida, imagen = None, autonomo=None):
+    """
+    Genera una página HTML con una tabla cuya primera columna es la etiqueta de cada fila.
+
+    Parámetros:
+        titulo (str): Título de la página
+        cabecera (str): Filas <tr> de la cabecera
+        datos (numpy.ndarray): Matriz con las etiquetas (columna 0) y los valores
+        salida (str): Ruta del fichero HTML
+        imagen (str, opcional): Ruta de una imagen que se muestra debajo de la tabla
+        autonomo (bool, opcional): Incrusta la hoja de estilos y la imagen (ver EscribirDocumento)
+
+    Retorna:
+        None
+    """
+    documento = CrearDocumento(titulo)
+    AñadirTabla(documento, cabecera, datos[:, 0], datos[:, 1:])
+    if imagen:
+        AñadirImagen(documento, imagen)
+    EscribirDocumento(documento, salida, autonomo=autonomo)
 
 
 def FormatearNumero(numero, decimales=2):
@@ -149,33 +1577,451 @@ def FormatearNumero(numero, decimales=2):
     except:
       return numero
 
-def LeerPaginaWeb(fichero):   
+
+# Intercambia los separadores del formato inglés (1,234.5) por los del español (1.234,5)
+SEPARADORES_ESPANOL = str.maketrans({",": ".", ".": ","})
+
+
+@perfil.Perfilado
+def FormatearNumeros(valores, decimales=2):
+    """
+    Formatea al estilo español todos los valores de un array de una vez (versión vectorizada de FormatearNumero).
+
+    Cada valor distinto se formatea una sola vez (np.unique) y el cambio de separadores
+    se hace con un único str.translate sobre todos los textos juntos.
+
+    Parámetros:
+        valores (numpy.ndarray): Números (o textos con números) a formatear
+        decimales (int): Número de decimales (se ignora en los números enteros)
+
+    Retorna:
+        numpy.ndarray: Textos formateados, con la misma forma que valores
+    """
+    valores = np.asarray(valores)
+    try:
+        numeros = valores.astype(float)
+    except ValueError:
+        # Hay textos que no son números: se formatean uno a uno como hace FormatearNumero
+        return np.array([str(FormatearNumero(v, decimales)) for v in valores.ravel().tolist()]).reshape(valores.shape)
+
+    # Se comparan los bits y no los valores para no mezclar 0.0 con -0.0 (que se formatea "-0")
+    bits, inverso = np.unique(numeros.ravel().view(np.int64), return_inverse=True)
+    unicos = bits.view(np.float64)
+
+    finitos = np.isfinite(unicos)
+    enteros = np.zeros(unicos.shape, dtype=bool)
+    enteros[finitos] = (unicos[finitos] == np.trunc(unicos[finitos])) | (np.abs(unicos[finitos] - np.round(unicos[finitos])) < 0.001)
+    decimales_ = finitos & ~enteros
+
+    textos = np.empty(unicos.shape, dtype=object)
+    textos[~finitos] = [str(v) for v in unicos[~finitos].tolist()]
+
+    formateados = []
+    formateados += map("{:,.0f}".format, unicos[enteros].tolist())
+    formateados += map(f"{{:,.{decimales}f}}".format, unicos[decimales_].tolist())
+    if formateados:
+        formateados = "\n".join(formateados).translate(SEPARADORES_ESPANOL).split("\n")
+        n_enteros = int(enteros.sum())
+        textos[enteros] = formateados[:n_enteros]
+        textos[decimales_] = formateados[n_enteros:]
+
+    return textos.astype(str)[inverso].reshape(valores.shape)
+
+class ExtractorCeldas(HTMLParser):
+    """
+    Parser incremental que guarda solo el texto de las celdas <td>, sin construir el árbol del documento.
+
+    Una celda termina con su </td>, con el inicio de otra <td> o con el cierre de la fila o la tabla.
+    El contenido de <script> y <style> no se considera texto de la celda.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.celdas = []
+        self.texto = None
+        self.en_script = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "td":
+            self.CerrarCelda()
+            self.texto = []
+        elif tag in ("script", "style"):
+            self.en_script = True
+
+    def handle_endtag(self, tag):
+        if tag in ("td", "tr", "table"):
+            self.CerrarCelda()
+        elif tag in ("script", "style"):
+            self.en_script = False
+
+    def handle_data(self, data):
+        if self.texto is not None and not self.en_script:
+            self.texto.append(data)
+
+    def CerrarCelda(self):
+        if self.texto is not None:
+            self.celdas.append("".join(self.texto))
+            self.texto = None
+
+
+def LeerPaginaWeb(fichero, tamano_bloque=65536):   
     """
     Lee un archivo HTML desde disco y extrae el texto contenido en todas las etiquetas <td>.
 
     Parámetros:
-        fichero (str): Ruta del archivo HTML que se va a procesar.
+        fichero (str): Ruta del archivo HTML que se va a procesar (comprimido con gzip, bzip2 o xz o no).
+        tamano_bloque (int): Caracteres leídos del fichero en cada paso.
 
     Funcionamiento:
-        - Abre y lee el archivo HTML completo como cadena.
-        - Usa BeautifulSoup para parsear su estructura.
-        - Busca todas las etiquetas <td> de la página.
-        - Extrae el texto interior de cada una.
+        - Lee el archivo HTML por bloques y se los pasa a ExtractorCeldas. Si está
+          comprimido se descomprime en streaming (ver AbrirTexto).
+        - El extractor no construye el árbol del documento: solo guarda
+          el texto interior de cada etiqueta <td>.
 
     Retorna:
         list[str]: Lista con los textos contenidos en cada celda <td>.
     """   
-    archivo = open(fichero, 'r', encoding="utf8")
-    comString = archivo.read()
-    archivo.close()
+    extractor = ExtractorCeldas()
+
+    with AbrirTexto(fichero) as archivo:
+        for bloque in iter(lambda: archivo.read(tamano_bloque), ""):
+            extractor.feed(bloque)
+
+    extractor.close()
+    extractor.CerrarCelda()
+
+    return extractor.celdas
+
+
+def ValorNumericoEspanol(celda):
+    """
+    Convierte un número escrito al estilo español ("-2.086", "0,11") en float.
+
+    Es la operación inversa de FormatearNumero. Las celdas sin dato del INE ("..", "-", vacías) dan NaN.
+
+    Parámetros:
+        celda (str): Texto de la celda.
+
+    Retorna:
+        float: Valor numérico de la celda.
+
+    Excepciones:
+        ValueError: Si el texto no es un número.
+    """
+    celda = celda.strip()
+    if celda in VALORES_AUSENTES:
+        return np.nan
+    return float(celda.replace(".", "").replace(",", "."))
+
+
+class ExtractorTabla(HTMLParser):
+    """
+    Parser incremental que reconstruye una tabla HTML (con rowspan y colspan) fila a fila.
+
+    Solo se guarda el texto de las filas de la tabla elegida; las tablas anidadas y el
+    resto del documento se ignoran. Las filas de <thead> o formadas solo por <th> son
+    filas de cabecera; las demás son filas de datos.
+    """
+
+    def __init__(self, indice_tabla=0):
+        super().__init__(convert_charrefs=True)
+        self.indice_tabla = indice_tabla
+        self.tablas_vistas = 0      # tablas de primer nivel encontradas
+        self.nivel = 0              # nivel de anidamiento de <table> en el documento
+        self.dentro = False         # True mientras se recorre la tabla elegida
+        self.terminada = False
+        self.en_thead = False
+        self.en_script = False
+
+        self.cabeceras = []
+        self.filas = []
+
+        self.fila = None            # celdas de la fila actual: [texto, es_th, colspan, rowspan]
+        self.celda = None
+        self.pendientes = {}        # columna -> [filas restantes, texto] de los rowspan de filas anteriores
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            self.nivel += 1
+            if self.nivel == 1:
+                self.dentro = self.tablas_vistas == self.indice_tabla
+                self.tablas_vistas += 1
+            return
+
+        if not self.dentro or self.nivel != 1:
+            return
+
+        if tag == "thead":
+            self.en_thead = True
+        elif tag == "tr":
+            self.CerrarFila()
+            self.fila = []
+        elif tag in ("td", "th"):
+            self.CerrarCelda()
+            if self.fila is None:
+                self.fila = []
+            atributos = dict(attrs)
+            self.celda = [[], tag == "th", Entero(atributos.get("colspan")), Entero(atributos.get("rowspan"))]
+        elif tag in ("script", "style"):
+            self.en_script = True
+
+    def handle_endtag(self, tag):
+        if tag == "table" and self.nivel > 0:
+            if self.dentro and self.nivel == 1:
+                self.CerrarFila()
+                self.dentro = False
+                self.terminada = True
+            self.nivel -= 1
+            return
+
+        if not self.dentro or self.nivel != 1:
+            return
+
+        if tag in ("td", "th"):
+            self.CerrarCelda()
+        elif tag == "tr":
+            self.CerrarFila()
+        elif tag == "thead":
+            self.CerrarFila()
+            self.en_thead = False
+        elif tag in ("script", "style"):
+            self.en_script = False
+
+    def handle_data(self, data):
+        if self.dentro and self.nivel == 1 and self.celda is not None and not self.en_script:
+            self.celda[0].append(data)
+
+    def CerrarCelda(self):
+        if self.celda is not None:
+            self.celda[0] = " ".join("".join(self.celda[0]).split())
+            self.fila.append(self.celda)
+            self.celda = None
+
+    def CerrarFila(self):
+        self.CerrarCelda()
+        if self.fila is None:
+            return
+
+        fila, self.fila = self.fila, None
+        textos, es_cabecera = ExpandirFila(fila, self.pendientes)
+        if not textos:
+            return
+
+        if self.en_thead or es_cabecera:
+            self.cabeceras.append(textos)
+        else:
+            self.filas.append(textos)
+
+
+def Entero(texto, defecto=1):
+    """
+    Convierte un atributo HTML numérico (colspan, rowspan) en entero positivo.
+
+    Parámetros:
+        texto (str | None): Valor del atributo.
+        defecto (int): Valor si el atributo no existe o no es válido.
+
+    Retorna:
+        int: Valor del atributo.
+    """
+    try:
+        return max(int(texto), 1)
+    except (TypeError, ValueError):
+        return defecto
+
+
+def ExpandirFila(fila, pendientes):
+    """
+    Coloca las celdas de una fila en su columna real teniendo en cuenta colspan y rowspan.
+
+    Parámetros:
+        fila (list): Celdas [texto, es_th, colspan, rowspan] en orden de aparición.
+        pendientes (dict): Columna -> [filas restantes, texto] de los rowspan de filas
+                           anteriores; se actualiza con los de esta fila.
+
+    Retorna:
+        tuple: (textos, es_cabecera) con el texto de cada columna y si la fila solo tiene <th>.
+    """
+    textos = []
+    columna = 0
+
+    def RellenarPendientes():
+        nonlocal columna
+        while columna in pendientes:
+            textos.append(pendientes[columna][1])
+            pendientes[columna][0] -= 1
+            if pendientes[columna][0] == 0:
+                del pendientes[columna]
+            columna += 1
+
+    for texto, _, colspan, rowspan in fila:
+        RellenarPendientes()
+        for _ in range(colspan):
+            textos.append(texto)
+            if rowspan > 1:
+                pendientes[columna] = [rowspan - 1, texto]
+            columna += 1
+
+    # Rowspan que siguen ocupando columnas a la derecha de la última celda
+    while pendientes and columna <= max(pendientes):
+        if columna in pendientes:
+            RellenarPendientes()
+        else:
+            textos.append("")
+            columna += 1
+
+    es_cabecera = bool(fila) and all(es_th for _, es_th, _, _ in fila)
+    return textos, es_cabecera
+
+
+@perfil.Perfilado
+def LeerTablaHtml(fichero, indice_tabla=0, tamano_bloque=65536):
+    """
+    Lee una tabla de una página HTML del INE (jaxi) y la devuelve como arrays NumPy.
+
+    El fichero se procesa por bloques y se deja de leer en cuanto se cierra la tabla.
+    Las columnas de etiquetas son las primeras columnas de la tabla, hasta la última que
+    tenga algún texto no numérico; el resto se convierte a números (formato español,
+    ver ValorNumericoEspanol).
+
+    Parámetros:
+        fichero (str): Ruta del archivo HTML (comprimido con gzip, bzip2 o xz o no).
+        indice_tabla (int): Posición de la tabla en la página (0 = la primera).
+        tamano_bloque (int): Caracteres leídos del fichero en cada paso.
+
+    Retorna:
+        dict:
+            etiquetas (numpy.ndarray): Matriz (filas x columnas de etiquetas) de textos.
+            valores (numpy.ndarray): Matriz de datos (int32/int64 si son enteros, float64 si no).
+            cabeceras (list[list[str]]): Filas de cabecera con rowspan/colspan expandidos.
+            columnas (list[tuple]): Para cada columna de valores, los textos de cabecera
+                                    que la agrupan, p. ej. ("Variación absoluta", "2017").
+
+    Excepciones:
+        ValueError: Si la página no tiene la tabla pedida.
+    """
+    extractor = ExtractorTabla(indice_tabla)
+
+    with AbrirTexto(fichero) as archivo:
+        for bloque in iter(lambda: archivo.read(tamano_bloque), ""):
+            extractor.feed(bloque)
+            if extractor.terminada:
+                break
+
+    extractor.close()
+    extractor.CerrarFila()
+
+    if extractor.tablas_vistas <= indice_tabla:
+        raise ValueError(f"La página no tiene la tabla {indice_tabla}")
+
+    filas = extractor.filas
+    n_columnas = max((len(f) for f in filas), default=0)
+    filas = [f + [""] * (n_columnas - len(f)) for f in filas]
+
+    # Columnas de etiquetas: hasta la última columna que tenga algún texto no numérico
+    numeros = []
+    n_etiquetas = 0
+    for fila in filas:
+        numeros_fila = []
+        for j in range(n_columnas - 1, n_etiquetas - 1, -1):
+            try:
+                numeros_fila.append(ValorNumericoEspanol(fila[j]))
+            except ValueError:
+                n_etiquetas = j + 1
+                break
+        numeros.append(numeros_fila[::-1])
+
+    valores = np.empty((len(filas), n_columnas - n_etiquetas))
+    for i, numeros_fila in enumerate(numeros):
+        valores[i] = numeros_fila[len(numeros_fila) - valores.shape[1]:]
+
+    cabeceras = extractor.cabeceras
+    columnas = []
+    for j in range(n_etiquetas, n_columnas):
+        niveles = [c[j] for c in cabeceras if j < len(c) and c[j]]
+        # Un colspan repetido en varias filas de cabecera solo cuenta una vez
+        columnas.append(tuple(t for k, t in enumerate(niveles) if k == 0 or t != niveles[k - 1]))
 
-    # --- Usando BeautifulSoup ---
-    soup = BeautifulSoup(comString, 'html.parser')
+    return {
+        "etiquetas": np.array([f[:n_etiquetas] for f in filas], dtype=str).reshape(len(filas), n_etiquetas),
+        "valores": TipoNumericoCompacto(valores),
+        "cabeceras": cabeceras,
+        "columnas": columnas,
+    }
 
-    # Leer TD
-    td_soup = soup.find_all('td')
-    celdas = [td.get_text() for td in td_soup]
 
+RUTA_POBLACION = "./entradas/poblacionProvinciasHM2010-17.csv"
+RUTA_COMUNIDADES = "./entradas/comunidadAutonoma-Provincia.htm"
 
-    # Puedes elegir qué devolver:
-    return celdas
\ No newline at end of file
+
+def CrearContexto(ruta_poblacion=RUTA_POBLACION, ruta_comunidades=RUTA_COMUNIDADES):
+    """
+    Crea el contexto de datos compartido por los módulos R1-R5.
+
+    Cada fichero de entrada se lee una única vez y las tablas derivadas
+    (agregados por CCAA, mapa provincia -> comunidad, ...) se memorizan
+    en el propio contexto para que los distintos informes las reutilicen.
+
+    Parámetros:
+        ruta_poblacion (str): Ruta del CSV de población por provincias.
+        ruta_comunidades (str): Ruta del HTML con la relación CCAA-provincia.
+
+    Retorna:
+        dict: Diccionario {"rutas": {...}, "memo": {...}}
+    """
+    return {
+        "rutas": {
+            "poblacion": ruta_poblacion,
+            "comunidades": ruta_comunidades,
+        },
+        "memo": {},
+    }
+
+
+def Memorizar(contexto, clave, calcular):
+    """
+    Devuelve el valor asociado a una clave del contexto, calculándolo solo la primera vez.
+
+    Parámetros:
+        contexto (dict): Contexto creado con CrearContexto.
+        clave (str): Nombre del dato memorizado.
+        calcular (callable): Función sin argumentos que calcula el dato.
+
+    Retorna:
+        object: Valor memorizado.
+    """
+    memo = contexto["memo"]
+    if clave not in memo:
+        memo[clave] = calcular()
+    return memo[clave]
+
+
+def CuboPoblacion(contexto):
+    """
+    Devuelve el cubo de población del contexto (el CSV se lee una sola vez).
+
+    Parámetros:
+        contexto (dict): Contexto creado con CrearContexto.
+
+    Retorna:
+        dict: Cubo de población (ver LeerCuboPoblacion).
+    """
+    return Memorizar(
+        contexto,
+        "cubo",
+        lambda: LeerCuboPoblacion(contexto["rutas"]["poblacion"])
+    )
+
+
+def PoblacionProvincias(contexto):
+    """
+    Devuelve los datos de población por provincias del contexto (vistas del cubo).
+
+    Parámetros:
+        contexto (dict): Contexto creado con CrearContexto.
+
+    Retorna:
+        tuple: Igual que LeerPoblacionProvincias.
+    """
+    cubo = CuboPoblacion(contexto)
+    return cubo["regiones"], SexoCubo(cubo, "Total"), SexoCubo(cubo, "Hombres"), SexoCubo(cubo, "Mujeres")
@@ -0,0 +1,367 @@
+"""
+graficos.py
+Capa de dibujo de los gráficos de los informes (R3, R5 y los gráficos por CCAA).
+
+- Cada gráfico se dibuja en su propia matplotlib.figure.Figure con el lienzo Agg,
+  sin pasar por pyplot: no hay estado global ni ventanas, y la figura se libera
+  siempre al terminar, aunque el dibujo falle.
+- Las imágenes se guardan en su propia caché en disco (DIRECTORIO_CACHE_GRAFICOS,
+  con el formato de cache.py) con una clave que depende de los datos, del estilo
+  (tamaño de la figura, formato y parámetros de matplotlib), del código de la
+  función de dibujo y de la versión de matplotlib. Si nada de eso cambia, la imagen
+  se copia de la caché sin volver a dibujarla. La caché no se recorta al guardar
+  cada imagen sino una vez por ejecución, con LimitarCacheGraficos.
+- DibujarVarios dibuja muchos gráficos a la vez en un pool de procesos (p. ej. un
+  gráfico pequeño por comunidad autónoma, ver R5.GraficosCCAA).
+
+Una función de dibujo recibe la figura vacía y los datos como argumentos con
+nombre, y tiene que estar definida en un módulo (no puede ser una lambda) para
+poder enviarla a los procesos del pool. Solo debe usar sus datos, numpy y
+matplotlib: la clave incluye el código de su módulo pero no el de los módulos a
+los que llama, así que los textos que salen de otras funciones del proyecto (p. ej.
+los títulos con funciones.RangoAnos) se calculan antes y se pasan en los datos.
+
+Uso (gráficos por CCAA de los ficheros de entrada):
+    python graficos.py [--directorio DIRECTORIO] [--formato {png,svg}] [-j PROCESOS]
+
+Autores: Jose Daniel Ojeda Tro & Javier Linaje Vallejo
+Fecha: 2026-10-18
+"""
+import argparse
+import hashlib
+import inspect
+import io
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+import matplotlib
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import numpy as np
+import cache
+import perfil
+
+
+# Se incrementa cuando cambia la forma de dibujar o de guardar los gráficos
+VERSION_GRAFICOS = 1
+
+# Directorio de la caché de imágenes; POBLACION_CACHE_GRAFICOS="" la desactiva
+DIRECTORIO_CACHE_GRAFICOS = os.environ.get("POBLACION_CACHE_GRAFICOS", "./.cache-graficos")
+
+# Tamaño máximo de la caché de imágenes (ver LimitarCacheGraficos)
+LIMITE_CACHE_GRAFICOS_BYTES = 64 * 1024 * 1024
+
+# Formato de las imágenes que se dibujan en un buffer sin indicar el formato
+FORMATO_POR_DEFECTO = "png"
+
+# Hash del código de cada módulo de dibujo {ruta: (tamaño, fecha de modificación, hash)}
+HASHES_CODIGO = {}
+
+# Hash de los parámetros de matplotlib de este proceso (se calcula la primera vez que se usa)
+HASH_PARAMETROS = None
+
+
+def FormatoDestino(destino, formato=None):
+    """
+    Decide el formato de una imagen: el indicado o, si no, el de la extensión del destino.
+
+    Parámetros:
+        destino (str | file): Ruta de la imagen o fichero abierto en modo binario.
+        formato (str, opcional): "png" o "svg".
+
+    Retorna:
+        str: Formato de la imagen.
+    """
+    if formato:
+        return formato
+    if isinstance(destino, str) and os.path.splitext(destino)[1]:
+        return os.path.splitext(destino)[1][1:].lower()
+    return FORMATO_POR_DEFECTO
+
+
+def CrearFigura(estilo=None):
+    """
+    Crea una figura vacía con el lienzo Agg, sin registrarla en pyplot.
+
+    Parámetros:
+        estilo (dict, opcional): Argumentos de matplotlib.figure.Figure (p. ej. {"figsize": (12, 6)}).
+
+    Retorna:
+        matplotlib.figure.Figure: Figura.
+    """
+    figura = Figure(**(estilo or {}))
+    FigureCanvasAgg(figura)
+    return figura
+
+
+def GuardarFigura(figura, destino, formato):
+    """
+    Guarda una figura en un fichero o en un buffer en memoria.
+
+    En SVG se fijan la fecha y los identificadores internos para que el mismo
+    gráfico produzca siempre los mismos bytes.
+
+    Parámetros:
+        figura (matplotlib.figure.Figure): Figura a guardar.
+        destino (str | file): Ruta del fichero o fichero abierto en modo binario (p. ej. io.BytesIO).
+        formato (str): "png" o "svg".
+
+    Retorna:
+        None
+    """
+    if formato == "svg":
+        with matplotlib.rc_context({"svg.hashsalt": "poblacion"}):
+            figura.savefig(destino, format="svg", metadata={"Date": None})
+    else:
+        figura.savefig(destino, format=formato)
+
+
+def HuellaDatos(h, valor):
+    """
+    Añade un valor (arrays, listas, diccionarios, números o textos) al hash de un gráfico.
+
+    Parámetros:
+        h (hashlib._Hash): Hash que se actualiza.
+        valor: Valor que se añade.
+
+    Retorna:
+        None
+    """
+    if isinstance(valor, np.ndarray):
+        h.update(f"array|{valor.dtype.str}|{valor.shape}|".encode("utf8"))
+        h.update(np.ascontiguousarray(valor).tobytes())
+    elif isinstance(valor, (list, tuple)):
+        h.update(f"{type(valor).__name__}|{len(valor)}|".encode("utf8"))
+        for elemento in valor:
+            HuellaDatos(h, elemento)
+    elif isinstance(valor, dict):
+        h.update(f"dict|{len(valor)}|".encode("utf8"))
+        for clave in sorted(valor, key=str):
+            HuellaDatos(h, clave)
+            HuellaDatos(h, valor[clave])
+    else:
+        h.update(f"{type(valor).__name__}|{valor!r}|".encode("utf8"))
+
+
+def HashCodigo(ruta):
+    """
+    Devuelve el hash de un fichero de código, calculándolo solo cuando cambia (tamaño o fecha).
+
+    Parámetros:
+        ruta (str): Ruta del fichero.
+
+    Retorna:
+        str: Hash del contenido del fichero.
+    """
+    info = os.stat(ruta)
+    tamano, modificacion, valor = HASHES_CODIGO.get(ruta, (None, None, None))
+    if (tamano, modificacion) != (info.st_size, info.st_mtime_ns):
+        valor = cache.HashFichero(ruta)
+        HASHES_CODIGO[ruta] = (info.st_size, info.st_mtime_ns, valor)
+    return valor
+
+
+def HashParametros():
+    """
+    Devuelve el hash de la versión y los parámetros (rcParams) de matplotlib de este proceso.
+
+    Se calcula una sola vez por proceso: los informes no cambian los parámetros
+    globales mientras se ejecutan (ver GuardarFigura, que solo los cambia al guardar).
+
+    Retorna:
+        str: Hash hexadecimal.
+    """
+    global HASH_PARAMETROS
+    if HASH_PARAMETROS is None:
+        h = hashlib.blake2b(digest_size=16)
+        h.update(f"{matplotlib.__version__}|".encode("utf8"))
+        # Leer "backend" cargaría pyplot para resolverlo, así que se salta antes de leer su valor
+        HuellaDatos(h, {clave: matplotlib.rcParams[clave] for clave in matplotlib.rcParams if not clave.startswith("backend")})
+        HASH_PARAMETROS = h.hexdigest()
+    return HASH_PARAMETROS
+
+
+def ClaveGrafico(dibujar, datos, formato, estilo=None):
+    """
+    Calcula la clave de caché de un gráfico.
+
+    Parámetros:
+        dibujar (callable): Función de dibujo.
+        datos (dict): Argumentos de la función de dibujo.
+        formato (str): Formato de la imagen.
+        estilo (dict, opcional): Argumentos de la figura (ver CrearFigura).
+
+    Retorna:
+        str: Nombre de la entrada de la caché, "grafico-<clave>".
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{VERSION_GRAFICOS}|{HashParametros()}|{formato}|{dibujar.__module__}.{dibujar.__qualname__}|".encode("utf8"))
+    # Cualquier cambio en el módulo de la función de dibujo invalida sus imágenes
+    h.update(HashCodigo(inspect.getfile(dibujar)).encode("utf8"))
+    HuellaDatos(h, estilo or {})
+    HuellaDatos(h, datos)
+    return f"grafico-{h.hexdigest()}"
+
+
+@perfil.Perfilado
+def DibujarBytes(dibujar, datos, formato=FORMATO_POR_DEFECTO, estilo=None, usar_cache=True):
+    """
+    Dibuja un gráfico y devuelve los bytes de la imagen, usando la caché si es posible.
+
+    Parámetros:
+        dibujar (callable): Función dibujar(figura, **datos) que dibuja en la figura.
+        datos (dict): Argumentos de la función de dibujo.
+        formato (str): "png" o "svg".
+        estilo (dict, opcional): Argumentos de la figura (ver CrearFigura).
+        usar_cache (bool): Si es False se dibuja siempre sin tocar la caché.
+
+    Retorna:
+        bytes: Contenido de la imagen.
+    """
+    usar_cache = usar_cache and bool(DIRECTORIO_CACHE_GRAFICOS)
+    if usar_cache:
+        entrada = ClaveGrafico(dibujar, datos, formato, estilo)
+        arrays = cache.CargarCache(entrada, DIRECTORIO_CACHE_GRAFICOS)
+        if arrays is not None:
+            return arrays["contenido"].tobytes()
+
+    figura = CrearFigura(estilo)
+    try:
+        dibujar(figura, **datos)
+        buffer = io.BytesIO()
+        GuardarFigura(figura, buffer, formato)
+    finally:
+        # Rompe las referencias entre la figura, sus ejes y sus artistas
+        figura.clear()
+
+    contenido = buffer.getvalue()
+    if usar_cache:
+        # Sin límite: se recorta una vez por ejecución (ver LimitarCacheGraficos)
+        cache.GuardarCache(entrada, {"contenido": np.frombuffer(contenido, dtype=np.uint8)}, DIRECTORIO_CACHE_GRAFICOS, limite_bytes=None)
+    return contenido
+
+
+def LimitarCacheGraficos(limite_bytes=LIMITE_CACHE_GRAFICOS_BYTES):
+    """
+    Recorta la caché de imágenes al límite, eliminando primero las usadas hace más tiempo.
+
+    Se llama una vez al final de cada ejecución que dibuja gráficos (main.py,
+    actualizacion.py, servidor.py y este módulo).
+
+    Parámetros:
+        limite_bytes (int): Tamaño máximo de la caché de imágenes.
+
+    Retorna:
+        None
+    """
+    if DIRECTORIO_CACHE_GRAFICOS and os.path.isdir(DIRECTORIO_CACHE_GRAFICOS):
+        cache.LimitarCache(DIRECTORIO_CACHE_GRAFICOS, limite_bytes)
+
+
+def EscribirContenido(destino, contenido):
+    """
+    Escribe una imagen ya dibujada en su destino.
+
+    Los ficheros se escriben en un temporal del mismo directorio que después se renombra.
+
+    Parámetros:
+        destino (str | file): Ruta de la imagen o fichero abierto en modo binario.
+        contenido (bytes): Contenido de la imagen.
+
+    Retorna:
+        None
+    """
+    if not isinstance(destino, str):
+        destino.write(contenido)
+        return
+
+    descriptor, temporal = tempfile.mkstemp(prefix=".tmp-", suffix=os.path.splitext(destino)[1], dir=os.path.dirname(os.path.abspath(destino)))
+    try:
+        with open(descriptor, "wb") as f:
+            f.write(contenido)
+        os.chmod(temporal, 0o644)
+        os.replace(temporal, destino)
+    except BaseException:
+        os.unlink(temporal)
+        raise
+
+
+def Dibujar(dibujar, datos, destino, formato=None, estilo=None, usar_cache=True):
+    """
+    Dibuja un gráfico en un fichero o en un buffer en memoria (ver DibujarBytes).
+
+    Parámetros:
+        dibujar (callable): Función dibujar(figura, **datos) que dibuja en la figura.
+        datos (dict): Argumentos de la función de dibujo.
+        destino (str | file): Ruta de la imagen o fichero abierto en modo binario.
+        formato (str, opcional): "png" o "svg"; por defecto se deduce de la extensión de la ruta.
+        estilo (dict, opcional): Argumentos de la figura (ver CrearFigura).
+        usar_cache (bool): Si es False se dibuja siempre sin tocar la caché.
+
+    Retorna:
+        None
+    """
+    EscribirContenido(destino, DibujarBytes(dibujar, datos, FormatoDestino(destino, formato), estilo, usar_cache))
+
+
+@perfil.Perfilado
+def DibujarVarios(trabajos, procesos=None, usar_cache=True):
+    """
+    Dibuja varios gráficos en paralelo en un pool de procesos.
+
+    Los procesos solo devuelven los bytes de cada imagen; los ficheros se escriben
+    desde este proceso.
+
+    Parámetros:
+        trabajos (list[dict]): Gráficos {"dibujar", "datos", "destino"} con "formato" y
+                               "estilo" opcionales (ver Dibujar).
+        procesos (int, opcional): Número de procesos (por defecto, uno por CPU; 1 = en este proceso).
+        usar_cache (bool): Si es False se dibujan siempre sin tocar la caché.
+
+    Retorna:
+        None
+    """
+    if not trabajos:
+        return
+
+    if procesos is None:
+        procesos = os.cpu_count() or 1
+    procesos = min(procesos, len(trabajos))
+
+    argumentos = (
+        [trabajo["dibujar"] for trabajo in trabajos],
+        [trabajo["datos"] for trabajo in trabajos],
+        [FormatoDestino(trabajo["destino"], trabajo.get("formato")) for trabajo in trabajos],
+        [trabajo.get("estilo") for trabajo in trabajos],
+        [usar_cache] * len(trabajos),
+    )
+
+    if procesos <= 1:
+        contenidos = list(map(DibujarBytes, *argumentos))
+    else:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            contenidos = list(pool.map(DibujarBytes, *argumentos))
+
+    for trabajo, contenido in zip(trabajos, contenidos):
+        EscribirContenido(trabajo["destino"], contenido)
+
+
+if __name__ == "__main__":
+    import funciones as func
+    import R5 as r5
+    from comunidades import CuboCCAA
+
+    parser = argparse.ArgumentParser(description="Dibuja un gráfico de evolución por sexo para cada CCAA.")
+    parser.add_argument("--directorio", default=None, help="directorio de las imágenes (por defecto, el de R5.GraficosCCAA)")
+    parser.add_argument("--formato", choices=("png", "svg"), default="png", help="formato de las imágenes")
+    parser.add_argument("-j", "--procesos", type=int, default=None,
+                        help="número de procesos (por defecto, uno por CPU; 1 = secuencial)")
+    argumentos = parser.parse_args()
+
+    inicio = time.perf_counter()
+    cubo = CuboCCAA(func.CrearContexto())
+    rutas = r5.GraficosCCAA(cubo, argumentos.directorio or r5.DIRECTORIO_CCAA, argumentos.formato, argumentos.procesos)
+    LimitarCacheGraficos()
+    print(f"{len(rutas)} gráficos en '{os.path.dirname(rutas[0]) if rutas else argumentos.directorio}' "
+          f"({time.perf_counter() - inicio:.2f} s)")
@@ -0,0 +1,207 @@
+"""
+ingesta.py
+Lectura en paralelo de varias publicaciones del INE y fusión en un único conjunto de datos.
+
+Cada publicación (un CSV con el formato del INE, de un año de publicación o de
+unas regiones) se lee en un proceso de un pool con funciones.LeerCuboPoblacion,
+así que el tiempo de lectura se reparte entre los núcleos y cada fichero pasa
+por la caché en disco (ver cache.py). Después los cubos se fusionan:
+
+- Las regiones se identifican por su código INE (o por la etiqueta si no tienen
+  código, como "Total Nacional"); el conjunto final tiene todas las regiones,
+  todos los sexos y todos los años de las publicaciones.
+- Las publicaciones se ordenan por su año más reciente (a igualdad, por su orden
+  en la lista) y en los datos que se solapan gana la más reciente. Las celdas sin
+  dato ("..") de una publicación no borran el valor de las anteriores.
+
+El resultado se puede escribir como un CSV con el formato del INE para que los
+informes R1-R5 lo lean como el fichero de entrada habitual. Por defecto se escribe
+en resultados/ (SALIDA_CSV); los datos de entrada solo se sustituyen si se indica
+su ruta con --salida.
+
+Uso:
+    python ingesta.py FICHERO [FICHERO ...] [--salida CSV] [-j PROCESOS]
+
+Autores: Jose Daniel Ojeda Tro & Javier Linaje Vallejo
+Fecha: 2026-10-18
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import funciones as func
+import jerarquia
+import perfil
+
+
+# CSV fusionado por defecto (fuera de entradas/, para no sustituir los datos de los informes)
+SALIDA_CSV = "./resultados/poblacionFusionada.csv"
+
+
+def LeerPublicacion(ruta, usar_cache=True):
+    """
+    Lee una publicación como cubo de población (en un proceso del pool).
+
+    Parámetros:
+        ruta (str): Ruta del CSV.
+        usar_cache (bool): Si es False se procesa siempre el CSV.
+
+    Retorna:
+        dict: Cubo de población con los datos en memoria (no mapeados, para enviarlos al proceso principal).
+    """
+    cubo = func.LeerCuboPoblacion(ruta, usar_cache)
+    return func.CrearCubo(cubo["regiones"], cubo["sexos"], cubo["anos"], np.array(cubo["datos"]))
+
+
+def ClaveRegion(etiqueta, codigo):
+    """
+    Identificador de una región al fusionar publicaciones: su código INE o, si no tiene, su etiqueta.
+
+    Parámetros:
+        etiqueta (str): Etiqueta de la región ("02 Albacete").
+        codigo (int): Código INE (-1 si no tiene).
+
+    Retorna:
+        int | str: Identificador.
+    """
+    return codigo if codigo >= 0 else etiqueta
+
+
+def OrdenPublicaciones(cubos):
+    """
+    Ordena las publicaciones de la más antigua a la más reciente.
+
+    Parámetros:
+        cubos (list[dict]): Cubos de las publicaciones, en el orden en que se indicaron.
+
+    Retorna:
+        list[int]: Posiciones de los cubos por su año más reciente y, a igualdad, por su posición.
+    """
+    return sorted(range(len(cubos)), key=lambda i: (int(np.max(cubos[i]["anos"], initial=0)), i))
+
+
+@perfil.Perfilado
+def FusionarCubos(cubos):
+    """
+    Fusiona los cubos de varias publicaciones; en los datos que se solapan gana la más reciente.
+
+    Parámetros:
+        cubos (list[dict]): Cubos de las publicaciones (ver LeerPublicacion).
+
+    Retorna:
+        dict: Cubo con todas las regiones (las filas sin código, como "Total Nacional",
+              delante y las demás en el orden en que aparecen en la lista de publicaciones,
+              con la etiqueta de la más reciente), los sexos y los años (del más reciente
+              al más antiguo, como en el CSV). Las celdas que ninguna publicación tiene son NaN.
+    """
+    orden = OrdenPublicaciones(cubos)
+
+    # Ejes del resultado
+    claves_regiones, sexos = [], []
+    for cubo in cubos:
+        for etiqueta, codigo in zip(cubo["regiones"].tolist(), func.CodigosEtiquetas(cubo["regiones"]).tolist()):
+            claves_regiones.append(ClaveRegion(etiqueta, codigo))
+        sexos.extend(sexo for sexo in cubo["sexos"] if sexo not in sexos)
+    claves_regiones = list(dict.fromkeys(claves_regiones))
+    claves_regiones.sort(key=lambda clave: not isinstance(clave, str))
+    anos = np.unique(np.concatenate([cubo["anos"] for cubo in cubos]))[::-1]
+    etiquetas = {}
+
+    fila_region = {clave: fila for fila, clave in enumerate(claves_regiones)}
+    columna_ano = {ano: j for j, ano in enumerate(anos.tolist())}
+    datos = np.full((len(claves_regiones), len(sexos), len(anos)), np.nan)
+
+    # De la más antigua a la más reciente: cada una sobrescribe lo que trae
+    for i in orden:
+        cubo = cubos[i]
+        claves = [ClaveRegion(e, c) for e, c in zip(cubo["regiones"].tolist(), func.CodigosEtiquetas(cubo["regiones"]).tolist())]
+        filas = [fila_region[clave] for clave in claves]
+        etiquetas.update(zip(claves, cubo["regiones"].tolist()))
+        indices = np.ix_(filas, [sexos.index(s) for s in cubo["sexos"]], [columna_ano[a] for a in cubo["anos"].tolist()])
+
+        nuevos = np.asarray(cubo["datos"], dtype=np.float64)
+        datos[indices] = np.where(np.isnan(nuevos), datos[indices], nuevos)
+
+    return func.CrearCubo([etiquetas[clave] for clave in claves_regiones], sexos, anos, datos)
+
+
+def CompletarTotalNacional(cubo):
+    """
+    Añade la fila "Total Nacional" (delante) si ninguna publicación la trae.
+
+    Se calcula sumando las provincias o, si no hay, todas las regiones con código.
+
+    Parámetros:
+        cubo (dict): Cubo fusionado.
+
+    Retorna:
+        dict: Cubo con la fila "Total Nacional".
+    """
+    if jerarquia.ETIQUETA_NACIONAL in cubo["regiones"].tolist():
+        return cubo
+
+    codigos = func.CodigosEtiquetas(cubo["regiones"])
+    provincias = (codigos >= 0) & (codigos < 1000)
+    filas = provincias if provincias.any() else codigos >= 0
+    total = cubo["datos"][filas].sum(axis=0, keepdims=True)
+
+    return func.CrearCubo(
+        np.concatenate(([jerarquia.ETIQUETA_NACIONAL], cubo["regiones"])),
+        cubo["sexos"],
+        cubo["anos"],
+        np.concatenate((total, cubo["datos"])),
+    )
+
+
+@perfil.Perfilado
+def LeerPublicaciones(rutas, procesos=None, usar_cache=True):
+    """
+    Lee en paralelo varias publicaciones del INE y las fusiona en un cubo.
+
+    Parámetros:
+        rutas (list[str]): Rutas de los CSV; a igualdad de año más reciente gana la última.
+        procesos (int, opcional): Número de procesos (por defecto, uno por CPU; 1 = en este proceso).
+        usar_cache (bool): Si es False se procesan siempre los CSV.
+
+    Retorna:
+        dict: Cubo fusionado con la fila "Total Nacional" (ver FusionarCubos).
+
+    Excepciones:
+        ValueError: Si no se indica ninguna publicación.
+    """
+    if not rutas:
+        raise ValueError("No se ha indicado ninguna publicación")
+
+    if procesos is None:
+        procesos = os.cpu_count() or 1
+    procesos = min(procesos, len(rutas))
+
+    if procesos <= 1:
+        cubos = [LeerPublicacion(ruta, usar_cache) for ruta in rutas]
+    else:
+        with ProcessPoolExecutor(max_workers=procesos) as pool:
+            cubos = list(pool.map(LeerPublicacion, rutas, [usar_cache] * len(rutas)))
+
+    return CompletarTotalNacional(FusionarCubos(cubos))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Lee y fusiona varias publicaciones del INE en un único CSV.")
+    parser.add_argument("ficheros", nargs="+", help="CSV de las publicaciones")
+    parser.add_argument("--salida", default=SALIDA_CSV,
+                        help=f"CSV fusionado (por defecto, {SALIDA_CSV}; con {func.RUTA_POBLACION} lo leen los informes)")
+    parser.add_argument("-j", "--procesos", type=int, default=None,
+                        help="número de procesos (por defecto, uno por CPU; 1 = secuencial)")
+    argumentos = parser.parse_args()
+
+    # La salida se escribe después de leer, pero no puede ser una de las publicaciones
+    if os.path.abspath(argumentos.salida) in {os.path.abspath(ruta) for ruta in argumentos.ficheros}:
+        parser.error(f"la salida '{argumentos.salida}' es una de las publicaciones de entrada")
+
+    inicio = time.perf_counter()
+    cubo = LeerPublicaciones(argumentos.ficheros, argumentos.procesos)
+    os.makedirs(os.path.dirname(os.path.abspath(argumentos.salida)), exist_ok=True)
+    func.EscribirCuboCsv(argumentos.salida, cubo)
+    print(f"{len(argumentos.ficheros)} publicaciones fusionadas en '{argumentos.salida}': {len(cubo['regiones'])} regiones, "
+          f"años {func.RangoAnos(cubo['anos'])} ({time.perf_counter() - inicio:.2f} s)")
@@ -0,0 +1,220 @@
+"""
+jerarquia.py
+Agregados de población precalculados para todos los niveles territoriales:
+municipio -> provincia -> comunidad autónoma -> nacional.
+
+A partir del cubo de población (ver funciones.LeerCuboPoblacion) se calcula una
+sola vez el cubo de cada nivel, se comprueba que las sumas coinciden con los
+totales publicados en el propio fichero (la fila "Total Nacional" y, en los
+ficheros municipales, las filas de provincia) y se crean índices para consultar
+cualquier nivel x región x año x sexo en tiempo constante. Los informes toman de
+aquí el nivel que necesitan en lugar de volver a agregar los datos, así que un
+fichero municipal sirve igual que uno provincial.
+
+Autores: Jose Daniel Ojeda Tro & Javier Linaje Vallejo
+Fecha: 2026-10-18
+"""
+import logging
+import numpy as np
+import funciones as func
+import perfil
+
+
+NIVELES = ("municipio", "provincia", "ccaa", "nacional")
+
+ETIQUETA_NACIONAL = "Total Nacional"
+
+# Diferencia máxima (en personas) admitida entre una suma y el total publicado
+TOLERANCIA_TOTALES = 0.5
+
+REGISTRO = logging.getLogger(__name__)
+
+
+def IndiceRegiones(regiones):
+    """
+    Crea el índice {etiqueta o código INE: fila} de las regiones de un nivel.
+
+    Parámetros:
+        regiones (numpy.ndarray): Etiquetas de las regiones ("02 Albacete").
+
+    Retorna:
+        dict: Diccionario {etiqueta: fila, código: fila}
+    """
+    indice = {}
+    for fila, (etiqueta, codigo) in enumerate(zip(regiones.tolist(), func.CodigosEtiquetas(regiones).tolist())):
+        indice[etiqueta] = fila
+        if codigo >= 0:
+            indice[codigo] = fila
+    return indice
+
+
+def AgruparMunicipios(municipios, etiquetas_provincias):
+    """
+    Suma los municipios de cada provincia (el código de provincia son las dos primeras cifras).
+
+    Parámetros:
+        municipios (dict): Cubo de población por municipios.
+        etiquetas_provincias (dict): Diccionario {código de provincia: etiqueta}.
+
+    Retorna:
+        dict: Cubo por provincias, ordenado por código.
+    """
+    codigos = func.CodigosEtiquetas(municipios["regiones"]) // 1000
+    provincias, indices = np.unique(codigos, return_inverse=True)
+
+    sumas = func.SumarPorGrupos(func.TablaCubo(municipios), indices, len(provincias))
+    etiquetas = [etiquetas_provincias.get(codigo, f"{codigo:02d}") for codigo in provincias.tolist()]
+    return func.CrearCubo(etiquetas, municipios["sexos"], municipios["anos"], sumas.reshape(len(provincias), *municipios["datos"].shape[1:]))
+
+
+def ComprobarTotales(calculado, publicado, descripcion, estricto=False):
+    """
+    Comprueba que unos agregados calculados coinciden con los publicados.
+
+    Una diferencia se avisa en el registro y los informes se generan igualmente con
+    los valores calculados; en modo estricto se detiene la ejecución.
+
+    Parámetros:
+        calculado (numpy.ndarray): Valores calculados.
+        publicado (numpy.ndarray): Valores publicados (misma forma).
+        descripcion (str): Qué se compara, para el mensaje.
+        estricto (bool): Si es True una diferencia es un error en lugar de un aviso.
+
+    Retorna:
+        bool: True si todas las diferencias están dentro de TOLERANCIA_TOTALES.
+
+    Excepciones:
+        ValueError: Si es estricto y alguna diferencia supera TOLERANCIA_TOTALES.
+    """
+    diferencia = np.abs(np.asarray(calculado, dtype=np.float64) - np.asarray(publicado, dtype=np.float64))
+    # Las celdas sin dato en el fichero (NaN) no se comparan
+    diferencia = np.where(np.isnan(diferencia), 0.0, diferencia)
+    if diferencia.size and diferencia.max() > TOLERANCIA_TOTALES:
+        mensaje = f"{descripcion}: la suma difiere del total publicado en {diferencia.max():,.0f} personas"
+        if estricto:
+            raise ValueError(mensaje)
+        REGISTRO.warning(mensaje)
+        return False
+    return True
+
+
+@perfil.Perfilado
+def CrearJerarquia(cubo, provincia_comunidad, estricto=False):
+    """
+    Calcula y comprueba los agregados de todos los niveles a partir del cubo de población.
+
+    Las filas sin código INE (como "Total Nacional") se toman como totales publicados.
+    Si hay filas con código de municipio (cinco cifras), las de código de provincia se
+    toman también como totales publicados y las provincias se calculan sumando municipios.
+
+    Parámetros:
+        cubo (dict): Cubo de población tal como se lee del CSV.
+        provincia_comunidad (dict): Diccionario {provincia: comunidad} (ver comunidades.MapaProvinciaComunidad).
+        estricto (bool): Si es True una diferencia con los totales publicados es un error
+                         (por defecto solo se avisa, ver ComprobarTotales).
+
+    Retorna:
+        dict: Jerarquía {"niveles": {nivel: cubo}, "indices": {nivel: {región: fila}},
+              "anos": {año: posición}, "sexos": {sexo: posición}}
+
+    Excepciones:
+        ValueError: Si es estricto y algún nivel no suma lo mismo que los totales publicados.
+    """
+    codigos = func.CodigosEtiquetas(cubo["regiones"])
+    publicados = func.SeleccionarCubo(cubo, regiones=np.flatnonzero(codigos < 0))
+    niveles = {}
+
+    if (codigos >= 1000).any():
+        niveles["municipio"] = func.SeleccionarCubo(cubo, regiones=np.flatnonzero(codigos >= 1000))
+        provincias_publicadas = func.SeleccionarCubo(cubo, regiones=np.flatnonzero((codigos >= 0) & (codigos < 1000)))
+
+        # Nombres de las provincias: los del fichero si vienen en él y si no los de la relación CCAA-provincia
+        claves = [str(p) for p in provincia_comunidad]
+        etiquetas = dict(zip(func.CodigosEtiquetas(np.array(claves, dtype=str)).tolist(), claves))
+        etiquetas.update(zip(func.CodigosEtiquetas(provincias_publicadas["regiones"]).tolist(), provincias_publicadas["regiones"].tolist()))
+        niveles["provincia"] = AgruparMunicipios(niveles["municipio"], etiquetas)
+
+        # Las provincias publicadas en el fichero tienen que coincidir con la suma de sus municipios
+        indice = IndiceRegiones(niveles["provincia"]["regiones"])
+        for fila, codigo in enumerate(func.CodigosEtiquetas(provincias_publicadas["regiones"]).tolist()):
+            calculado = niveles["provincia"]["datos"][indice[codigo]] if codigo in indice else 0
+            ComprobarTotales(calculado, provincias_publicadas["datos"][fila], provincias_publicadas["regiones"][fila], estricto)
+    else:
+        niveles["provincia"] = func.SinTotalesCubo(cubo)
+
+    niveles["ccaa"] = func.AgruparCubo(niveles["provincia"], provincia_comunidad)
+    niveles["nacional"] = func.CrearCubo(
+        [ETIQUETA_NACIONAL], cubo["sexos"], cubo["anos"], niveles["provincia"]["datos"].sum(axis=0, keepdims=True)
+    )
+
+    # Cada nivel tiene que sumar el total nacional publicado (y el calculado)
+    nacional = niveles["nacional"]["datos"][0]
+    for fila, etiqueta in enumerate(publicados["regiones"].tolist()):
+        ComprobarTotales(nacional, publicados["datos"][fila], etiqueta, estricto)
+    for nivel, cubo_nivel in niveles.items():
+        ComprobarTotales(cubo_nivel["datos"].sum(axis=0), nacional, f"Nivel {nivel}", estricto)
+
+    return {
+        "niveles": niveles,
+        "indices": {nivel: IndiceRegiones(cubo_nivel["regiones"]) for nivel, cubo_nivel in niveles.items()},
+        "anos": {ano: j for j, ano in enumerate(cubo["anos"].tolist())},
+        "sexos": {sexo: k for k, sexo in enumerate(cubo["sexos"])},
+    }
+
+
+def CuboNivel(jerarquia, nivel):
+    """
+    Devuelve el cubo precalculado de un nivel.
+
+    Parámetros:
+        jerarquia (dict): Jerarquía creada con CrearJerarquia.
+        nivel (str): "municipio", "provincia", "ccaa" o "nacional".
+
+    Retorna:
+        dict: Cubo de población del nivel.
+
+    Excepciones:
+        KeyError: Si el nivel no existe en los datos (p. ej. "municipio" en un fichero provincial).
+    """
+    return jerarquia["niveles"][nivel]
+
+
+def CuboConTotal(jerarquia, nivel):
+    """
+    Devuelve el cubo de un nivel con la fila del total nacional delante (como en el CSV del INE).
+
+    Parámetros:
+        jerarquia (dict): Jerarquía creada con CrearJerarquia.
+        nivel (str): Nivel de las regiones.
+
+    Retorna:
+        dict: Cubo con "Total Nacional" y las regiones del nivel.
+    """
+    regiones, nacional = CuboNivel(jerarquia, nivel), CuboNivel(jerarquia, "nacional")
+    return func.CrearCubo(
+        np.concatenate((nacional["regiones"], regiones["regiones"])),
+        regiones["sexos"],
+        regiones["anos"],
+        np.concatenate((nacional["datos"], regiones["datos"])),
+    )
+
+
+def Consultar(jerarquia, nivel, region, ano, sexo="Total"):
+    """
+    Devuelve la población de una región en un año, en tiempo constante.
+
+    Parámetros:
+        jerarquia (dict): Jerarquía creada con CrearJerarquia.
+        nivel (str): Nivel de la región.
+        region (str | int): Etiqueta ("02 Albacete") o código INE (2) de la región.
+        ano (int): Año.
+        sexo (str): "Total", "Hombres" o "Mujeres".
+
+    Retorna:
+        float: Población.
+
+    Excepciones:
+        KeyError: Si el nivel, la región, el año o el sexo no existen.
+    """
+    fila = jerarquia["indices"][nivel][region]
+    return jerarquia["niveles"][nivel]["datos"][fila, jerarquia["sexos"][sexo], jerarquia["anos"][ano]]
@@ -2,24 +2,78 @@
 main.py
 Script principal que ejecuta todos los módulos de análisis de población (R1-R5).
 
-Este script ejecuta secuencialmente:
+Los informes se ejecutan con el planificador (planificador.py): cada uno declara
+los ficheros que lee y escribe, y los que no dependen entre sí se ejecutan a la
+vez en varios procesos. Con -j 1 se ejecutan uno detrás de otro en este proceso,
+leyendo los ficheros de entrada una única vez en un contexto compartido
+(funciones.CrearContexto).
+
+Módulos:
 - R1: Variación de población por provincias
 - R2: Población por comunidades autónomas
-- R3: Gráfico de barras (Top 10 CCAA por sexo)
+- R3: Gráfico de barras (Top 10 CCAA por sexo), mostrado en la página de R2
 - R4: Variación de población por comunidades autónomas
-- R5: Gráfico de evolución temporal (Top 10 CCAA)
+- R5: Gráfico de evolución temporal (Top 10 CCAA), mostrado en la página de R4
+
+Solo se regeneran los informes cuyas entradas, código o salidas han cambiado
+desde la última ejecución (ver planificador.py); --force los regenera todos.
+
+Con --autonomo (o POBLACION_HTML_AUTONOMO=1) cada página lleva dentro la hoja de
+estilos y su gráfico, de modo que se sirve con una única petición.
+
+Con --modo paginas o --modo json (o POBLACION_HTML_MODO) las tablas de más de
+funciones.FILAS_POR_PAGINA filas se reparten en páginas enlazadas desde la página
+del informe o se cargan desde un JSON mostrando solo las filas visibles
+(ver funciones.DividirTablas).
+
+Con --ccaa R5 dibuja también en paralelo un gráfico
+pequeño con la evolución por sexo de cada CCAA en imagenes/ccaa (ver R5.GraficosCCAA).
+
+Con --perfil (o POBLACION_PERFIL=1) se mide el tiempo y la memoria de cada etapa
+y se guarda un resumen (perfil.json) y una traza para chrome://tracing (perfil.trace.json).
+
+Uso:
+    python main.py [-j PROCESOS] [--force] [--autonomo] [--modo {tabla,paginas,json}] [--ccaa] [--perfil [PREFIJO]]
 
 Autores: Jose Daniel Ojeda Tro & Javier Linaje Vallejo
 Fecha: 2025-12-07
 """
-import R1 as r1
-import R2 as r2
-import R3 as r3
-import R4 as r4
-import R5 as r5
-
-r1.R1()
-r2.R2()
-r3.R3()
-r4.R4()
-r5.R5()
\ No newline at end of file
+import argparse
+import os
+import funciones as func
+import graficos
+import perfil
+import planificador
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera los informes de población R1-R5.")
+    parser.add_argument("-j", "--procesos", type=int, default=None,
+                        help="número de procesos (por defecto, uno por CPU; 1 = secuencial)")
+    parser.add_argument("--force", action="store_true",
+                        help="regenera todos los informes aunque no haya cambios")
+    parser.add_argument("--autonomo", action="store_true",
+                        help="incrusta la hoja de estilos y los gráficos en cada página HTML")
+    parser.add_argument("--modo", choices=func.MODOS_TABLAS, default=None,
+                        help="tablas grandes en una tabla, divididas en páginas o cargadas desde JSON (por defecto, tabla)")
+    parser.add_argument("--ccaa", action="store_true",
+                        help="dibuja también un gráfico pequeño por CCAA en imagenes/ccaa")
+    parser.add_argument("--estricto", action="store_true",
+                        help="se detiene si los agregados no coinciden con los totales publicados (por defecto solo avisa)")
+    parser.add_argument("--perfil", nargs="?", const=perfil.PREFIJO_POR_DEFECTO, default=None, metavar="PREFIJO",
+                        help="mide cada etapa y guarda PREFIJO.json y PREFIJO.trace.json (por defecto, ./perfil)")
+    argumentos = parser.parse_args()
+
+    if argumentos.perfil:
+        perfil.Activar(argumentos.perfil)
+
+    if argumentos.autonomo:
+        # Se pasa por el entorno para que también lo vean los procesos del pool
+        os.environ["POBLACION_HTML_AUTONOMO"] = "1"
+    if argumentos.modo:
+        os.environ["POBLACION_HTML_MODO"] = argumentos.modo
+    if argumentos.estricto:
+        os.environ["POBLACION_TOTALES_ESTRICTOS"] = "1"
+
+    planificador.EjecutarInformes(procesos=argumentos.procesos, forzar=argumentos.force, ccaa=argumentos.ccaa)
+    graficos.LimitarCacheGraficos()
@@ -0,0 +1,198 @@
+"""
+perfil.py
+Medida opcional del tiempo y la memoria de cada etapa de los informes.
+
+Se activa con la variable de entorno POBLACION_PERFIL (o con main.py --perfil).
+Su valor es el prefijo de los ficheros de salida ("1" equivale a "./perfil"):
+
+- <prefijo>.json: resumen por etapa (llamadas, tiempo total y máximo, pico de memoria).
+- <prefijo>.trace.json: traza en formato Chrome (chrome://tracing o Perfetto).
+
+Las etapas se marcan con el decorador Perfilado o con el gestor de contexto
+Etapa. Desactivado, el decorador solo comprueba una variable global antes de
+llamar a la función y Etapa devuelve un contexto vacío, así que se puede dejar
+en el código sin coste apreciable. La memoria se mide con tracemalloc (solo con
+el perfil activo) y el pico de cada etapa es lo que crece la memoria reservada
+desde su inicio. tracemalloc hace más lenta la ejecución, sobre todo al importar
+módulos grandes como matplotlib, así que los tiempos con el perfil activo sirven
+para comparar unas etapas con otras, no como tiempos absolutos.
+
+Autores: Jose Daniel Ojeda Tro & Javier Linaje Vallejo
+Fecha: 2026-10-18
+"""
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+
+
+PREFIJO_POR_DEFECTO = "./perfil"
+
+# Prefijo de los ficheros de salida; None = perfil desactivado
+PREFIJO = os.environ.get("POBLACION_PERFIL") or None
+if PREFIJO == "1":
+    PREFIJO = PREFIJO_POR_DEFECTO
+
+ACTIVO = PREFIJO is not None
+
+# Eventos registrados en este proceso (formato de traza de Chrome) y etapas abiertas
+EVENTOS = []
+PILA = []
+
+ETAPA_NULA = contextlib.nullcontext()
+
+
+def Activar(prefijo=PREFIJO_POR_DEFECTO):
+    """
+    Activa el perfil en este proceso y en los que se creen después.
+
+    Parámetros:
+        prefijo (str): Prefijo de los ficheros de salida.
+
+    Retorna:
+        None
+    """
+    global ACTIVO, PREFIJO
+    PREFIJO, ACTIVO = prefijo, True
+    # Se pasa por el entorno para que también lo vean los procesos del pool
+    os.environ["POBLACION_PERFIL"] = prefijo
+
+
+@contextlib.contextmanager
+def MedirEtapa(nombre):
+    """
+    Mide el tiempo y el pico de memoria de una etapa y lo añade a EVENTOS.
+
+    Parámetros:
+        nombre (str): Nombre de la etapa.
+    """
+    if not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+    # El pico de la etapa que la contiene se guarda antes de reiniciarlo
+    memoria, pico = tracemalloc.get_traced_memory()
+    if PILA:
+        PILA[-1]["pico"] = max(PILA[-1]["pico"], pico)
+    tracemalloc.reset_peak()
+
+    marco = {"pico": memoria}
+    PILA.append(marco)
+    inicio = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        fin = time.perf_counter_ns()
+        PILA.pop()
+        marco["pico"] = max(marco["pico"], tracemalloc.get_traced_memory()[1])
+        if PILA:
+            PILA[-1]["pico"] = max(PILA[-1]["pico"], marco["pico"])
+
+        EVENTOS.append({
+            "name": nombre,
+            "ph": "X",
+            "ts": inicio / 1000,
+            "dur": (fin - inicio) / 1000,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+            "args": {"memoria_pico_bytes": marco["pico"] - memoria},
+        })
+
+
+def Etapa(nombre):
+    """
+    Gestor de contexto que mide una etapa si el perfil está activo.
+
+    Parámetros:
+        nombre (str): Nombre de la etapa.
+
+    Retorna:
+        contextmanager: MedirEtapa(nombre), o un contexto vacío si el perfil está desactivado.
+    """
+    if not ACTIVO:
+        return ETAPA_NULA
+    return MedirEtapa(nombre)
+
+
+def Perfilado(funcion):
+    """
+    Decorador que mide cada llamada a la función como una etapa "<módulo>.<función>".
+
+    Parámetros:
+        funcion (callable): Función a medir.
+
+    Retorna:
+        callable: Función envuelta.
+    """
+    nombre = f"{funcion.__module__}.{funcion.__qualname__}"
+
+    @functools.wraps(funcion)
+    def envoltura(*args, **kwargs):
+        if not ACTIVO:
+            return funcion(*args, **kwargs)
+        with MedirEtapa(nombre):
+            return funcion(*args, **kwargs)
+
+    return envoltura
+
+
+def Recoger():
+    """
+    Devuelve los eventos registrados en este proceso y los elimina.
+
+    Retorna:
+        list[dict]: Eventos en formato de traza de Chrome.
+    """
+    eventos = EVENTOS[:]
+    EVENTOS.clear()
+    return eventos
+
+
+def Resumen(eventos):
+    """
+    Agrupa los eventos por etapa.
+
+    Parámetros:
+        eventos (list[dict]): Eventos en formato de traza de Chrome.
+
+    Retorna:
+        dict: Diccionario {etapa: {"llamadas", "segundos_total", "segundos_max", "memoria_pico_bytes"}},
+              ordenado de mayor a menor tiempo total.
+    """
+    etapas = {}
+    for evento in eventos:
+        etapa = etapas.setdefault(evento["name"], {
+            "llamadas": 0, "segundos_total": 0.0, "segundos_max": 0.0, "memoria_pico_bytes": 0,
+        })
+        segundos = evento["dur"] / 1e6
+        etapa["llamadas"] += 1
+        etapa["segundos_total"] += segundos
+        etapa["segundos_max"] = max(etapa["segundos_max"], segundos)
+        etapa["memoria_pico_bytes"] = max(etapa["memoria_pico_bytes"], evento["args"]["memoria_pico_bytes"])
+
+    return dict(sorted(etapas.items(), key=lambda e: -e[1]["segundos_total"]))
+
+
+def Guardar(eventos, prefijo=None):
+    """
+    Escribe el resumen y la traza de Chrome de los eventos.
+
+    Parámetros:
+        eventos (list[dict]): Eventos de todos los procesos.
+        prefijo (str, opcional): Prefijo de los ficheros (por defecto, PREFIJO).
+
+    Retorna:
+        tuple: Rutas (resumen, traza) de los ficheros escritos.
+    """
+    prefijo = prefijo or PREFIJO or PREFIJO_POR_DEFECTO
+    ruta_resumen, ruta_traza = prefijo + ".json", prefijo + ".trace.json"
+    os.makedirs(os.path.dirname(prefijo) or ".", exist_ok=True)
+
+    with open(ruta_resumen, "w", encoding="utf8") as f:
+        json.dump({"etapas": Resumen(eventos)}, f, indent=2, ensure_ascii=False)
+    with open(ruta_traza, "w", encoding="utf8") as f:
+        json.dump({"traceEvents": eventos, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+
+    return ruta_resumen, ruta_traza
@@ -0,0 +1,437 @@
+"""
+planificador.py
+Planificador de los informes R1-R5 según sus dependencias.
+
+Cada módulo de informe declara en ENTRADAS y SALIDAS los ficheros que lee y
+escribe. Un informe depende de otro anterior si lee algún fichero que ese otro
+escribe (p. ej. si leyera la página HTML que genera otro informe). Los informes
+independientes se ejecutan a la vez en un pool de procesos, de modo que el
+tiempo total es aproximadamente el de la cadena de dependencias más larga.
+
+Las ejecuciones son incrementales: el manifiesto (RUTA_MANIFIESTO) guarda para
+cada informe una firma con los hashes de su código, de sus ficheros de entrada
+y de las firmas de los informes de los que depende, junto con el hash de sus
+salidas. Solo se regeneran los informes cuya firma ha cambiado, cuyas salidas
+faltan o han sido modificadas, o que dependen de otro que se regenera. Los
+programas que escriben las salidas por su cuenta (como actualizacion.py) lo
+registran con ActualizarManifiesto.
+
+Autores: Jose Daniel Ojeda Tro & Javier Linaje Vallejo
+Fecha: 2026-10-18
+"""
+import hashlib
+import importlib
+import json
+import os
+import sys
+import time
+import types
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import cache
+import funciones as func
+import perfil
+
+
+INFORMES = ["R1", "R2", "R3", "R4", "R5"]
+
+RUTA_MANIFIESTO = "./.manifiesto.json"
+
+# Se incrementa cuando cambia el formato del manifiesto o la forma de calcular las firmas
+VERSION_MANIFIESTO = 2
+
+# Contexto de datos de cada proceso del pool (se crea la primera vez que se usa)
+CONTEXTO_PROCESO = None
+
+
+def FicherosCodigo(modulo):
+    """
+    Devuelve los ficheros .py del proyecto de los que depende un módulo (él incluido).
+
+    Se recorren sus variables globales buscando módulos y funciones importados
+    desde el directorio del proyecto, y de ellos los suyos, recursivamente.
+
+    Parámetros:
+        modulo (module): Módulo ya importado.
+
+    Retorna:
+        list[str]: Rutas relativas de los ficheros, ordenadas.
+    """
+    directorio = os.path.dirname(os.path.abspath(modulo.__file__))
+    vistos = {}
+    por_visitar = [modulo]
+
+    while por_visitar:
+        actual = por_visitar.pop()
+        fichero = getattr(actual, "__file__", None)
+        if fichero is None or os.path.dirname(os.path.abspath(fichero)) != directorio or fichero in vistos.values():
+            continue
+        vistos[actual.__name__] = fichero
+
+        for valor in vars(actual).values():
+            if isinstance(valor, types.ModuleType):
+                por_visitar.append(valor)
+            elif getattr(valor, "__module__", None) in sys.modules:
+                por_visitar.append(sys.modules[valor.__module__])
+
+    return sorted(os.path.relpath(f) for f in vistos.values())
+
+
+def Declaraciones(informes, ccaa=False):
+    """
+    Importa los módulos de informe y recoge sus ENTRADAS, SALIDAS y ficheros de código.
+
+    Con ccaa=True los informes que declaran SALIDAS_CCAA (R5) las añaden a sus salidas
+    y se ejecutan con ccaa=True (ver EjecutarInforme).
+
+    Parámetros:
+        informes (list[str]): Nombres de los módulos de informe, en orden.
+        ccaa (bool): Si se dibujan los gráficos por CCAA.
+
+    Retorna:
+        dict: Diccionario {informe: {"entradas": [...], "salidas": [...], "codigo": [...], "opciones": {...}}}
+    """
+    declaraciones = {}
+    for nombre in informes:
+        modulo = importlib.import_module(nombre)
+        por_ccaa = ccaa and hasattr(modulo, "SALIDAS_CCAA")
+        declaraciones[nombre] = {
+            "entradas": [os.path.normpath(r) for r in modulo.ENTRADAS],
+            "salidas": [os.path.normpath(r) for r in modulo.SALIDAS + (modulo.SALIDAS_CCAA if por_ccaa else [])],
+            "codigo": FicherosCodigo(modulo),
+            "opciones": {"ccaa": True} if por_ccaa else {},
+        }
+    return declaraciones
+
+
+def Dependencias(informes, declaraciones=None):
+    """
+    Calcula de qué informes depende cada uno a partir de sus ENTRADAS y SALIDAS.
+
+    Solo se consideran los informes anteriores en la lista, así que un informe que
+    modifica un fichero que también lee otro posterior siempre se ejecuta antes.
+
+    Parámetros:
+        informes (list[str]): Nombres de los módulos de informe, en orden.
+        declaraciones (dict, opcional): Resultado de Declaraciones(informes).
+
+    Retorna:
+        dict: Diccionario {informe: set(informes de los que depende)}
+    """
+    if declaraciones is None:
+        declaraciones = Declaraciones(informes)
+
+    dependencias = {}
+    for i, nombre in enumerate(informes):
+        entradas = set(declaraciones[nombre]["entradas"])
+        dependencias[nombre] = {previo for previo in informes[:i] if set(declaraciones[previo]["salidas"]) & entradas}
+
+    return dependencias
+
+
+def HashRuta(ruta, hashes):
+    """
+    Devuelve el hash del contenido de un fichero (o "ausente"), memorizándolo en hashes.
+
+    Si la ruta es un directorio (p. ej. el de los gráficos por CCAA de R5) el hash
+    es el de los nombres y contenidos de sus ficheros.
+
+    Parámetros:
+        ruta (str): Ruta del fichero o directorio.
+        hashes (dict): Hashes ya calculados en esta ejecución {ruta: hash}.
+
+    Retorna:
+        str: Hash del contenido del fichero.
+    """
+    if ruta not in hashes:
+        if os.path.isdir(ruta):
+            h = hashlib.blake2b(digest_size=16)
+            for nombre in sorted(os.listdir(ruta)):
+                if os.path.isfile(os.path.join(ruta, nombre)):
+                    h.update(f"|{nombre}={cache.HashFichero(os.path.join(ruta, nombre))}".encode("utf8"))
+            hashes[ruta] = h.hexdigest()
+        else:
+            hashes[ruta] = cache.HashFichero(ruta) if os.path.isfile(ruta) else "ausente"
+    return hashes[ruta]
+
+
+def FirmaInforme(entrada, firmas, hashes, ccaa=False):
+    """
+    Calcula la firma de un informe: hash de su código, de sus entradas externas, de
+    las firmas de los informes de los que depende y del modo de generación del HTML
+    (con o sin recursos incrustados, ver funciones.HtmlAutonomo, y cómo se escriben
+    las tablas grandes, ver funciones.ModoTablas) y de si se dibujan los gráficos por
+    CCAA (ver Declaraciones).
+
+    Parámetros:
+        entrada (dict): Datos del informe con "codigo", "entradas_externas" y "dependencias".
+        firmas (dict): Firmas ya calculadas de los informes anteriores {informe: firma}.
+        hashes (dict): Hashes de ficheros ya calculados en esta ejecución.
+        ccaa (bool): Si se dibujan los gráficos por CCAA.
+
+    Retorna:
+        str: Firma hexadecimal.
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{VERSION_MANIFIESTO}|autonomo={func.HtmlAutonomo()}|modo={func.ModoTablas()}|ccaa={ccaa}".encode("utf8"))
+    for ruta in entrada["codigo"] + entrada["entradas_externas"]:
+        h.update(f"|{ruta}={HashRuta(ruta, hashes)}".encode("utf8"))
+    for previo in entrada["dependencias"]:
+        h.update(f"|{previo}={firmas[previo]}".encode("utf8"))
+    return h.hexdigest()
+
+
+def EntradaManifiesto(nombre, declaraciones, dependencias, producidas, firmas, hashes, ccaa=False):
+    """
+    Crea la entrada del manifiesto de un informe (sin sus salidas) y guarda su firma en firmas.
+
+    Parámetros:
+        nombre (str): Nombre del módulo de informe.
+        declaraciones (dict): Resultado de Declaraciones.
+        dependencias (dict): Resultado de Dependencias.
+        producidas (set): Ficheros que escribe algún informe.
+        firmas (dict): Firmas de los informes anteriores {informe: firma}; se añade la de este.
+        hashes (dict): Hashes de ficheros ya calculados en esta ejecución.
+        ccaa (bool): Si se dibujan los gráficos por CCAA (ver FirmaInforme).
+
+    Retorna:
+        dict: Entrada con "codigo", "entradas_externas", "dependencias" y "firma".
+    """
+    entrada = {
+        "codigo": declaraciones[nombre]["codigo"],
+        "entradas_externas": sorted(set(declaraciones[nombre]["entradas"]) - producidas),
+        "dependencias": sorted(dependencias[nombre]),
+    }
+    firmas[nombre] = entrada["firma"] = FirmaInforme(entrada, firmas, hashes, ccaa)
+    return entrada
+
+
+def LeerManifiesto(ruta):
+    """
+    Lee el manifiesto de la última ejecución.
+
+    Parámetros:
+        ruta (str): Ruta del manifiesto.
+
+    Retorna:
+        dict: Diccionario {informe: datos}; vacío si no existe, no se puede leer o es de otra versión.
+    """
+    try:
+        with open(ruta, encoding="utf8") as f:
+            manifiesto = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    if manifiesto.get("version") != VERSION_MANIFIESTO:
+        return {}
+    return manifiesto.get("informes", {})
+
+
+def GuardarManifiesto(ruta, informes):
+    """
+    Escribe el manifiesto de forma atómica (ver funciones.EscribirFicheroAtomico).
+
+    Parámetros:
+        ruta (str): Ruta del manifiesto.
+        informes (dict): Diccionario {informe: datos}.
+
+    Retorna:
+        None
+    """
+    func.EscribirFicheroAtomico(
+        ruta,
+        lambda f: json.dump({"version": VERSION_MANIFIESTO, "informes": informes}, f, indent=2, ensure_ascii=False)
+    )
+
+
+def SalidasIntactas(entrada, hashes):
+    """
+    Indica si las salidas de un informe siguen siendo las que se guardaron en el manifiesto.
+
+    Parámetros:
+        entrada (dict | None): Datos del informe en el manifiesto.
+        hashes (dict): Hashes de ficheros ya calculados en esta ejecución.
+
+    Retorna:
+        bool: True si existen todas y no han cambiado.
+    """
+    return entrada is not None and all(HashRuta(r, hashes) == h for r, h in entrada["salidas"].items())
+
+
+def InformesActualizados(informes, manifiesto, ccaa=False):
+    """
+    Comprueba, sin importar los módulos de informe, si todos siguen al día según el manifiesto.
+
+    Parámetros:
+        informes (list[str]): Nombres de los módulos de informe, en orden.
+        manifiesto (dict): Contenido del manifiesto (LeerManifiesto).
+        ccaa (bool): Si se dibujan los gráficos por CCAA.
+
+    Retorna:
+        bool: True si no hay que regenerar ninguno.
+    """
+    firmas, hashes = {}, {}
+    for nombre in informes:
+        entrada = manifiesto.get(nombre)
+        if entrada is None or not set(entrada["dependencias"]) <= firmas.keys():
+            return False
+        if FirmaInforme(entrada, firmas, hashes, ccaa) != entrada["firma"] or not SalidasIntactas(entrada, hashes):
+            return False
+        firmas[nombre] = entrada["firma"]
+    return True
+
+
+def EjecutarInforme(nombre, contexto=None, opciones=None):
+    """
+    Ejecuta la función principal de un informe (R1.R1, R2.R2, ...) y mide su duración.
+
+    Parámetros:
+        nombre (str): Nombre del módulo de informe.
+        contexto (dict, opcional): Contexto de datos; si no se indica se usa el del proceso.
+        opciones (dict, opcional): Argumentos con nombre de la función (ver Declaraciones).
+
+    Retorna:
+        tuple: (nombre, segundos, eventos) con los eventos de perfil registrados en el
+               proceso (vacío si el perfil está desactivado, ver perfil.py)
+    """
+    global CONTEXTO_PROCESO
+    if contexto is None:
+        if CONTEXTO_PROCESO is None:
+            CONTEXTO_PROCESO = func.CrearContexto()
+        contexto = CONTEXTO_PROCESO
+
+    inicio = time.perf_counter()
+    funcion = getattr(importlib.import_module(nombre), nombre)
+    with perfil.Etapa(nombre):
+        funcion(contexto, **(opciones or {}))
+    return nombre, time.perf_counter() - inicio, perfil.Recoger()
+
+
+def EjecutarInformes(informes=INFORMES, procesos=None, contexto=None, forzar=False, manifiesto=RUTA_MANIFIESTO, ccaa=False):
+    """
+    Ejecuta los informes que lo necesitan respetando sus dependencias e informa del progreso.
+
+    Parámetros:
+        informes (list[str]): Nombres de los módulos de informe, en orden.
+        procesos (int, opcional): Número de procesos; por defecto el número de CPUs.
+                                  Con 1 se ejecutan en este proceso, uno detrás de otro,
+                                  compartiendo el contexto de datos.
+        contexto (dict, opcional): Contexto de datos para la ejecución en un solo proceso.
+        forzar (bool): Si es True se regeneran todos aunque no haya cambios.
+        manifiesto (str | None): Ruta del manifiesto; con None no se usa (se regeneran todos).
+        ccaa (bool): Si R5 dibuja también un gráfico pequeño por CCAA (ver Declaraciones).
+
+    Retorna:
+        dict: Diccionario {informe: segundos que ha tardado} de los informes ejecutados
+    """
+    inicio = time.perf_counter()
+    anterior = LeerManifiesto(manifiesto) if manifiesto and not forzar else {}
+
+    # Caso habitual sin datos nuevos: se comprueba sin importar los módulos de informe
+    if anterior and InformesActualizados(informes, anterior, ccaa):
+        print(f"Todos los informes están actualizados ({time.perf_counter() - inicio:.3f} s)")
+        return {}
+
+    with perfil.Etapa("planificador.Declaraciones"):
+        declaraciones = Declaraciones(informes, ccaa)
+    dependencias = Dependencias(informes, declaraciones)
+    producidas = {r for d in declaraciones.values() for r in d["salidas"]}
+
+    # Firma de cada informe y qué informes hay que regenerar
+    firmas, hashes, nuevo = {}, {}, {}
+    a_ejecutar = set()
+    for nombre in informes:
+        entrada = nuevo[nombre] = EntradaManifiesto(nombre, declaraciones, dependencias, producidas, firmas, hashes, ccaa)
+
+        if (forzar or dependencias[nombre] & a_ejecutar
+                or anterior.get(nombre, {}).get("firma") != entrada["firma"]
+                or not SalidasIntactas(anterior.get(nombre), hashes)):
+            a_ejecutar.add(nombre)
+        else:
+            entrada["salidas"] = anterior[nombre]["salidas"]
+            print(f"{nombre} sin cambios, no se regenera")
+
+    tiempos = {}
+    # Los eventos ya registrados se recogen antes de crear el pool para que no los copien sus procesos
+    eventos = perfil.Recoger()
+    total = len(a_ejecutar)
+
+    def Terminado(nombre, segundos, eventos_informe):
+        tiempos[nombre] = segundos
+        eventos.extend(eventos_informe)
+        print(f"[{len(tiempos)}/{total}] {nombre} terminado en {segundos:.2f} s")
+
+    if procesos is None:
+        procesos = os.cpu_count() or 1
+
+    if procesos <= 1:
+        if contexto is None:
+            contexto = func.CrearContexto()
+        # El orden de la lista ya respeta las dependencias
+        for nombre in informes:
+            if nombre in a_ejecutar:
+                Terminado(*EjecutarInforme(nombre, contexto, declaraciones[nombre]["opciones"]))
+    elif a_ejecutar:
+        # Las dependencias que no se regeneran ya están satisfechas
+        pendientes = {n: dependencias[n] & a_ejecutar for n in informes if n in a_ejecutar}
+        with ProcessPoolExecutor(max_workers=min(procesos, total)) as pool:
+            en_curso = {}
+            while pendientes or en_curso:
+                # Lanzar todos los informes cuyas dependencias ya han terminado
+                for nombre in [n for n, previos in pendientes.items() if previos <= tiempos.keys()]:
+                    del pendientes[nombre]
+                    en_curso[pool.submit(EjecutarInforme, nombre, None, declaraciones[nombre]["opciones"])] = nombre
+
+                hechos, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+                for futuro in hechos:
+                    del en_curso[futuro]
+                    Terminado(*futuro.result())
+
+    if manifiesto:
+        # Las salidas se miden al final porque un informe puede modificar las de otro
+        medidas = {}
+        for nombre in a_ejecutar:
+            nuevo[nombre]["salidas"] = {r: HashRuta(r, medidas) for r in declaraciones[nombre]["salidas"]}
+        GuardarManifiesto(manifiesto, nuevo)
+
+    print(f"Informes generados en {time.perf_counter() - inicio:.2f} s")
+
+    if perfil.ACTIVO:
+        ruta_resumen, ruta_traza = perfil.Guardar(eventos + perfil.Recoger())
+        print(f"Perfil guardado en '{ruta_resumen}' y '{ruta_traza}'")
+
+    return tiempos
+
+
+def ActualizarManifiesto(informes=INFORMES, al_dia=True, manifiesto=RUTA_MANIFIESTO):
+    """
+    Registra en el manifiesto las salidas de unos informes escritas sin pasar por EjecutarInformes.
+
+    Con al_dia=True las salidas actuales corresponden a las entradas actuales de los
+    informes y se guardan con su firma, así que la siguiente ejecución no los regenera.
+    Con al_dia=False se quitan del manifiesto y la siguiente ejecución los regenera a
+    partir de sus entradas (y los que dependen de ellos).
+
+    Parámetros:
+        informes (list[str]): Informes cuyas salidas se han escrito.
+        al_dia (bool): Si las salidas corresponden a las entradas actuales.
+        manifiesto (str): Ruta del manifiesto.
+
+    Retorna:
+        None
+    """
+    anterior = LeerManifiesto(manifiesto)
+    if al_dia:
+        # Las firmas dependen de las de los informes anteriores, así que se calculan todas
+        declaraciones = Declaraciones(INFORMES)
+        dependencias = Dependencias(INFORMES, declaraciones)
+        producidas = {r for d in declaraciones.values() for r in d["salidas"]}
+        firmas, hashes, medidas = {}, {}, {}
+        for nombre in INFORMES:
+            entrada = EntradaManifiesto(nombre, declaraciones, dependencias, producidas, firmas, hashes)
+            if nombre in informes:
+                entrada["salidas"] = {r: HashRuta(r, medidas) for r in declaraciones[nombre]["salidas"]}
+                anterior[nombre] = entrada
+    else:
+        for nombre in informes:
+            anterior.pop(nombre, None)
+    GuardarManifiesto(manifiesto, anterior)
@@ -0,0 +1,179 @@
+"""
+ranking.py
+Clasificaciones de regiones (top n) por cualquier métrica, año y nivel territorial.
+
+Una clasificación se calcula de una vez para todos los años: la métrica es una
+matriz región x año y los n primeros de cada año se separan con np.argpartition
+(funciones.IndicesMayores) sin ordenar el resto, así que el coste crece de forma
+lineal con el número de regiones aunque sean miles de municipios. Para seguir la
+evolución se calcula también la posición de cada región en cada año y cuántos
+puestos sube o baja de un año al siguiente.
+
+Métricas:
+- poblacion: población del sexo indicado.
+- variacion_absoluta: variación respecto al año anterior (ver R1).
+- variacion_relativa: variación en % respecto al año anterior (ver R1).
+- proporcion: porcentaje del sexo indicado sobre la población total.
+
+Autores: Jose Daniel Ojeda Tro & Javier Linaje Vallejo
+Fecha: 2026-10-18
+"""
+import numpy as np
+import funciones as func
+import jerarquia
+import perfil
+from R1 import CalcularVariacionAbsoluta, CalcularVariacionRelativa
+
+
+METRICAS = ("poblacion", "variacion_absoluta", "variacion_relativa", "proporcion")
+
+
+@perfil.Perfilado
+def CalcularMetrica(cubo, metrica, sexo="Total"):
+    """
+    Calcula una métrica para todas las regiones y años del cubo.
+
+    Las variaciones no tienen valor en el año más antiguo, así que tienen un año menos.
+    Los valores que no se pueden calcular (división por una población 0) son NaN.
+
+    Parámetros:
+        cubo (dict): Cubo de población.
+        metrica (str): Una de METRICAS.
+        sexo (str): Sexo de la métrica ("Total", "Hombres" o "Mujeres").
+
+    Retorna:
+        tuple: (valores, anos) con la matriz (regiones x años) en float64 y el año de cada columna.
+
+    Excepciones:
+        ValueError: Si la métrica no existe.
+    """
+    poblacion = func.SexoCubo(cubo, sexo).astype(np.float64)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if metrica == "poblacion":
+            valores, anos = poblacion, cubo["anos"]
+        elif metrica == "variacion_absoluta":
+            valores, anos = CalcularVariacionAbsoluta(poblacion), cubo["anos"][:-1]
+        elif metrica == "variacion_relativa":
+            valores, anos = CalcularVariacionRelativa(poblacion, CalcularVariacionAbsoluta(poblacion)), cubo["anos"][:-1]
+        elif metrica == "proporcion":
+            valores, anos = poblacion / func.SexoCubo(cubo, "Total") * 100, cubo["anos"]
+        else:
+            raise ValueError(f"Métrica desconocida: {metrica} (valores: {', '.join(METRICAS)})")
+
+    return np.where(np.isfinite(valores), valores, np.nan), np.asarray(anos)
+
+
+def MatrizPosiciones(valores, mayores=True):
+    """
+    Calcula la posición (1 = primera) de cada región en cada año.
+
+    Parámetros:
+        valores (numpy.ndarray): Matriz (regiones x años) de la métrica.
+        mayores (bool): Si es True la primera es la de mayor valor; si no, la de menor.
+
+    Retorna:
+        numpy.ndarray: Matriz (regiones x años) de posiciones; los NaN van al final.
+    """
+    valores = np.asarray(valores, dtype=np.float64)
+
+    # Un año por fila (memoria contigua) y orden estable de todos los años a la vez;
+    # la posición es el inverso del orden
+    claves = np.ascontiguousarray(valores.T)
+    claves = np.where(np.isnan(claves), np.inf, -claves if mayores else claves)
+    orden = np.argsort(claves, axis=1, kind="stable")
+    posiciones = np.empty_like(orden)
+    np.put_along_axis(posiciones, orden, np.arange(1, len(valores) + 1)[None, :], axis=1)
+    return posiciones.T
+
+
+def CambiosPosicion(posiciones, anos):
+    """
+    Calcula cuántos puestos sube cada región de un año al siguiente.
+
+    Parámetros:
+        posiciones (numpy.ndarray): Matriz (regiones x años) de MatrizPosiciones.
+        anos (numpy.ndarray): Año de cada columna (en cualquier orden, p. ej. el del CSV).
+
+    Retorna:
+        tuple: (cambios, anos_cambio) con la matriz (regiones x años - 1) en orden
+               cronológico (positivo = sube puestos) y el año de llegada de cada columna.
+    """
+    orden = np.argsort(anos)
+    cronologicas = posiciones[:, orden]
+    return cronologicas[:, :-1] - cronologicas[:, 1:], np.asarray(anos)[orden][1:]
+
+
+@perfil.Perfilado
+def Clasificacion(cubo, metrica="poblacion", n=10, anos=None, sexo="Total", mayores=True, con_cambios=False):
+    """
+    Calcula las n primeras regiones del cubo en cada año según una métrica.
+
+    Parámetros:
+        cubo (dict): Cubo de población (de cualquier nivel, ver ClasificacionNivel).
+        metrica (str): Una de METRICAS.
+        n (int): Número de regiones por año.
+        anos (list[int], opcional): Años de la clasificación (por defecto, todos los de la métrica).
+        sexo (str): Sexo de la métrica.
+        mayores (bool): Si es True las primeras son las de mayor valor; si no, las de menor.
+        con_cambios (bool): Si es True se calculan también las posiciones de todas las
+                            regiones y sus cambios de un año al siguiente.
+
+    Retorna:
+        dict: {"metrica", "sexo", "anos", "filas", "regiones", "valores"} con matrices (n x años)
+              de filas del cubo, etiquetas y valores, y si con_cambios es True también
+              "posiciones" (regiones x años), "cambios" y "anos_cambios" (ver CambiosPosicion).
+
+    Excepciones:
+        ValueError: Si la métrica no existe o algún año no tiene valor de la métrica.
+    """
+    valores, anos_metrica = CalcularMetrica(cubo, metrica, sexo)
+
+    if anos is not None:
+        posiciones_anos = {ano: j for j, ano in enumerate(anos_metrica.tolist())}
+        desconocidos = [str(ano) for ano in anos if ano not in posiciones_anos]
+        if desconocidos:
+            raise ValueError(f"Años sin valor de {metrica}: {', '.join(desconocidos)}")
+        columnas = [posiciones_anos[ano] for ano in anos]
+        valores, anos_metrica = valores[:, columnas], anos_metrica[columnas]
+
+    filas = func.IndicesMayores(valores if mayores else -valores, n)
+
+    resultado = {
+        "metrica": metrica,
+        "sexo": sexo,
+        "anos": anos_metrica,
+        "filas": filas,
+        "regiones": cubo["regiones"][filas],
+        "valores": np.take_along_axis(valores, filas, axis=0),
+    }
+
+    if con_cambios:
+        resultado["posiciones"] = MatrizPosiciones(valores, mayores)
+        resultado["cambios"], resultado["anos_cambios"] = CambiosPosicion(resultado["posiciones"], anos_metrica)
+
+    return resultado
+
+
+def ClasificacionNivel(datos_jerarquia, nivel, metrica="poblacion", n=10, anos=None, sexo="Total",
+                       mayores=True, con_cambios=False):
+    """
+    Calcula la clasificación de un nivel territorial de la jerarquía (ver Clasificacion).
+
+    Parámetros:
+        datos_jerarquia (dict): Jerarquía creada con jerarquia.CrearJerarquia (p. ej. comunidades.JerarquiaPoblacion).
+        nivel (str): "municipio", "provincia", "ccaa" o "nacional".
+        metrica (str): Una de METRICAS.
+        n (int): Número de regiones por año.
+        anos (list[int], opcional): Años de la clasificación.
+        sexo (str): Sexo de la métrica.
+        mayores (bool): Si es True las primeras son las de mayor valor.
+        con_cambios (bool): Si es True se calculan también las posiciones y sus cambios.
+
+    Retorna:
+        dict: Clasificación (ver Clasificacion) con "nivel".
+    """
+    cubo = jerarquia.CuboNivel(datos_jerarquia, nivel)
+    resultado = Clasificacion(cubo, metrica, n, anos, sexo, mayores, con_cambios)
+    resultado["nivel"] = nivel
+    return resultado
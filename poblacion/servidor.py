@@ -0,0 +1,419 @@
+"""
+servidor.py
+Servidor HTTP local que genera bajo demanda las tablas y gráficos de R1-R5.
+
+Los ficheros de entrada se leen y se agregan una sola vez al arrancar (ver
+jerarquia.py) y se quedan en memoria; cada petición solo filtra el cubo del
+informe y compone la página o dibuja el gráfico. Las respuestas se guardan en
+una caché LRU por informe y filtro y llevan un ETag (hash del contenido), así que
+una petición repetida con If-None-Match se contesta con 304 sin volver a enviarla.
+
+Rutas:
+    /                   Índice con los informes
+    /R1, /R2, /R4       Páginas HTML (autónomas: estilos y gráfico incrustados)
+    /R3, /R5            Gráficos (SVG por defecto; ?formato=png para PNG)
+
+Parámetros de la consulta (todos opcionales):
+    regiones=28,08,...  Regiones por código INE o etiqueta ("28 Madrid"), separadas por comas
+    anos=2012-2015,2017 Años o rangos de años
+    sexo=Mujeres        Total, Hombres o Mujeres
+    formato=png         Formato de los gráficos (svg o png)
+
+Uso:
+    python servidor.py [--direccion HOST] [--puerto N] [--cache N]
+
+Autores: Jose Daniel Ojeda Tro & Javier Linaje Vallejo
+Fecha: 2026-10-18
+"""
+import argparse
+import functools
+import hashlib
+import html
+import http.server
+import io
+import threading
+import urllib.parse
+import comunidades
+import funciones as func
+import graficos
+import jerarquia
+import R1 as r1
+import R2 as r2
+import R3 as r3
+import R4 as r4
+import R5 as r5
+
+
+DIRECCION_POR_DEFECTO = "127.0.0.1"
+PUERTO_POR_DEFECTO = 8000
+
+# Número de respuestas que se guardan en la caché LRU
+TAMANO_CACHE = 256
+
+# Directorio de la hoja de estilos que se incrusta en las páginas
+DIRECTORIO_RESULTADOS = "./resultados"
+
+FORMATOS_GRAFICO = ("svg", "png")
+
+
+def PaginaR1(cubo, sexo):
+    """
+    Página de R1: variación de la población total (o del sexo pedido).
+    """
+    return r1.CrearInforme(cubo, sexo or "Total")
+
+
+def PaginaR2(cubo, sexo):
+    """
+    Página de R2: columnas de todos los sexos (o solo del pedido) y gráfico de R3.
+    """
+    return r2.CrearInforme(cubo, sexos=(sexo,) if sexo else None)
+
+
+def PaginaR4(cubo, sexo):
+    """
+    Página de R4: variaciones de hombres y mujeres (o del sexo pedido) y gráfico de R5 de ese sexo.
+    """
+    return r4.CrearInforme(
+        cubo,
+        sexos=(sexo,) if sexo else ("Hombres", "Mujeres"),
+        generar=functools.partial(r5.DibujarGrafico, cubo, sexo=sexo or "Total"),
+    )
+
+
+def GraficoR3(cubo, sexo, destino, formato):
+    """
+    Gráfico de R3 (compara hombres y mujeres, así que no se filtra por sexo).
+    """
+    r3.DibujarGrafico(cubo, destino, formato)
+
+
+def GraficoR5(cubo, sexo, destino, formato):
+    """
+    Gráfico de R5: evolución de la población total (o del sexo pedido).
+    """
+    r5.DibujarGrafico(cubo, destino, formato, sexo or "Total")
+
+
+# Informes que se sirven: nivel territorial del cubo, años mínimos y cómo se generan
+INFORMES = {
+    "R1": {"descripcion": "Variación de población por provincias", "nivel": "provincia", "anos_minimos": 2, "pagina": PaginaR1},
+    "R2": {"descripcion": "Población por comunidades autónomas", "nivel": "ccaa", "anos_minimos": 1, "pagina": PaginaR2},
+    "R3": {"descripcion": "Gráfico de población por sexo (Top 10 CCAA)", "nivel": "ccaa", "anos_minimos": 1, "grafico": GraficoR3},
+    "R4": {"descripcion": "Variación de población por CCAA y sexo", "nivel": "ccaa", "anos_minimos": 2, "pagina": PaginaR4},
+    "R5": {"descripcion": "Gráfico de evolución de la población (Top 10 CCAA)", "nivel": "ccaa", "anos_minimos": 1, "grafico": GraficoR5},
+}
+
+
+def CargarDatos(contexto):
+    """
+    Lee y agrega los datos de todos los informes y crea los índices de regiones.
+
+    Se hace al arrancar para que las peticiones solo lean datos ya calculados
+    (el contexto no se modifica después, así que lo pueden usar varios hilos).
+
+    Parámetros:
+        contexto (dict): Contexto de datos (funciones.CrearContexto)
+
+    Retorna:
+        dict: Diccionario {informe: {"cubo": cubo, "indice": {región: fila}}}
+    """
+    datos_jerarquia = comunidades.JerarquiaPoblacion(contexto)
+    cubos = {
+        "provincia": jerarquia.CuboConTotal(datos_jerarquia, "provincia"),
+        "ccaa": jerarquia.CuboNivel(datos_jerarquia, "ccaa"),
+    }
+    indices = {nivel: jerarquia.IndiceRegiones(cubo["regiones"]) for nivel, cubo in cubos.items()}
+
+    return {
+        nombre: {"cubo": cubos[informe["nivel"]], "indice": indices[informe["nivel"]]}
+        for nombre, informe in INFORMES.items()
+    }
+
+
+def Lista(parametros, nombre):
+    """
+    Devuelve los valores de un parámetro de la consulta separados por comas.
+
+    Parámetros:
+        parametros (dict): Parámetros de la consulta (urllib.parse.parse_qs)
+        nombre (str): Nombre del parámetro
+
+    Retorna:
+        list[str] | None: Valores no vacíos, o None si el parámetro no está
+    """
+    valores = [v.strip() for texto in parametros.get(nombre, []) for v in texto.split(",") if v.strip()]
+    return valores or None
+
+
+def Region(texto):
+    """
+    Convierte una región de la consulta en clave del índice: código INE si es un número, etiqueta si no.
+
+    Parámetros:
+        texto (str): Región tal como viene en la consulta ("28" o "28 Madrid")
+
+    Retorna:
+        int | str: Clave de la región
+    """
+    return int(texto) if texto.isdigit() else texto
+
+
+def Anos(textos, disponibles):
+    """
+    Convierte los años de la consulta ("2012-2015", "2017") en la lista de años.
+
+    Un rango selecciona los años con datos que hay dentro de él; un año suelto se
+    devuelve tal cual (y si no tiene datos se rechaza al buscarlo en el cubo).
+
+    Parámetros:
+        textos (list[str]): Años o rangos de años
+        disponibles (numpy.ndarray): Años con datos
+
+    Retorna:
+        list[int]: Años
+
+    Excepciones:
+        ValueError: Si algún valor no es un año o un rango de años.
+    """
+    anos = []
+    for texto in textos:
+        inicio, separador, fin = texto.partition("-")
+        try:
+            inicio, fin = int(inicio), int(fin or inicio)
+        except ValueError:
+            raise ValueError(f"Año no válido: {texto}") from None
+
+        if separador:
+            anos.extend(ano for ano in disponibles.tolist() if min(inicio, fin) <= ano <= max(inicio, fin))
+        else:
+            anos.append(inicio)
+    return anos
+
+
+def ClaveConsulta(datos, nombre, consulta):
+    """
+    Valida la consulta de un informe y la reduce a una clave de la caché.
+
+    Dos consultas que piden lo mismo (p. ej. "28" y "28 Madrid", o los años en otro
+    orden) tienen la misma clave y comparten la respuesta guardada.
+
+    Parámetros:
+        datos (dict): Datos de los informes (ver CargarDatos)
+        nombre (str): Nombre del informe ("R1" ... "R5")
+        consulta (str): Parámetros de la URL
+
+    Retorna:
+        tuple: (informe, filas, columnas, sexo, formato)
+
+    Excepciones:
+        ValueError: Si algún parámetro no es válido.
+    """
+    parametros = urllib.parse.parse_qs(consulta)
+    informe, cubo = INFORMES[nombre], datos[nombre]["cubo"]
+
+    regiones, anos = Lista(parametros, "regiones"), Lista(parametros, "anos")
+    filas, columnas = func.PosicionesCubo(
+        cubo,
+        datos[nombre]["indice"],
+        regiones=None if regiones is None else [Region(r) for r in regiones],
+        anos=None if anos is None else Anos(anos, cubo["anos"]),
+    )
+
+    n_anos = len(cubo["anos"]) if columnas is None else len(columnas)
+    if n_anos < informe["anos_minimos"]:
+        raise ValueError(f"{nombre} necesita al menos {informe['anos_minimos']} años")
+
+    sexo = parametros.get("sexo", [None])[-1] or None
+    if sexo is not None and sexo not in cubo["sexos"]:
+        raise ValueError(f"Sexo no válido: {sexo} (valores: {', '.join(cubo['sexos'])})")
+
+    formato = None
+    if "grafico" in informe:
+        formato = parametros.get("formato", [func.FORMATO_GRAFICO_AUTONOMO])[-1]
+        if formato not in FORMATOS_GRAFICO:
+            raise ValueError(f"Formato no válido: {formato} (valores: {', '.join(FORMATOS_GRAFICO)})")
+
+    return nombre, filas, columnas, sexo, formato
+
+
+def GenerarRespuesta(datos, directorio, nombre, filas, columnas, sexo, formato):
+    """
+    Genera en memoria la página o el gráfico de un informe filtrado.
+
+    Parámetros:
+        datos (dict): Datos de los informes (ver CargarDatos)
+        directorio (str): Directorio de la hoja de estilos
+        nombre (str): Nombre del informe
+        filas (tuple | None): Posiciones de las regiones (None = todas)
+        columnas (tuple | None): Posiciones de los años (None = todos)
+        sexo (str | None): Sexo (None = los del informe)
+        formato (str | None): Formato del gráfico
+
+    Retorna:
+        tuple: (cuerpo, tipo, etag) con los bytes de la respuesta, su tipo MIME y su ETag
+    """
+    informe = INFORMES[nombre]
+    cubo = func.SeleccionarCubo(
+        datos[nombre]["cubo"],
+        regiones=slice(None) if filas is None else list(filas),
+        anos=slice(None) if columnas is None else list(columnas),
+    )
+
+    if "grafico" in informe:
+        buffer = io.BytesIO()
+        informe["grafico"](cubo, sexo, buffer, formato)
+        cuerpo, tipo = buffer.getvalue(), func.TIPOS_MIME[formato]
+    else:
+        texto = io.StringIO()
+        func.VolcarDocumento(informe["pagina"](cubo, sexo), texto, directorio, autonomo=True)
+        cuerpo, tipo = texto.getvalue().encode("utf8"), "text/html; charset=utf-8"
+
+    etag = '"' + hashlib.blake2b(cuerpo, digest_size=16).hexdigest() + '"'
+    return cuerpo, tipo, etag
+
+
+def PaginaIndice(directorio):
+    """
+    Genera la página de inicio con un enlace a cada informe.
+
+    Parámetros:
+        directorio (str): Directorio de la hoja de estilos
+
+    Retorna:
+        tuple: (cuerpo, tipo, etag) como GenerarRespuesta
+    """
+    enlaces = "".join(
+        f'<li><a href="/{nombre}">{nombre}</a>: {html.escape(informe["descripcion"])}</li>'
+        for nombre, informe in INFORMES.items()
+    )
+    texto = (
+        func.PLANTILLA_INICIO_HTML.format("Informes de población").replace(func.ENLACE_ESTILO_HTML, func.EstiloEnLinea(directorio))
+        + f"<ul>{enlaces}</ul>"
+        + "<p>Filtros: ?regiones=28,08&amp;anos=2012-2015,2017&amp;sexo=Mujeres (y formato=png en los gráficos)</p>"
+        + func.FIN_HTML
+    )
+    cuerpo = texto.encode("utf8")
+    return cuerpo, "text/html; charset=utf-8", '"' + hashlib.blake2b(cuerpo, digest_size=16).hexdigest() + '"'
+
+
+def CoincideEtag(cabecera, etag):
+    """
+    Indica si la cabecera If-None-Match de una petición incluye el ETag de la respuesta.
+
+    Parámetros:
+        cabecera (str | None): Valor de If-None-Match
+        etag (str): ETag de la respuesta
+
+    Retorna:
+        bool: True si el cliente ya tiene la respuesta
+    """
+    if not cabecera:
+        return False
+    etiquetas = [e.strip() for e in cabecera.split(",")]
+    # La comparación de If-None-Match es débil: "W/" no cuenta
+    return "*" in etiquetas or any(e.removeprefix("W/") == etag for e in etiquetas)
+
+
+class ManejadorInformes(http.server.BaseHTTPRequestHandler):
+    """
+    Atiende las peticiones GET y HEAD de un servidor creado con CrearServidor.
+    """
+
+    server_version = "PoblacionHTTP/1.0"
+
+    def do_GET(self):
+        self.Responder(enviar_cuerpo=True)
+
+    def do_HEAD(self):
+        self.Responder(enviar_cuerpo=False)
+
+    def Responder(self, enviar_cuerpo):
+        ruta, _, consulta = self.path.partition("?")
+        nombre = ruta.strip("/")
+
+        try:
+            if nombre == "":
+                respuesta = self.server.indice
+            elif nombre in INFORMES:
+                respuesta = self.server.respuestas(*ClaveConsulta(self.server.datos, nombre, consulta))
+            else:
+                self.send_error(404, "Informe no encontrado", f"Informes: {', '.join(INFORMES)}")
+                return
+        except ValueError as error:
+            # El detalle va en el cuerpo: la línea de estado solo admite latin-1
+            self.send_error(400, "Consulta no valida", str(error))
+            return
+
+        cuerpo, tipo, etag = respuesta
+        if CoincideEtag(self.headers.get("If-None-Match"), etag):
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", tipo)
+        self.send_header("Content-Length", str(len(cuerpo)))
+        self.send_header("ETag", etag)
+        # El navegador guarda la respuesta pero pregunta siempre con el ETag si sigue valiendo
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        if enviar_cuerpo:
+            self.wfile.write(cuerpo)
+
+
+def CrearServidor(contexto=None, direccion=DIRECCION_POR_DEFECTO, puerto=PUERTO_POR_DEFECTO,
+                  tamano_cache=TAMANO_CACHE, directorio=DIRECTORIO_RESULTADOS):
+    """
+    Crea el servidor HTTP con los datos ya cargados en memoria.
+
+    Cada petición se atiende en un hilo. Las respuestas guardadas en la caché se
+    sirven en paralelo, pero las que hay que generar se generan de una en una
+    porque matplotlib no es seguro entre hilos (p. ej. los parámetros globales
+    que se cambian al guardar un SVG, ver graficos.GuardarFigura).
+
+    Parámetros:
+        contexto (dict, opcional): Contexto de datos (por defecto, el de los ficheros de entrada)
+        direccion (str): Dirección en la que escucha
+        puerto (int): Puerto en el que escucha (0 = uno libre)
+        tamano_cache (int): Número de respuestas de la caché LRU
+        directorio (str): Directorio de la hoja de estilos
+
+    Retorna:
+        http.server.ThreadingHTTPServer: Servidor (serve_forever() para atender peticiones)
+    """
+    if contexto is None:
+        contexto = func.CrearContexto()
+
+    datos = CargarDatos(contexto)
+    cerrojo = threading.Lock()
+
+    def Generar(*clave):
+        with cerrojo:
+            return GenerarRespuesta(datos, directorio, *clave)
+
+    servidor = http.server.ThreadingHTTPServer((direccion, puerto), ManejadorInformes)
+    servidor.datos = datos
+    servidor.indice = PaginaIndice(directorio)
+    servidor.respuestas = functools.lru_cache(maxsize=tamano_cache)(Generar)
+    return servidor
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sirve bajo demanda las tablas y gráficos de R1-R5.")
+    parser.add_argument("--direccion", default=DIRECCION_POR_DEFECTO, help="dirección en la que escucha")
+    parser.add_argument("--puerto", type=int, default=PUERTO_POR_DEFECTO, help="puerto en el que escucha")
+    parser.add_argument("--cache", type=int, default=TAMANO_CACHE, help="número de respuestas en la caché LRU")
+    argumentos = parser.parse_args()
+
+    servidor = CrearServidor(direccion=argumentos.direccion, puerto=argumentos.puerto, tamano_cache=argumentos.cache)
+    print(f"Servidor en http://{servidor.server_address[0]}:{servidor.server_address[1]}/ (Ctrl+C para terminar)")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servidor.server_close()
+        graficos.LimitarCacheGraficos()
@@ -0,0 +1,249 @@
+"""
+sintetico.py
+Generador de ficheros de entrada sintéticos con el mismo formato que los del INE.
+
+Escribe un CSV de población por regiones y sexo (líneas de título, cabeceras de
+sexo y año, fila "Total Nacional", una fila por región y notas a partir de
+"Notas:") y el HTML con la relación comunidad autónoma - provincia, de modo que
+R1-R5 se pueden ejecutar sobre ellos sin cambios. Sirve para medir el
+rendimiento con más datos que los reales: desde las 52 provincias hasta unos
+8.000 municipios y desde 8 hasta más de 30 años.
+
+Uso:
+    python sintetico.py DIRECTORIO [--regiones N] [--anos N] [--semilla N]
+
+Autores: Jose Daniel Ojeda Tro & Javier Linaje Vallejo
+Fecha: 2026-10-18
+"""
+import argparse
+import decimal
+import os
+import numpy as np
+
+
+N_PROVINCIAS = 52
+N_COMUNIDADES = 19
+
+# Nombres de los ficheros dentro de un directorio de entradas (los de funciones.RUTA_*)
+NOMBRE_POBLACION = "poblacionProvinciasHM2010-17.csv"
+NOMBRE_COMUNIDADES = "comunidadAutonoma-Provincia.htm"
+
+TITULO_CSV = """Cifras Oficiales de Población de los Municipios Españoles: Revisión del Padrón Municipal
+Resumen por provincias
+Población por provincias y sexo.
+Unidades: Personas
+"""
+
+NOTAS_CSV = """Notas:
+Las cifras de 1996 están referidas a 1 de mayo y  las demás a 1 de enero.
+No existen cifras a 1 de enero de 1997 porque no se realizó revisión del padrón para ese año
+Fuente: Instituto Nacional de Estadística"""
+
+INICIO_HTML = """<!DOCTYPE html><html><head><meta charset="utf-8"><title>Comunidades autónomas y provincias</title></head>
+<body>
+<table class="miTabla">
+  <tbody><tr class="diezcarne" style="background-color:#eef2f8;">
+    <th>CODAUTO</th>
+    <th>Comunidad Autónoma</th>
+    <th>CPRO</th>
+    <th>Provincia</th>
+  </tr>
+"""
+
+FILA_HTML = """  <tr>
+    <td>{:02d}</td>
+    <td>{}</td>
+    <td>{}</td>
+    <td>{}</td>
+  </tr>
+"""
+
+FIN_HTML = """</tbody></table>
+</body></html>
+"""
+
+
+def NumeroIne(valor):
+    """
+    Escribe un número como en los CSV del INE (formato de Java: "390032.0", "4.6572132E7").
+
+    Parámetros:
+        valor (float): Número a escribir
+
+    Retorna:
+        str: Texto del número
+    """
+    if abs(valor) < 1e7:
+        return repr(float(valor))
+
+    mantisa, exponente = f"{decimal.Decimal(repr(float(valor))).normalize():E}".split("E")
+    if "." not in mantisa:
+        mantisa += ".0"
+    return f"{mantisa}E{int(exponente)}"
+
+
+def CodigosRegiones(n_regiones):
+    """
+    Genera los códigos INE de las regiones, repartidas entre las 52 provincias.
+
+    Con 52 regiones o menos son códigos de provincia (1-52); con más son códigos de
+    municipio de cinco cifras (provincia * 1000 + número de municipio).
+
+    Parámetros:
+        n_regiones (int): Número de regiones
+
+    Retorna:
+        tuple: (codigos, provincias) con el código de cada región y el de su provincia
+    """
+    if n_regiones <= N_PROVINCIAS:
+        provincias = np.arange(1, n_regiones + 1)
+        return provincias, provincias
+
+    provincias = np.arange(n_regiones) % N_PROVINCIAS + 1
+    municipio = np.arange(n_regiones) // N_PROVINCIAS + 1
+    return provincias * 1000 + municipio, provincias
+
+
+def EtiquetasRegiones(codigos):
+    """
+    Genera las etiquetas "<código> <nombre>" de las regiones.
+
+    Parámetros:
+        codigos (numpy.ndarray): Códigos INE de las regiones
+
+    Retorna:
+        list[str]: Etiquetas de las regiones
+    """
+    ancho = 2 if codigos.max(initial=0) < 100 else 5
+    return [f"{codigo:0{ancho}d} Región {codigo:0{ancho}d}" for codigo in codigos.tolist()]
+
+
+def ComunidadProvincia(provincias):
+    """
+    Asigna cada provincia a una de las 19 comunidades autónomas (en bloques consecutivos).
+
+    Parámetros:
+        provincias (numpy.ndarray): Códigos de provincia (1-52)
+
+    Retorna:
+        numpy.ndarray: Código de la comunidad autónoma (1-19) de cada provincia
+    """
+    return (provincias - 1) * N_COMUNIDADES // N_PROVINCIAS + 1
+
+
+def PoblacionSintetica(n_regiones, n_anos, semilla=0):
+    """
+    Genera la población por región, sexo y año.
+
+    Parámetros:
+        n_regiones (int): Número de regiones
+        n_anos (int): Número de años
+        semilla (int): Semilla del generador aleatorio
+
+    Retorna:
+        tuple: (hombres, mujeres), matrices (regiones x años) de enteros, del año más reciente al más antiguo
+    """
+    generador = np.random.default_rng(semilla)
+
+    # Tamaños con la dispersión típica (pocas regiones muy pobladas y muchas pequeñas)
+    base = np.exp(generador.normal(np.log(4e6 / max(n_regiones / N_PROVINCIAS, 1) / 10), 1.0, n_regiones))
+    crecimiento = generador.normal(0.0, 0.01, (n_regiones, n_anos))
+    evolucion = base[:, None] * np.exp(np.cumsum(crecimiento, axis=1))
+
+    proporcion_hombres = generador.uniform(0.48, 0.51, (n_regiones, 1))
+    hombres = np.round(evolucion * proporcion_hombres)
+    mujeres = np.round(evolucion * (1 - proporcion_hombres))
+    return hombres, mujeres
+
+
+def EscribirCsvPoblacion(ruta, n_regiones=N_PROVINCIAS, n_anos=8, ultimo_ano=2017, semilla=0):
+    """
+    Escribe un CSV de población por regiones y sexo con el formato del INE.
+
+    Parámetros:
+        ruta (str): Ruta del CSV
+        n_regiones (int): Número de regiones (52 = provincias; más = municipios)
+        n_anos (int): Número de años (del ultimo_ano hacia atrás)
+        ultimo_ano (int): Año más reciente
+        semilla (int): Semilla del generador aleatorio
+
+    Retorna:
+        None
+    """
+    codigos, _ = CodigosRegiones(n_regiones)
+    hombres, mujeres = PoblacionSintetica(n_regiones, n_anos, semilla)
+    valores = np.hstack((hombres + mujeres, hombres, mujeres))
+
+    anos = ";".join(str(ano) for ano in range(ultimo_ano, ultimo_ano - n_anos, -1))
+    huecos = ";" * (n_anos - 1)
+
+    with open(ruta, "w", encoding="utf8", newline="") as f:
+        f.write(TITULO_CSV)
+        f.write(f";Total;{huecos}Hombres;{huecos}Mujeres;{huecos}\n")
+        f.write(f";{anos};{anos};{anos};\n")
+        f.write("Total Nacional;" + "".join(NumeroIne(v) + ";" for v in valores.sum(axis=0).tolist()) + "\n")
+        for etiqueta, fila in zip(EtiquetasRegiones(codigos), valores.tolist()):
+            f.write(etiqueta + ";" + "".join(repr(v) + ";" for v in fila) + "\n")
+        f.write(NOTAS_CSV)
+
+
+def EscribirHtmlComunidades(ruta, n_regiones=N_PROVINCIAS):
+    """
+    Escribe el HTML con la relación comunidad autónoma - provincia con el formato de la página del INE.
+
+    Como en la página original, la relación es siempre por provincias, también cuando
+    el CSV es de municipios (los informes los agregan por provincia, ver jerarquia.py).
+
+    Parámetros:
+        ruta (str): Ruta del HTML
+        n_regiones (int): Número de regiones (el mismo que en el CSV)
+
+    Retorna:
+        None
+    """
+    provincias = np.unique(CodigosRegiones(n_regiones)[1])
+    comunidades = ComunidadProvincia(provincias)
+    etiquetas = EtiquetasRegiones(provincias)
+
+    with open(ruta, "w", encoding="utf8") as f:
+        f.write(INICIO_HTML)
+        # Filas ordenadas por comunidad, como en la página original
+        for i in np.argsort(comunidades, kind="stable").tolist():
+            codigo, nombre = etiquetas[i].split(" ", 1)
+            f.write(FILA_HTML.format(comunidades[i], f"Comunidad {comunidades[i]:02d}", codigo, nombre))
+        f.write(FIN_HTML)
+
+
+def GenerarEntradas(directorio, n_regiones=N_PROVINCIAS, n_anos=8, semilla=0):
+    """
+    Genera en un directorio los dos ficheros de entrada de R1-R5.
+
+    Parámetros:
+        directorio (str): Directorio de salida (se crea si no existe)
+        n_regiones (int): Número de regiones
+        n_anos (int): Número de años
+        semilla (int): Semilla del generador aleatorio
+
+    Retorna:
+        dict: Rutas de los ficheros {"poblacion": ..., "comunidades": ...}
+    """
+    os.makedirs(directorio, exist_ok=True)
+    rutas = {
+        "poblacion": os.path.join(directorio, NOMBRE_POBLACION),
+        "comunidades": os.path.join(directorio, NOMBRE_COMUNIDADES),
+    }
+    EscribirCsvPoblacion(rutas["poblacion"], n_regiones, n_anos, semilla=semilla)
+    EscribirHtmlComunidades(rutas["comunidades"], n_regiones)
+    return rutas
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Genera ficheros de entrada sintéticos con el formato del INE.")
+    parser.add_argument("directorio", help="directorio donde se escriben los ficheros")
+    parser.add_argument("--regiones", type=int, default=N_PROVINCIAS, help="número de regiones (52 = provincias)")
+    parser.add_argument("--anos", type=int, default=8, help="número de años")
+    parser.add_argument("--semilla", type=int, default=0, help="semilla del generador aleatorio")
+    argumentos = parser.parse_args()
+
+    rutas = GenerarEntradas(argumentos.directorio, argumentos.regiones, argumentos.anos, argumentos.semilla)
+    print(f"Ficheros generados: {rutas['poblacion']}, {rutas['comunidades']}")
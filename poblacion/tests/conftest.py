@@ -0,0 +1,12 @@
+"""
+conftest.py
+Configuración de las pruebas: los módulos del proyecto se importan por su nombre
+(import funciones, import R1...), así que se añade su directorio a sys.path.
+
+Autores: Jose Daniel Ojeda Tro & Javier Linaje Vallejo
+Fecha: 2026-10-18
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,39 @@
+"""
+test_comunidades.py
+Pruebas de la agrupación de provincias por comunidad autónoma.
+
+Autores: Jose Daniel Ojeda Tro & Javier Linaje Vallejo
+Fecha: 2026-10-18
+"""
+import numpy as np
+import comunidades
+
+
+def test_agrupar_provincias_por_comunidad():
+    provincias = np.array(["04 Almería", "22 Huesca", "11 Cádiz", "50 Zaragoza"])
+    poblaciones = np.array([[1.0, 10.0], [2.0, 20.0], [3.0, 30.0], [4.0, 40.0]])
+    diccionario = {
+        "01 Andalucía": ["04 Almería", "11 Cádiz"],
+        "02 Aragón": ["22 Huesca", "50 Zaragoza"],
+    }
+
+    nombres, resultado = comunidades.AgruparProvinciasPorComunidadAutonoma(provincias, poblaciones, diccionario)
+
+    assert nombres.tolist() == ["01 Andalucía", "02 Aragón"]
+    np.testing.assert_array_equal(resultado, [[4, 40], [6, 60]])
+
+
+def test_comunidad_sin_provincias_no_desalinea_etiquetas():
+    provincias = np.array(["04 Almería", "50 Zaragoza"])
+    poblaciones = np.array([[1.0], [4.0]])
+    diccionario = {
+        "01 Andalucía": ["04 Almería"],
+        "18 Ceuta": [],
+        "02 Aragón": ["50 Zaragoza"],
+    }
+
+    nombres, resultado = comunidades.AgruparProvinciasPorComunidadAutonoma(provincias, poblaciones, diccionario)
+
+    # La comunidad vacía no aparece y cada etiqueta sigue con su suma
+    assert nombres.tolist() == ["01 Andalucía", "02 Aragón"]
+    np.testing.assert_array_equal(resultado, [[1], [4]])
@@ -0,0 +1,58 @@
+"""
+test_exportacion.py
+Pruebas de la lectura de .npz con memoria mapeada (exportacion.CargarNpz).
+
+Autores: Jose Daniel Ojeda Tro & Javier Linaje Vallejo
+Fecha: 2026-10-18
+"""
+import zipfile
+import numpy as np
+import exportacion
+
+ARRAYS = {
+    "etiquetas": np.array(["01 Andalucía", "02 Aragón"]),
+    "valores": np.arange(6, dtype=np.float64).reshape(2, 3),
+    "fortran": np.asfortranarray(np.arange(6, dtype=np.int32).reshape(2, 3)),
+    "vacio": np.zeros((0, 3)),
+}
+
+
+def ComprobarIguales(cargados):
+    assert sorted(cargados) == sorted(ARRAYS)
+    for nombre, array in ARRAYS.items():
+        np.testing.assert_array_equal(cargados[nombre], array)
+        assert cargados[nombre].dtype == array.dtype
+
+
+def test_npz_sin_comprimir_se_mapea(tmp_path):
+    ruta = tmp_path / "datos.npz"
+    np.savez(ruta, **ARRAYS)
+
+    cargados = exportacion.CargarNpz(str(ruta))
+
+    ComprobarIguales(cargados)
+    assert isinstance(cargados["valores"], np.memmap)
+    assert isinstance(cargados["fortran"], np.memmap)
+
+
+def test_npz_comprimido_se_lee_entero(tmp_path):
+    ruta = tmp_path / "datos.npz"
+    np.savez_compressed(ruta, **ARRAYS)
+
+    cargados = exportacion.CargarNpz(str(ruta))
+
+    ComprobarIguales(cargados)
+    assert not isinstance(cargados["valores"], np.memmap)
+
+
+def test_npz_version_3_se_lee_con_np_load(tmp_path):
+    ruta = tmp_path / "datos.npz"
+    with zipfile.ZipFile(ruta, "w") as zip_npz:
+        for nombre, array in ARRAYS.items():
+            with zip_npz.open(nombre + ".npy", "w") as miembro:
+                np.lib.format.write_array(miembro, array, version=(3, 0))
+
+    cargados = exportacion.CargarNpz(str(ruta))
+
+    ComprobarIguales(cargados)
+    assert not isinstance(cargados["valores"], np.memmap)
@@ -0,0 +1,37 @@
+"""
+test_ingesta.py
+Pruebas de la fusión de publicaciones (ingesta.FusionarCubos).
+
+Autores: Jose Daniel Ojeda Tro & Javier Linaje Vallejo
+Fecha: 2026-10-18
+"""
+import numpy as np
+import funciones as func
+import ingesta
+
+
+def CuboPrueba(regiones, anos, valores):
+    """Cubo con los sexos Total y Hombres; valores[región][año] va en los dos."""
+    datos = np.asarray(valores, dtype=np.float64)[:, None, :].repeat(2, axis=1)
+    return func.CrearCubo(regiones, ["Total", "Hombres"], anos, datos)
+
+
+def test_fusion_gana_la_publicacion_mas_reciente():
+    antigua = CuboPrueba(["Total Nacional", "02 Albacete", "03 Alicante"], [2011, 2010], [[30, 20], [10, 8], [20, 12]])
+    reciente = CuboPrueba(["Total Nacional", "02 Albacete (rev.)"], [2012, 2011], [[40, 35], [14, 11]])
+
+    # El orden de la lista no importa: se ordenan por su año más reciente
+    fusion = ingesta.FusionarCubos([reciente, antigua])
+
+    assert fusion["anos"].tolist() == [2012, 2011, 2010]
+    assert fusion["regiones"].tolist() == ["Total Nacional", "02 Albacete (rev.)", "03 Alicante"]
+    np.testing.assert_array_equal(fusion["datos"][:, fusion["sexos"].index("Total")], [[40, 35, 20], [14, 11, 8], [np.nan, 20, 12]])
+
+
+def test_fusion_no_sobrescribe_con_celdas_sin_dato():
+    antigua = CuboPrueba(["02 Albacete"], [2011], [[10]])
+    reciente = CuboPrueba(["02 Albacete"], [2012, 2011], [[12, np.nan]])
+
+    fusion = ingesta.FusionarCubos([antigua, reciente])
+
+    np.testing.assert_array_equal(fusion["datos"][0, 0], [12, 10])
@@ -0,0 +1,72 @@
+"""
+test_planificador.py
+Pruebas de la invalidación de informes del planificador (planificador.EjecutarInformes).
+
+Cada prueba crea en un directorio temporal dos informes de juguete: InformeA copia
+la entrada en a.txt y InformeB, que lee a.txt, lo copia en b.txt.
+
+Autores: Jose Daniel Ojeda Tro & Javier Linaje Vallejo
+Fecha: 2026-10-18
+"""
+import importlib
+import sys
+import pytest
+import planificador
+
+INFORMES = ["InformeA", "InformeB"]
+
+CODIGO_INFORME = '''
+ENTRADAS = ["{entrada}"]
+SALIDAS = ["{salida}"]
+
+
+def {nombre}(contexto):
+    with open("{entrada}") as f:
+        texto = f.read()
+    with open("{salida}", "w") as f:
+        f.write(texto)
+'''
+
+
+@pytest.fixture
+def proyecto(tmp_path, monkeypatch):
+    """Directorio con la entrada y los dos informes, que queda como directorio de trabajo."""
+    (tmp_path / "entrada.txt").write_text("1")
+    (tmp_path / "InformeA.py").write_text(CODIGO_INFORME.format(nombre="InformeA", entrada="entrada.txt", salida="a.txt"))
+    (tmp_path / "InformeB.py").write_text(CODIGO_INFORME.format(nombre="InformeB", entrada="a.txt", salida="b.txt"))
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    yield tmp_path
+    for nombre in INFORMES:
+        sys.modules.pop(nombre, None)
+    importlib.invalidate_caches()
+
+
+def Ejecutar(**opciones):
+    return set(planificador.EjecutarInformes(INFORMES, procesos=1, contexto={}, manifiesto=".manifiesto.json", **opciones))
+
+
+def test_segunda_ejecucion_no_regenera(proyecto):
+    assert Ejecutar() == {"InformeA", "InformeB"}
+    assert Ejecutar() == set()
+
+
+def test_cambio_de_entrada_regenera_el_informe_y_los_que_dependen(proyecto):
+    Ejecutar()
+    (proyecto / "entrada.txt").write_text("2")
+
+    assert Ejecutar() == {"InformeA", "InformeB"}
+    assert (proyecto / "b.txt").read_text() == "2"
+
+
+def test_salida_modificada_regenera_solo_su_informe(proyecto):
+    Ejecutar()
+    (proyecto / "b.txt").write_text("a mano")
+
+    assert Ejecutar() == {"InformeB"}
+    assert (proyecto / "b.txt").read_text() == "1"
+
+
+def test_forzar_regenera_todos(proyecto):
+    Ejecutar()
+    assert Ejecutar(forzar=True) == {"InformeA", "InformeB"}